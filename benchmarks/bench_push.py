@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推送 / 部署基准测试
+在本地 GitHub 替身服务器（fake_github.py）上完整执行一次全组织推送和工作流部署，
+报告吞吐（请求/秒）、每个仓库耗时的 p50/p99，以及每个仓库平均发出的请求数。
+不需要 GITHUB_TOKEN，也不会访问真实的 GitHub。
+
+第一轮推送后合并所有 PR，第二轮推送时远程内容已与本地一致，
+可用来检查“未变化时几乎不产生写请求”。
+
+使用方法：
+    python benchmarks/bench_push.py                          # 默认: 全部课程, 并发 1 和 8
+    python benchmarks/bench_push.py --concurrency 1 4 16     # 比较不同并发数
+    python benchmarks/bench_push.py --latency 0.1 --failure-rate 0.02
+    python benchmarks/bench_push.py --no-write --fork-delay 3  # 没有写权限，走 Fork 路径
+    python benchmarks/bench_push.py --git-data --json result.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import statistics
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_github import ORG, FakeGitHub
+from github_api import ETagCache, GitHubClient
+from push_to_github import GitHubAPIPusher, push_courses
+from deploy_workflows import WorkflowDeployer, deploy_courses
+
+TOKEN = "bench-token"
+
+
+def collect_jobs(readme_output: Path, limit: int = 0) -> List[tuple]:
+    """从 readme_output 收集推送任务，每个课程目录对应替身服务器上的一个仓库"""
+    jobs = []
+    for course_dir in sorted(d for d in readme_output.iterdir() if d.is_dir()):
+        toml_path, readme_path = course_dir / "readme.toml", course_dir / "README.md"
+        if toml_path.exists() and readme_path.exists():
+            jobs.append((course_dir.name, "normal", str(toml_path), str(readme_path)))
+    return jobs[:limit] if limit else jobs
+
+
+def initial_repo_files(code: str) -> Dict[str, str]:
+    """推送前远程仓库的内容：旧格式文件，和本地输出不同"""
+    return {
+        f"{code}.toml": f'course_code = "{code}"\n',
+        "README.md": f"# {code}\n",
+        "docs/notes.md": "notes\n",
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def make_client(server: FakeGitHub, pool_size: int, etag: bool) -> GitHubClient:
+    # 基准测试不读写 .build_cache 中的持久化 ETag 缓存
+    return GitHubClient(TOKEN, base_url=server.url, pool_size=pool_size,
+                        etag_cache=ETagCache(os.devnull) if etag else False)
+
+
+def run_push(server: FakeGitHub, jobs, concurrency: int, args) -> Dict[str, Any]:
+    client = make_client(server, max(10, concurrency), args.etag)
+    pusher = GitHubAPIPusher(TOKEN, org=ORG, client=client,
+                             use_git_data=args.git_data, fork_timeout=args.fork_timeout)
+    latencies: Dict[str, float] = {}
+    push_course = pusher.push_course_async
+
+    async def timed(course_code, *rest):
+        start = time.perf_counter()
+        try:
+            return await push_course(course_code, *rest)
+        finally:
+            latencies[course_code] = time.perf_counter() - start
+
+    pusher.push_course_async = timed
+    before = server.stats()
+    outcomes = {"success": 0, "unchanged": 0, "failed": 0}
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if not args.no_prefetch:
+                pusher.prefetch(job[0] for job in jobs)
+            for _, ok, _ in push_courses(pusher, jobs, concurrency):
+                outcomes["unchanged" if ok is None else ("success" if ok else "failed")] += 1
+        wall = time.perf_counter() - start
+    finally:
+        client.close()
+    return summarize("push", server, before, wall, list(latencies.values()), len(jobs), outcomes, concurrency)
+
+
+def run_deploy(server: FakeGitHub, jobs, concurrency: int, args) -> Dict[str, Any]:
+    client = make_client(server, max(10, concurrency), args.etag)
+    deployer = WorkflowDeployer(TOKEN, org=ORG, client=client)
+    template = (ROOT / "workflow_templates" / "format-readme-normal.yml")
+    workflow = template.read_text(encoding="utf-8") if template.exists() else "name: format\n"
+    latencies: List[float] = []
+    outcomes = {"success": 0, "failed": 0}
+    deploy_workflow = deployer.deploy_workflow_async
+
+    async def timed(*args):
+        start = time.perf_counter()
+        try:
+            return await deploy_workflow(*args)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    deployer.deploy_workflow_async = timed
+    before = server.stats()
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if not args.no_prefetch:
+                deployer.prefetch(job[0] for job in jobs)
+            for _, ok, _ in deploy_courses(deployer, [(job[0], "normal", workflow) for job in jobs], concurrency):
+                outcomes["success" if ok else "failed"] += 1
+        wall = time.perf_counter() - start
+    finally:
+        client.close()
+    return summarize("deploy", server, before, wall, latencies, len(jobs), outcomes, concurrency)
+
+
+def summarize(phase, server, before, wall, latencies, repos, outcomes, concurrency) -> Dict[str, Any]:
+    after = server.stats()
+    requests_made = after["requests"] - before["requests"]
+    routes = {
+        route: count - before["by_route"].get(route, 0)
+        for route, count in after["by_route"].items()
+        if count - before["by_route"].get(route, 0)
+    }
+    writes = sum(count for route, count in routes.items() if not route.startswith("GET "))
+    return {
+        "phase": phase,
+        "concurrency": concurrency,
+        "repos": repos,
+        "wall_seconds": round(wall, 3),
+        "requests": requests_made,
+        "requests_per_second": round(requests_made / wall, 1) if wall else 0.0,
+        "calls_per_repo": round(requests_made / repos, 2) if repos else 0.0,
+        "writes_per_repo": round(writes / repos, 2) if repos else 0.0,
+        "not_modified": after["not_modified"] - before["not_modified"],
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "outcomes": outcomes,
+        "routes": routes,
+    }
+
+
+def print_result(result: Dict[str, Any], label: str, verbose: bool):
+    outcomes = " ".join(f"{k}={v}" for k, v in result["outcomes"].items())
+    print(f"  {label:16s} 并发 {result['concurrency']:3d}  "
+          f"{result['wall_seconds']:7.2f}s  {result['requests_per_second']:7.1f} req/s  "
+          f"p50 {result['p50_ms']:7.1f}ms  p99 {result['p99_ms']:7.1f}ms  "
+          f"{result['calls_per_repo']:5.2f} 次/仓库 (写 {result['writes_per_repo']:.2f})  {outcomes}")
+    if verbose:
+        for route, count in sorted(result["routes"].items(), key=lambda item: -item[1]):
+            print(f"      {count:6d}  {route}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在本地 GitHub 替身服务器上测量推送与部署的性能")
+    parser.add_argument("--readme-output", default=str(ROOT / "readme_output"), help="课程输出目录")
+    parser.add_argument("--repos", type=int, default=0, help="只使用前 N 个课程（默认全部）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="要比较的并发数")
+    parser.add_argument("--latency", type=float, default=0.02, help="每个请求的服务器延迟（秒，默认 0.02）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机附加延迟上限（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="请求返回 502 的概率")
+    parser.add_argument("--secondary-rate", type=float, default=0.0, help="请求触发次级速率限制的概率")
+    parser.add_argument("--rate-limit", type=int, default=100000, help="每个资源的速率限制额度")
+    parser.add_argument("--no-write", action="store_true", help="令牌没有组织写权限（走 Fork 路径）")
+    parser.add_argument("--fork-delay", type=float, default=0.0, help="新建 Fork 可用前的延迟（秒）")
+    parser.add_argument("--fork-timeout", type=float, default=30.0, help="等待 Fork 就绪的期限（秒）")
+    parser.add_argument("--git-data", action="store_true", help="使用单提交模式推送")
+    parser.add_argument("--no-prefetch", action="store_true", help="不做 GraphQL 批量预取")
+    parser.add_argument("--etag", action="store_true", help="启用（仅内存中的）ETag 条件请求")
+    parser.add_argument("--skip-deploy", action="store_true", help="只测推送")
+    parser.add_argument("--verbose", action="store_true", help="打印每类请求的次数")
+    parser.add_argument("--json", help="把结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    jobs = collect_jobs(Path(args.readme_output), args.repos)
+    if not jobs:
+        print(f"❌ 错误: {args.readme_output} 中没有课程输出，请先运行转换脚本")
+        sys.exit(1)
+
+    print("=" * 70)
+    print("推送 / 部署基准测试（本地替身服务器）")
+    print("=" * 70)
+    print(f"仓库数: {len(jobs)}  延迟: {args.latency * 1000:.0f}ms  失败率: {args.failure_rate}  "
+          f"写权限: {'否' if args.no_write else '是'}  单提交: {'是' if args.git_data else '否'}")
+    print()
+
+    results = []
+    for concurrency in args.concurrency:
+        # 每个并发数使用一个全新的服务器，保证起点相同
+        server = FakeGitHub(
+            repos={job[0]: initial_repo_files(job[0]) for job in jobs},
+            latency=args.latency,
+            jitter=args.jitter,
+            failure_rate=args.failure_rate,
+            secondary_rate=args.secondary_rate,
+            write_access=not args.no_write,
+            fork_delay=args.fork_delay,
+            rate_limit=args.rate_limit,
+        ).start()
+        try:
+            phases = [("push (首次)", run_push), ("push (未变化)", run_push)]
+            if not args.skip_deploy:
+                phases += [("deploy (首次)", run_deploy), ("deploy (未变化)", run_deploy)]
+            for label, runner in phases:
+                # 模拟维护者在两次运行之间合并了自动创建的 PR
+                server.merge_pulls()
+                result = runner(server, jobs, concurrency, args)
+                result["label"] = label
+                print_result(result, label, args.verbose)
+                results.append(result)
+        finally:
+            server.stop()
+        print()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "options": vars(args),
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
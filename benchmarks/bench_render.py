@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染基准测试
+按 1x / 10x / 100x 等倍数生成合成的课程 TOML 语料（更多教师、更长的评价、更多条目），
+分别测量 解析 / 构建文档模型 / 格式化 / 渲染 / 写出 五个阶段的耗时。
+语料和输出都写在临时目录中，不会改动仓库里的课程文件。
+
+每次运行的结果保存到 benchmarks/results/render-<提交>-<时间>.json，
+可以用 --compare 与之前某次提交的结果对比。
+
+使用方法：
+    python benchmarks/bench_render.py                        # 默认: 120 门课程, 倍数 1 10 100
+    python benchmarks/bench_render.py --scales 1 10 --repeat 5
+    python benchmarks/bench_render.py --compare benchmarks/results/render-abc1234-20250101-120000.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from course_schema import build_document
+from toml_loader import loads_with_repair
+import format_normal_repo_toml_standard as format_normal
+import format_multi_project_toml_standard as format_multi
+import convert_normal_repo_toml_to_readme as convert_normal
+import convert_multi_project_toml_to_readme as convert_multi
+from output_writer import MATERIALIZE_FALLBACKS, TOML_OUTPUT_MODE, materialize, write_if_changed
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+STAGES = ("parse", "model", "format", "render", "write")
+
+# 合成文本素材
+WORDS = ("课程", "作业", "实验", "考试", "老师", "讲得", "比较", "清楚", "难度", "适中", "给分",
+         "宽松", "建议", "提前", "复习", "往年题", "重点", "平时分", "签到", "大作业", "报告",
+         "课堂", "互动", "教材", "参考", "推荐", "代码", "调试", "仿真", "答辩")
+NAMES = ("张伟", "王芳", "李娜", "刘洋", "陈静", "杨磊", "赵敏", "黄涛", "周杰", "吴霞")
+SECTIONS = ("course", "homework", "exam", "lab")
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(WORDS) for _ in range(length)) + "。"
+
+
+def paragraph(rng: random.Random, scale: int, latex: bool = False) -> str:
+    """生成一段评价：若干句子、Markdown 列表、裸 URL，可选 LaTeX 公式（触发反斜杠修复）"""
+    lines = [sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(1, 2 + scale // 5))]
+    if rng.random() < 0.5:
+        lines.append("")
+        lines.extend(f"- {sentence(rng, rng.randint(3, 8))}" for _ in range(rng.randint(2, 4)))
+    if rng.random() < 0.4:
+        lines.append(f"资料见 https://example.com/{rng.randint(1000, 9999)}/notes")
+    if latex:
+        lines.append(r"公式 $\alpha + \beta = \frac{1}{2}$")
+    return "\n".join(lines)
+
+
+def author(rng: random.Random) -> Dict[str, str]:
+    name = rng.choice(NAMES)
+    return {"name": name, "link": f"https://github.com/user{rng.randint(1, 500)}",
+            "date": f"20{rng.randint(19, 25)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"}
+
+
+def make_normal(code: str, scale: int, rng: random.Random) -> Dict[str, Any]:
+    """生成 normal 类型课程；倍数越大，教师、评价和各栏目条目越多"""
+    latex = rng.random() < 0.1
+    data: Dict[str, Any] = {
+        "course_name": f"合成课程{code}",
+        "repo_type": "normal",
+        "course_code": code,
+        "description": paragraph(rng, scale),
+        "lecturers": [
+            {"name": rng.choice(NAMES) + str(i),
+             "reviews": [{"content": paragraph(rng, scale, latex and j == 0), "author": author(rng)}
+                         for j in range(rng.randint(1, 2 + scale // 4))]}
+            for i in range(max(1, 2 * scale))
+        ],
+        "textbooks": [
+            {"title": f"教材{i}", "book_author": rng.choice(NAMES), "publisher": "高等教育出版社",
+             "edition": f"第{rng.randint(1, 5)}版"}
+            for i in range(scale)
+        ],
+        "online_resources": [
+            {"title": f"资源{i}", "url": f"https://example.org/res/{i}", "description": sentence(rng, 6)}
+            for i in range(scale)
+        ],
+    }
+    for section in SECTIONS:
+        data[section] = [{"content": paragraph(rng, scale), "author": author(rng)} for _ in range(scale)]
+    data["advice"] = [{"content": paragraph(rng, scale)} for _ in range(scale)]
+    data["schedule"] = [{"content": paragraph(rng, scale)} for _ in range((scale + 1) // 2)]
+    data["related_links"] = [{"content": f"https://example.net/link/{i}"} for i in range(scale)]
+    data["misc"] = [{"topic": f"杂项{i}", "content": paragraph(rng, scale), "author": author(rng)}
+                    for i in range(scale)]
+    return data
+
+
+def make_multi(code: str, scale: int, rng: random.Random) -> Dict[str, Any]:
+    """生成 multi-project 类型仓库；倍数越大，包含的课程和教师越多"""
+    return {
+        "course_name": f"合成混合仓库{code}",
+        "repo_type": "multi-project",
+        "course_code": code,
+        "description": sentence(rng, 10),
+        "courses": [
+            {"name": f"子课程{i}", "code": f"{code}{i:03d}",
+             "reviews": [{"topic": "课程概况", "content": paragraph(rng, scale), "author": author(rng)}
+                         for _ in range(rng.randint(1, 3))],
+             "teachers": [{"name": rng.choice(NAMES),
+                           "reviews": [{"content": paragraph(rng, scale), "author": author(rng)}]}
+                          for _ in range(rng.randint(0, 2))]}
+            for i in range(4 * scale)
+        ],
+        "misc": [{"topic": "说明", "content": paragraph(rng, scale), "author": author(rng)}],
+    }
+
+
+def build_corpus(directory: Path, courses: int, scale: int, seed: int) -> List[Path]:
+    """用仓库自身的格式化器把合成数据写成标准 TOML，约每 25 门课程中有一个 multi-project 仓库"""
+    rng = random.Random(seed * 1000 + scale)
+    paths = []
+    for i in range(courses):
+        code = f"SYN{i:04d}"
+        if i % 25 == 24:
+            text = format_multi.format_toml_content(make_multi(code, scale, rng))
+        else:
+            text = format_normal.format_toml_content(make_normal(code, scale, rng))
+        path = directory / f"{code}.toml"
+        path.write_text(text, encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def time_stage(func: Callable[[], Any], repeat: int) -> float:
+    """重复执行取最短耗时，减少偶然抖动的影响"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_scale(
+    workdir: Path,
+    courses: int,
+    scale: int,
+    repeat: int,
+    seed: int,
+    toml_mode: str = TOML_OUTPUT_MODE
+) -> Dict[str, Any]:
+    source_dir = workdir / f"source-x{scale}"
+    output_dir = workdir / f"output-x{scale}"
+    source_dir.mkdir()
+    paths = build_corpus(source_dir, courses, scale, seed)
+    source_bytes = sum(p.stat().st_size for p in paths)
+
+    # 各阶段的输入事先准备好，计时只覆盖该阶段本身
+    texts = [p.read_text(encoding="utf-8") for p in paths]
+    documents = [loads_with_repair(text) for text in texts]
+    repaired_count = sum(1 for _, repaired in documents if repaired is not None)
+    # 与 build.py 相同：每个文件的文档模型只构建一次，格式化与渲染共用
+    models = [build_document(data) for data, _ in documents]
+
+    def formatter(data):
+        return format_multi if data.get("repo_type") == "multi-project" else format_normal
+
+    def renderer(data):
+        return convert_multi if data.get("repo_type") == "multi-project" else convert_normal
+
+    def parse():
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                loads_with_repair(f.read())
+
+    def model():
+        for data, _ in documents:
+            build_document(data)
+
+    def format_all():
+        for (data, _), doc in zip(documents, models):
+            formatter(data).format_toml_content(doc)
+
+    def render():
+        for path, (data, _), doc in zip(paths, documents, models):
+            renderer(data).generate_markdown(doc, path.name)
+
+    markdowns = [renderer(data).generate_markdown(doc, path.name)
+                 for path, (data, _), doc in zip(paths, documents, models)]
+    output_bytes = sum(len(md.encode("utf-8")) for md in markdowns)
+
+    runs = iter(range(repeat))
+
+    def write():
+        # 与转换脚本相同：write_if_changed 写出 README.md，readme.toml 按 toml_mode 由源 TOML 生成；
+        # 每次重复写入新的目录，测量的是完整生成而不是内容未变化时的跳过
+        target = output_dir / f"run{next(runs)}"
+        for path, (_, repaired), markdown in zip(paths, documents, markdowns):
+            course_dir = target / path.stem
+            os.makedirs(course_dir, exist_ok=True)
+            write_if_changed(str(course_dir / "README.md"), markdown)
+            if repaired is None:
+                materialize(str(path), str(course_dir / "readme.toml"), toml_mode)
+            else:
+                write_if_changed(str(course_dir / "readme.toml"), repaired)
+
+    timings = {
+        "parse": time_stage(parse, repeat),
+        "model": time_stage(model, repeat),
+        "format": time_stage(format_all, repeat),
+        "render": time_stage(render, repeat),
+        "write": time_stage(write, repeat),
+    }
+    stages = {}
+    for stage, seconds in timings.items():
+        volume = output_bytes if stage in ("render", "write") else source_bytes
+        stages[stage] = {
+            "seconds": round(seconds, 4),
+            "ms_per_doc": round(seconds * 1000 / courses, 3),
+            "mb_per_second": round(volume / seconds / 1e6, 2) if seconds else 0.0,
+        }
+    return {
+        "scale": scale,
+        "courses": courses,
+        "source_bytes": source_bytes,
+        "output_bytes": output_bytes,
+        "repaired": repaired_count,
+        "total_seconds": round(sum(timings.values()), 4),
+        "stages": stages,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_result(result: Dict[str, Any]):
+    size = result["source_bytes"] / 1e6
+    print(f"  x{result['scale']:<4d} {result['courses']} 个文件, 源 {size:.1f} MB, "
+          f"README {result['output_bytes'] / 1e6:.1f} MB, 需修复 {result['repaired']} 个, "
+          f"合计 {result['total_seconds']:.3f}s")
+    for stage in STAGES:
+        entry = result["stages"][stage]
+        print(f"      {stage:7s} {entry['seconds']:8.3f}s  {entry['ms_per_doc']:9.3f} ms/文件  "
+              f"{entry['mb_per_second']:8.2f} MB/s")
+
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {entry["scale"]: entry for entry in baseline.get("results", [])}
+    print(f"与 {baseline.get('revision', '?')} ({baseline_path}) 对比:")
+    for result in results:
+        old = previous.get(result["scale"])
+        if old is None or old.get("courses") != result["courses"]:
+            print(f"  x{result['scale']:<4d} [SKIP] 基线中没有相同规模的结果")
+            continue
+        cells = []
+        for stage in STAGES + ("total",):
+            if stage != "total" and stage not in old["stages"]:
+                # 基线早于该阶段的引入
+                continue
+            new_s = result["total_seconds"] if stage == "total" else result["stages"][stage]["seconds"]
+            old_s = old["total_seconds"] if stage == "total" else old["stages"][stage]["seconds"]
+            change = (new_s - old_s) / old_s * 100 if old_s else 0.0
+            cells.append(f"{stage} {change:+6.1f}%")
+        print(f"  x{result['scale']:<4d} " + "  ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在合成语料上分阶段测量解析、格式化、渲染与写出的性能")
+    parser.add_argument("--courses", type=int, default=120, help="每个倍数生成的课程文件数（默认 120）")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="语料倍数（默认 1 10 100）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数，取最短耗时（默认 3）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子（相同种子生成相同语料）")
+    parser.add_argument("--toml-mode", choices=sorted(MATERIALIZE_FALLBACKS), default=TOML_OUTPUT_MODE,
+                        help="写出阶段 readme.toml 的生成方式（默认取 TOML_OUTPUT_MODE，与转换脚本相同）")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    parser.add_argument("--json", help="结果保存路径（默认 benchmarks/results/render-<提交>-<时间>.json）")
+    parser.add_argument("--no-save", action="store_true", help="不保存结果")
+    args = parser.parse_args()
+
+    revision = git_revision()
+    print("=" * 70)
+    print("渲染基准测试（合成语料）")
+    print("=" * 70)
+    print(f"提交: {revision}  课程数: {args.courses}  倍数: {' '.join(map(str, args.scales))}  "
+          f"重复: {args.repeat}  readme.toml: {args.toml_mode}")
+    print()
+
+    results = []
+    workdir = Path(tempfile.mkdtemp(prefix="bench_render_"))
+    try:
+        for scale in args.scales:
+            result = run_scale(workdir, args.courses, scale, max(1, args.repeat), args.seed, args.toml_mode)
+            print_result(result)
+            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print()
+
+    if args.compare:
+        print_comparison(results, args.compare)
+        print()
+
+    if not args.no_save:
+        output = Path(args.json) if args.json else \
+            RESULTS_DIR / f"render-{revision}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({
+                "revision": revision,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": sys.version.split()[0],
+                "options": vars(args),
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 GitHub API 替身服务器（仅用于基准测试）
+在内存中模拟推送和部署用到的 REST / Git Data / GraphQL 接口：
+- 仓库、分支、提交、树、文件内容、Fork、Pull Request
+- X-RateLimit-* 响应头与额度耗尽、ETag 条件请求
+- 可注入的延迟、5xx 失败与次级速率限制
+
+使用方法：
+    server = FakeGitHub(repos={"AUTO1001": {"readme.toml": "..."}}, latency=0.05)
+    server.start()
+    ... 把客户端的 base_url 指向 server.url ...
+    server.stop()
+"""
+
+import re
+import json
+import time
+import base64
+import random
+import hashlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+
+# 替身服务器上的组织名与令牌对应的用户名
+ORG = "bench-org"
+LOGIN = "bench-user"
+RATE_LIMIT = 5000
+
+_GRAPHQL_REPO_PATTERN = re.compile(r'(r\d+): repository\(owner: "([^"]+)", name: "([^"]+)"\)')
+_GRAPHQL_OBJECT_PATTERN = re.compile(r'object\(expression: "HEAD:([^"]+)"\)')
+
+
+def _sha(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def blob_sha(data: bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FakeRepo:
+    def __init__(self, owner: str, name: str, head: str, fork_of: Optional["FakeRepo"] = None, ready_at: float = 0.0):
+        self.owner = owner
+        self.name = name
+        self.default_branch = "main"
+        self.branches = {"main": head}
+        self.fork_of = fork_of
+        # Fork 在 ready_at 之前不可见（模拟 GitHub 异步创建 Fork）
+        self.ready_at = ready_at
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "full_name": f"{self.owner}/{self.name}",
+            "default_branch": self.default_branch,
+            "fork": self.fork_of is not None,
+        }
+
+
+class _Server(ThreadingHTTPServer):
+    # 高并发时几十个连接同时建立，默认的 listen 队列（5）溢出后客户端要等 SYN 重传（约 1 秒）
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeGitHub:
+    def __init__(
+        self,
+        repos: Optional[Dict[str, Dict[str, str]]] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        secondary_rate: float = 0.0,
+        write_access: bool = True,
+        fork_delay: float = 0.0,
+        rate_limit: int = RATE_LIMIT,
+        seed: int = 0
+    ):
+        """
+        Args:
+            repos: 组织下的仓库：仓库名 -> {路径: 文本内容}
+            latency: 每个请求的固定延迟（秒）
+            jitter: 在固定延迟上叠加的随机延迟上限（秒）
+            failure_rate: 请求直接返回 502 的概率（请求不会被执行）
+            secondary_rate: 请求触发次级速率限制（403 + Retry-After）的概率
+            write_access: 令牌是否有组织仓库的写权限（False 时推送走 Fork 路径）
+            fork_delay: 新建 Fork 需要多久才可用（秒）
+            rate_limit: 每个资源（core/graphql）的额度
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.secondary_rate = secondary_rate
+        self.write_access = write_access
+        self.fork_delay = fork_delay
+        self.rate_limit = rate_limit
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # 全局对象库（同一 Fork 网络共享对象）
+        self.blobs: Dict[str, bytes] = {}
+        self.trees: Dict[str, Dict[str, str]] = {}
+        self.commits: Dict[str, Dict[str, Any]] = {}
+        self.repos: Dict[Tuple[str, str], FakeRepo] = {}
+        self.pulls: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._pull_number = 0
+
+        self.reset_at = int(time.time()) + 3600
+        self.remaining = {"core": rate_limit, "graphql": rate_limit}
+
+        # 统计
+        self.requests = 0
+        self.not_modified = 0
+        self.by_route: Counter = Counter()
+        self.by_repo: Counter = Counter()
+        self.by_status: Counter = Counter()
+
+        for name, files in (repos or {}).items():
+            self.add_repo(name, files)
+
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # ------------------------------------------------------------------
+    # 对象库
+
+    def _put_blob(self, data: bytes) -> str:
+        sha = blob_sha(data)
+        self.blobs[sha] = data
+        return sha
+
+    def _put_tree(self, files: Dict[str, str]) -> str:
+        sha = _sha("tree", sorted(files.items()))
+        self.trees[sha] = dict(files)
+        return sha
+
+    def _put_commit(self, tree: str, parents, message: str) -> str:
+        sha = _sha("commit", tree, parents, message, len(self.commits))
+        self.commits[sha] = {"tree": tree, "parents": list(parents), "message": message}
+        return sha
+
+    def _descends(self, sha: str, ancestor: str) -> bool:
+        """sha 是否为 ancestor 或其后代（用于判断引用更新是否为快进）"""
+        pending, seen = [sha], set()
+        while pending:
+            current = pending.pop()
+            if current == ancestor:
+                return True
+            if current not in seen:
+                seen.add(current)
+                pending.extend(self.commits[current]["parents"])
+        return False
+
+    def add_repo(self, name: str, files: Dict[str, str], owner: str = ORG) -> FakeRepo:
+        with self._lock:
+            tree = self._put_tree({p: self._put_blob(c.encode()) for p, c in files.items()})
+            repo = FakeRepo(owner, name, self._put_commit(tree, [], "Initial commit"))
+            self.repos[(owner, name)] = repo
+            return repo
+
+    def files(self, name: str, owner: str = ORG, branch: Optional[str] = None) -> Dict[str, str]:
+        """读取某分支上的全部文件（供基准测试检查结果）"""
+        repo = self.repos[(owner, name)]
+        tree = self.trees[self.commits[repo.branches[branch or repo.default_branch]]["tree"]]
+        return {path: self.blobs[sha].decode() for path, sha in tree.items()}
+
+    def _root_listing(self, tree_sha: str) -> Dict[str, Any]:
+        """根目录树（与 REST git/trees 返回格式一致）"""
+        entries, dirs = [], {}
+        for path, sha in sorted(self.trees[tree_sha].items()):
+            if "/" in path:
+                top, rest = path.split("/", 1)
+                dirs.setdefault(top, {})[rest] = sha
+            else:
+                entries.append({"path": path, "mode": "100644", "type": "blob", "sha": sha})
+        for top, sub in dirs.items():
+            entries.append({"path": top, "mode": "040000", "type": "tree", "sha": _sha("tree", sorted(sub.items()))})
+        return {"sha": tree_sha, "tree": entries, "truncated": False}
+
+    def _resolve_tree(self, repo: FakeRepo, tree_ish: str) -> Optional[str]:
+        if tree_ish in self.trees:
+            return tree_ish
+        if tree_ish in self.commits:
+            return self.commits[tree_ish]["tree"]
+        if tree_ish in repo.branches:
+            return self.commits[repo.branches[tree_ish]]["tree"]
+        return None
+
+    # ------------------------------------------------------------------
+    # 服务器
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGitHub":
+        server = _Server(("127.0.0.1", 0), _make_handler(self))
+        self._server = server
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def merge_pulls(self) -> int:
+        """合并所有待处理的 PR（把基础分支指向 PR 分支的最新提交），返回合并数"""
+        with self._lock:
+            merged = 0
+            for pr in self.pulls.values():
+                head = pr["head_repo"].branches.get(pr["head_branch"])
+                if head:
+                    pr["base_repo"].branches[pr["base"]] = head
+                    merged += 1
+            self.pulls.clear()
+            return merged
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "not_modified": self.not_modified,
+                "by_route": dict(self.by_route),
+                "by_status": dict(self.by_status),
+                "by_repo": dict(self.by_repo),
+                "pulls": len(self.pulls),
+                "rate_remaining": dict(self.remaining),
+            }
+
+    # ------------------------------------------------------------------
+    # 请求处理
+
+    def handle(self, method: str, raw_path: str, body: Optional[Dict], headers) -> Tuple[int, Dict[str, str], Any]:
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        split = urlsplit(raw_path)
+        path = unquote(split.path)
+        query = {k: v[0] for k, v in parse_qs(split.query).items()}
+        resource = "graphql" if path == "/graphql" else "core"
+
+        with self._lock:
+            self.requests += 1
+            route, repo_name = _route_of(method, path)
+            self.by_route[route] += 1
+            if repo_name:
+                self.by_repo[repo_name] += 1
+
+            roll = self._random.random()
+            if roll < self.failure_rate:
+                return self._finish(502, {"message": "Bad Gateway"}, resource, count=False)
+            if roll < self.failure_rate + self.secondary_rate:
+                return self._finish(403, {
+                    "message": "You have exceeded a secondary rate limit. Please wait a few minutes before you try again."
+                }, resource, count=False, extra={"Retry-After": "1"})
+            if self.remaining[resource] <= 0:
+                return self._finish(403, {"message": "API rate limit exceeded"}, resource, count=False)
+
+            status, payload = self._dispatch(method, path, query, body)
+            if method == "GET" and status == 200:
+                etag = '"%s"' % hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:20]
+                if headers.get("If-None-Match") == etag:
+                    # 304 不计入额度
+                    self.not_modified += 1
+                    return self._finish(304, None, resource, count=False, extra={"ETag": etag})
+                return self._finish(status, payload, resource, extra={"ETag": etag})
+            return self._finish(status, payload, resource)
+
+    def _finish(self, status, payload, resource, count=True, extra=None):
+        if count:
+            self.remaining[resource] = max(0, self.remaining[resource] - 1)
+        self.by_status[status] += 1
+        out = {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(self.remaining[resource]),
+            "X-RateLimit-Reset": str(self.reset_at),
+            "X-RateLimit-Resource": resource,
+        }
+        out.update(extra or {})
+        return status, out, payload
+
+    def _repo(self, owner: str, name: str) -> Optional[FakeRepo]:
+        repo = self.repos.get((owner, name))
+        if repo is None or repo.ready_at > time.time():
+            return None
+        return repo
+
+    def _can_write(self, repo: FakeRepo) -> bool:
+        return self.write_access or repo.owner == LOGIN
+
+    def _dispatch(self, method, path, query, body):
+        if path == "/user" and method == "GET":
+            return 200, {"login": LOGIN}
+        if path == "/user/repos" and method == "GET":
+            mine = [r.info() for (owner, _), r in sorted(self.repos.items()) if owner == LOGIN]
+            page, per_page = int(query.get("page", 1)), int(query.get("per_page", 30))
+            return 200, mine[(page - 1) * per_page:page * per_page]
+        if path == "/graphql" and method == "POST":
+            return self._graphql((body or {}).get("query", ""))
+
+        m = re.match(r"^/repos/([^/]+)/([^/]+)(?:/(.*))?$", path)
+        if not m:
+            return 404, {"message": "Not Found"}
+        owner, name, rest = m.group(1), m.group(2), m.group(3) or ""
+        repo = self._repo(owner, name)
+        if repo is None:
+            return 404, {"message": "Not Found"}
+
+        if rest == "" and method == "GET":
+            return 200, repo.info()
+        if rest == "forks" and method == "POST":
+            return self._fork(repo)
+        if rest == "pulls" and method == "POST":
+            return self._pull(repo, body or {})
+
+        writing = method in ("POST", "PUT", "PATCH", "DELETE")
+        if writing and not self._can_write(repo):
+            return 403, {"message": "Resource not accessible by integration"}
+
+        if rest.startswith("git/refs/heads/"):
+            branch = rest[len("git/refs/heads/"):]
+            if method == "GET":
+                if branch not in repo.branches:
+                    return 404, {"message": "Not Found"}
+                return 200, {"ref": f"refs/heads/{branch}", "object": {"sha": repo.branches[branch], "type": "commit"}}
+            if method == "PATCH":
+                sha = (body or {}).get("sha")
+                if branch not in repo.branches or sha not in self.commits:
+                    return 422, {"message": "Reference does not exist"}
+                if not (body or {}).get("force") and not self._descends(sha, repo.branches[branch]):
+                    return 422, {"message": "Update is not a fast forward"}
+                repo.branches[branch] = sha
+                return 200, {"ref": f"refs/heads/{branch}", "object": {"sha": sha}}
+        if rest == "git/refs" and method == "POST":
+            ref, sha = (body or {}).get("ref", ""), (body or {}).get("sha")
+            branch = ref[len("refs/heads/"):]
+            if branch in repo.branches:
+                return 422, {"message": "Reference already exists"}
+            if sha not in self.commits:
+                return 422, {"message": "Object does not exist"}
+            repo.branches[branch] = sha
+            return 201, {"ref": ref, "object": {"sha": sha}}
+        if rest.startswith("git/trees/") and method == "GET":
+            tree = self._resolve_tree(repo, rest[len("git/trees/"):])
+            if tree is None:
+                return 404, {"message": "Not Found"}
+            return 200, self._root_listing(tree)
+        if rest == "git/trees" and method == "POST":
+            return self._create_tree(body or {})
+        if rest == "git/commits" and method == "POST":
+            tree, parents = (body or {}).get("tree"), (body or {}).get("parents", [])
+            if tree not in self.trees or any(p not in self.commits for p in parents):
+                return 422, {"message": "Invalid tree or parent"}
+            return 201, {"sha": self._put_commit(tree, parents, (body or {}).get("message", ""))}
+        if rest.startswith("contents/"):
+            return self._contents(repo, method, rest[len("contents/"):], query, body)
+        return 404, {"message": "Not Found"}
+
+    def _create_tree(self, body):
+        base = body.get("base_tree")
+        if base and base not in self.trees:
+            return 422, {"message": "Invalid base_tree"}
+        files = dict(self.trees.get(base, {}))
+        for entry in body.get("tree", []):
+            if "content" in entry:
+                files[entry["path"]] = self._put_blob(entry["content"].encode())
+            elif entry.get("sha") is None:
+                files.pop(entry["path"], None)
+            else:
+                files[entry["path"]] = entry["sha"]
+        return 201, self._root_listing(self._put_tree(files))
+
+    def _contents(self, repo, method, file_path, query, body):
+        branch = (body or {}).get("branch") or query.get("ref") or repo.default_branch
+        if branch not in repo.branches:
+            return 404, {"message": "No commit found for the ref"}
+        head = repo.branches[branch]
+        files = self.trees[self.commits[head]["tree"]]
+        current = files.get(file_path)
+
+        if method == "GET":
+            if current is None:
+                return 404, {"message": "Not Found"}
+            return 200, {
+                "type": "file",
+                "path": file_path,
+                "sha": current,
+                "encoding": "base64",
+                "content": base64.b64encode(self.blobs[current]).decode(),
+            }
+        if method == "PUT":
+            if current is not None and (body or {}).get("sha") != current:
+                return (409 if (body or {}).get("sha") else 422), {"message": "sha does not match"}
+            files = dict(files)
+            files[file_path] = self._put_blob(base64.b64decode((body or {}).get("content", "")))
+        elif method == "DELETE":
+            # 与 GitHub 一致：必须在请求体中提供 message 和 sha
+            if current is None:
+                return 404, {"message": "Not Found"}
+            if not body or body.get("sha") != current:
+                return 422, {"message": "Invalid request. \"sha\" wasn't supplied."}
+            files = dict(files)
+            files.pop(file_path)
+        else:
+            return 404, {"message": "Not Found"}
+        commit = self._put_commit(self._put_tree(files), [head], (body or {}).get("message", ""))
+        repo.branches[branch] = commit
+        return (200 if current else 201), {"content": {"path": file_path, "sha": files.get(file_path)}, "commit": {"sha": commit}}
+
+    def _fork(self, upstream: FakeRepo):
+        fork = self.repos.get((LOGIN, upstream.name))
+        if fork is None:
+            fork = FakeRepo(LOGIN, upstream.name, upstream.branches[upstream.default_branch],
+                            fork_of=upstream, ready_at=time.time() + self.fork_delay)
+            self.repos[(LOGIN, upstream.name)] = fork
+        return 202, fork.info()
+
+    def _pull(self, repo: FakeRepo, body):
+        head = body.get("head", "")
+        head_owner, _, head_branch = head.rpartition(":")
+        head_repo = self._repo(head_owner, repo.name) if head_owner else repo
+        if head_repo is None or head_branch not in head_repo.branches or body.get("base") not in repo.branches:
+            return 422, {"message": "Validation Failed"}
+        key = (f"{repo.owner}/{repo.name}", head)
+        if key in self.pulls:
+            return 422, {"message": f"A pull request already exists for {head}."}
+        self._pull_number += 1
+        pr = {"number": self._pull_number, "html_url": f"https://github.invalid/{repo.owner}/{repo.name}/pull/{self._pull_number}"}
+        self.pulls[key] = dict(pr, base_repo=repo, base=body["base"], head_repo=head_repo, head_branch=head_branch)
+        return 201, pr
+
+    def _graphql(self, query: str):
+        obj = _GRAPHQL_OBJECT_PATTERN.search(query)
+        object_path = obj.group(1) if obj else None
+        data, errors = {}, []
+        for alias, owner, name in _GRAPHQL_REPO_PATTERN.findall(query):
+            repo = self._repo(owner, name)
+            if repo is None:
+                data[alias] = None
+                errors.append({"type": "NOT_FOUND", "path": [alias]})
+                continue
+            head = repo.branches[repo.default_branch]
+            tree = self.commits[head]["tree"]
+            listing = self._root_listing(tree)
+            blob = self.trees[tree].get(object_path) if object_path else None
+            data[alias] = {
+                "defaultBranchRef": {
+                    "name": repo.default_branch,
+                    "target": {
+                        "oid": head,
+                        "tree": {
+                            "oid": tree,
+                            "entries": [{"name": e["path"], "oid": e["sha"], "type": e["type"]} for e in listing["tree"]],
+                        },
+                    },
+                },
+                "workflow": {"oid": blob} if blob else None,
+            }
+        result = {"data": data}
+        if errors:
+            result["errors"] = errors
+        return 200, result
+
+
+def _route_of(method: str, path: str) -> Tuple[str, Optional[str]]:
+    """把请求归类为 "METHOD /repos/:owner/:repo/..." 形式的路由，并取出仓库名"""
+    m = re.match(r"^/repos/[^/]+/([^/]+)(?:/(.*))?$", path)
+    if not m:
+        return f"{method} {path}", None
+    rest = m.group(2) or ""
+    if rest.startswith("contents/"):
+        rest = "contents/:path"
+    elif rest.startswith("git/refs/heads/"):
+        rest = "git/refs/heads/:branch"
+    elif rest.startswith("git/trees/"):
+        rest = "git/trees/:sha"
+    return f"{method} /repos/:owner/:repo" + (f"/{rest}" if rest else ""), m.group(1)
+
+
+def _make_handler(fake: FakeGitHub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # 长连接上响应头与正文分两次写出时，Nagle 算法与延迟 ACK 会让每个请求多等约 40ms；
+        # 缓冲写入使头和正文一次发出（handle_one_request 结束时 flush），并关闭 Nagle
+        wbufsize = -1
+        disable_nagle_algorithm = True
+
+        def _handle(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                body = None
+            status, headers, payload = fake.handle(self.command, self.path, body, self.headers)
+            data = b"" if payload is None else json.dumps(payload).encode()
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            if data:
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一条命令完成整条构建流水线
+把格式化、README 生成、工作流模板生成、上传和工作流部署建模为按课程执行的阶段依赖图：
+- templates: 生成工作流模板（全局阶段）
+- format:    格式化源 TOML
+- render:    生成 README.md 并写出 readme.toml
+- push:      上传文件并创建 PR（需要 GITHUB_TOKEN）
+- deploy:    部署工作流文件（需要 GITHUB_TOKEN）
+
+每个源目录只扫描一次，每门课程在同一进程中依次流经 format → render → 写出，
+格式化后的文本直接在内存中解析并用于渲染，不再重新读取文件。
+各阶段的输入指纹记录在构建清单中，只有输入发生变化（或上游阶段重新执行）的阶段才会执行。
+
+使用方法：
+    python build.py                     # 格式化 + 生成 README
+    python build.py --push              # 另外上传到 GitHub
+    python build.py --deploy            # 另外部署工作流
+    python build.py --stages render     # 只执行指定阶段（及其依赖）
+    python build.py --only AUTO1001     # 只处理指定课程
+    python build.py --force             # 忽略构建清单，全部重新执行
+"""
+
+import os
+import sys
+import argparse
+from graphlib import TopologicalSorter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import format_normal_repo_toml_standard as format_normal
+import format_multi_project_toml_standard as format_multi
+import convert_normal_repo_toml_to_readme as convert_normal
+import convert_multi_project_toml_to_readme as convert_multi
+import generate_workflows
+from build_manifest import BuildManifest, renderer_version
+from course_schema import build_document, repo_type_of
+from instrumentation import TRACE_PATH, recorder
+from output_writer import MATERIALIZE_FALLBACKS, TOML_OUTPUT_MODE, materialize, write_if_changed
+from toml_loader import load_toml, loads_with_repair, prime_cache
+
+# 目录配置
+OUTPUT_DIR = "./readme_output"
+WORKFLOWS_DIR = "./workflow_templates"
+
+# 源目录 -> (仓库类型, 格式化模块, 转换模块)
+SOURCES = [
+    (format_normal.DOWNLOADED_FILES_DIR, "normal", format_normal, convert_normal),
+    (format_multi.DOWNLOADED_FILES_DIR, "multi-project", format_multi, convert_multi),
+]
+
+# 阶段依赖图：阶段 -> 依赖的上游阶段
+STAGE_DEPS = {
+    "templates": (),
+    "format": (),
+    "render": ("format",),
+    "push": ("render",),
+    "deploy": ("templates", "render"),
+}
+# 只执行一次、不区分课程的阶段
+GLOBAL_STAGES = {"templates"}
+DEFAULT_STAGES = ("format", "render")
+
+WORKFLOW_TEMPLATES = {
+    "normal": "format-readme-normal.yml",
+    "multi-project": "format-readme-multi-project.yml",
+}
+
+
+def resolve_stages(requested: Iterable[str]) -> List[str]:
+    """补全所请求阶段的所有上游依赖，并按拓扑顺序返回"""
+    selected = set()
+    pending = list(requested)
+    while pending:
+        stage = pending.pop()
+        if stage not in STAGE_DEPS:
+            raise ValueError(f"未知阶段: {stage}")
+        if stage not in selected:
+            selected.add(stage)
+            pending.extend(STAGE_DEPS[stage])
+
+    graph = {stage: [d for d in STAGE_DEPS[stage] if d in selected] for stage in selected}
+    return list(TopologicalSorter(graph).static_order())
+
+
+def discover_courses(only: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """扫描源目录（每个目录只扫描一次），返回课程上下文列表"""
+    only = set(only or ())
+    courses = []
+    for source_dir, repo_type, formatter, converter in SOURCES:
+        for toml_path in sorted(Path(source_dir).glob("*.toml")):
+            if only and toml_path.stem not in only:
+                continue
+            courses.append({
+                "path": str(toml_path),
+                "name": toml_path.name,
+                "repo_type": repo_type,
+                "formatter": formatter,
+                "converter": converter,
+                # 以下字段在各阶段之间传递，避免重复读取和解析
+                "data": None,
+                "doc": None,
+                "repaired": None,
+                "skipped": False,
+                "output_dir": None,
+                "ran": set(),
+            })
+    return courses
+
+
+class BuildDriver:
+    def __init__(
+        self,
+        stages: Iterable[str],
+        force: bool = False,
+        github_token: Optional[str] = None,
+        toml_mode: str = TOML_OUTPUT_MODE
+    ):
+        """
+        初始化构建驱动
+
+        Args:
+            stages: 需要执行的阶段（会自动补全依赖）
+            force: 是否忽略构建清单
+            github_token: push/deploy 阶段使用的 GitHub 令牌
+            toml_mode: readme.toml 的生成方式（copy / reflink / hardlink）
+        """
+        self.stages = resolve_stages(stages)
+        self.force = force
+        self.token = github_token
+        self.toml_mode = toml_mode
+        self.manifests: Dict[str, BuildManifest] = {}
+        self.global_ran = set()
+        self.stats = {stage: {"ok": 0, "clean": 0, "skip": 0, "failed": 0} for stage in self.stages}
+        self._client = None
+        self._pusher = None
+        self._deployer = None
+
+    def _manifest(self, renderer: str) -> BuildManifest:
+        if renderer not in self.manifests:
+            self.manifests[renderer] = BuildManifest(renderer)
+        return self.manifests[renderer]
+
+    def _may_skip(self, stage: str, course: Optional[Dict[str, Any]] = None) -> bool:
+        """未强制重建且上游阶段本次均未执行时，才允许根据清单跳过"""
+        if self.force:
+            return False
+        for dep in STAGE_DEPS[stage]:
+            if dep in self.global_ran or (course and dep in course["ran"]):
+                return False
+        return True
+
+    def _load(self, course: Dict[str, Any]) -> Dict[str, Any]:
+        """按需解析源文件（优先读取共享解析缓存），结果保存在课程上下文中"""
+        if course["data"] is None:
+            try:
+                course["data"], course["repaired"] = load_toml(course["path"])
+            except Exception as e:
+                print(f"  [ERROR] 无法解析 {course['path']}: {e}")
+                course["data"] = {}
+        return course["data"]
+
+    def _document(self, course: Dict[str, Any]):
+        """由解析结果构建文档模型（每次解析只构建一次），供格式化与渲染共用"""
+        if course["doc"] is None:
+            course["doc"] = build_document(course["data"])
+        return course["doc"]
+
+    def _matches_type(self, course: Dict[str, Any], data: Dict[str, Any]) -> bool:
+        return repo_type_of(data) == course["repo_type"]
+
+    # ------------------------------------------------------------------
+    # 阶段实现：返回 "ok" / "clean" / "skip" / "failed"
+    # ------------------------------------------------------------------
+
+    def stage_templates(self) -> str:
+        manifest = self._manifest(renderer_version(generate_workflows.__file__))
+        outputs = [os.path.join(WORKFLOWS_DIR, name) for name in WORKFLOW_TEMPLATES.values()]
+        if self._may_skip("templates") and manifest.lookup(generate_workflows.__file__, key="templates"):
+            return "clean"
+        generate_workflows.save_workflow_templates(Path(WORKFLOWS_DIR))
+        manifest.record(generate_workflows.__file__, "success", outputs, key="templates")
+        return "ok"
+
+    def stage_format(self, course: Dict[str, Any]) -> str:
+        path = course["path"]
+        key = f"format:{path}"
+        manifest = self._manifest(renderer_version(*course["formatter"].FORMATTER_SOURCES))
+        if self._may_skip("format", course) and (entry := manifest.lookup(path, key=key)):
+            course["skipped"] = entry["status"] == "skipped"
+            return "skip" if course["skipped"] else "clean"
+
+        data = self._load(course)
+        if not data:
+            return "failed"
+        if not self._matches_type(course, data):
+            course["skipped"] = True
+            manifest.record(path, "skipped", key=key)
+            return "skip"
+
+        with recorder.stage("format"):
+            formatted = course["formatter"].format_toml_content(self._document(course))
+        with open(path, 'r', encoding='utf-8') as f:
+            original = f.read()
+        # 内容未变化时不重写源文件，保持 mtime 不变以便解析缓存继续命中；
+        # 改写时替换为新文件，不会经由硬链接改动 readme_output 中的 readme.toml
+        if formatted != original:
+            write_if_changed(path, formatted)
+
+        # 格式化结果直接在内存中解析并交给 render 阶段
+        try:
+            course["data"], course["repaired"] = loads_with_repair(formatted)
+            course["doc"] = None
+        except Exception as e:
+            print(f"  [ERROR] 格式化结果无法解析 {path}: {e}")
+            manifest.discard(path, key=key)
+            return "failed"
+        prime_cache(path, course["data"], course["repaired"])
+        manifest.record(path, "success", key=key)
+        return "ok"
+
+    def stage_render(self, course: Dict[str, Any]) -> str:
+        if course["skipped"]:
+            return "skip"
+        path = course["path"]
+        converter = course["converter"]
+        manifest = self._manifest(renderer_version(*converter.RENDERER_SOURCES))
+        if self._may_skip("render", course) and (entry := manifest.lookup(path)):
+            if entry["status"] == "skipped":
+                course["skipped"] = True
+                return "skip"
+            course["output_dir"] = os.path.dirname(next(iter(entry["outputs"])))
+            return "clean"
+
+        data = self._load(course)
+        if not data:
+            manifest.discard(path)
+            return "failed"
+        if not self._matches_type(course, data):
+            course["skipped"] = True
+            manifest.record(path, "skipped")
+            return "skip"
+
+        doc = self._document(course)
+        if course["repo_type"] == "multi-project":
+            folder = converter.resolve_output_folder(doc, path)
+        else:
+            folder = Path(path).stem
+        output_dir = os.path.join(OUTPUT_DIR, folder)
+        readme_path = os.path.join(output_dir, "README.md")
+        toml_output_path = os.path.join(output_dir, "readme.toml")
+
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            # 渲染结果逐块与已有的 README.md 比较，只在内容变化时原子地写入
+            write_if_changed(readme_path, converter.iter_markdown(doc, course["name"]), stage="render")
+
+            # 格式化结果已写回源文件，readme.toml 直接由源文件生成（复制或链接）；
+            # 只有需要反斜杠修复时才写入内存中修复后的文本
+            with recorder.stage("copy"):
+                if course["repaired"] is None:
+                    materialize(path, toml_output_path, self.toml_mode)
+                else:
+                    write_if_changed(toml_output_path, course["repaired"])
+            prime_cache(toml_output_path, data)
+        except Exception as e:
+            print(f"  [ERROR] 生成 README 失败 {path}: {e}")
+            manifest.discard(path)
+            return "failed"
+
+        course["output_dir"] = output_dir
+        manifest.record(path, "success", [readme_path, toml_output_path])
+        return "ok"
+
+    def _github_client(self):
+        """push 与 deploy 阶段共用的 GitHub 客户端（连接池与速率限制额度共享）"""
+        if self._client is None:
+            from github_api import GitHubClient
+            self._client = GitHubClient(self.token)
+        return self._client
+
+    def stage_push(self, course: Dict[str, Any]) -> str:
+        if course["skipped"] or not course["output_dir"]:
+            return "skip"
+        repo = os.path.basename(course["output_dir"])
+        toml_path = os.path.join(course["output_dir"], "readme.toml")
+        readme_path = os.path.join(course["output_dir"], "README.md")
+        key = f"push:{repo}"
+        # 以 readme.toml 为源、README.md 为附加输入，两者都未变化时跳过上传
+        manifest = self._manifest("push")
+        if self._may_skip("push", course) and manifest.lookup(toml_path, key=key):
+            return "clean"
+
+        if self._pusher is None:
+            from push_to_github import GitHubAPIPusher
+            self._pusher = GitHubAPIPusher(self.token, client=self._github_client())
+        with recorder.stage("push"):
+            result = self._pusher.push_course(repo, course["repo_type"], toml_path, readme_path)
+        if result is None:
+            # 远程内容已与本地一致
+            manifest.record(toml_path, "skipped", [readme_path], key=key)
+            return "clean"
+        if result:
+            manifest.record(toml_path, "success", [readme_path], key=key)
+            return "ok"
+        manifest.discard(toml_path, key=key)
+        return "failed"
+
+    def stage_deploy(self, course: Dict[str, Any]) -> str:
+        if course["skipped"] or not course["output_dir"]:
+            return "skip"
+        repo = os.path.basename(course["output_dir"])
+        template_path = os.path.join(WORKFLOWS_DIR, WORKFLOW_TEMPLATES[course["repo_type"]])
+        key = f"deploy:{repo}"
+        manifest = self._manifest("deploy")
+        if self._may_skip("deploy", course) and manifest.lookup(template_path, key=key):
+            return "clean"
+
+        if self._deployer is None:
+            from deploy_workflows import WorkflowDeployer
+            self._deployer = WorkflowDeployer(self.token, client=self._github_client())
+        with open(template_path, 'r', encoding='utf-8') as f:
+            workflow_content = f.read()
+        with recorder.stage("deploy"):
+            deployed = self._deployer.deploy_workflow(
+                repo,
+                workflow_content,
+                f"ci: Add automatic format and update workflow for {course['repo_type']} repos"
+            )
+        if deployed:
+            manifest.record(template_path, "success", key=key)
+            return "ok"
+        manifest.discard(template_path, key=key)
+        return "failed"
+
+    # ------------------------------------------------------------------
+
+    def _run_stage(self, stage: str, course: Optional[Dict[str, Any]] = None) -> str:
+        handler = getattr(self, f"stage_{stage}")
+        try:
+            result = handler(course) if course is not None else handler()
+        except Exception as e:
+            print(f"  [ERROR] 阶段 {stage} 执行失败: {e}")
+            result = "failed"
+        self.stats[stage][result] += 1
+        if result == "ok":
+            if course is None:
+                self.global_ran.add(stage)
+            else:
+                course["ran"].add(stage)
+        return result
+
+    def run(self, courses: List[Dict[str, Any]]) -> bool:
+        """按阶段拓扑顺序处理：先执行全局阶段，再让每门课程依次流经各课程阶段"""
+        global_stages = [s for s in self.stages if s in GLOBAL_STAGES]
+        course_stages = [s for s in self.stages if s not in GLOBAL_STAGES]
+
+        try:
+            for stage in global_stages:
+                print(f"  [{self._run_stage(stage).upper()}] {stage}")
+
+            for course in courses:
+                results = []
+                with recorder.course(Path(course["path"]).stem):
+                    for stage in course_stages:
+                        results.append(f"{stage}={self._run_stage(stage, course)}")
+                        if results[-1].endswith("=failed"):
+                            break
+                print(f"  {course['name']:24s} {' '.join(results)}")
+        finally:
+            for manifest in self.manifests.values():
+                manifest.save()
+
+        return all(self.stats[stage]["failed"] == 0 for stage in self.stages)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="按阶段依赖图执行 格式化 → 生成 README → 上传/部署 的完整流水线",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+阶段: templates, format, render, push, deploy
+
+使用示例:
+  python build.py                   # 格式化 + 生成 README
+  python build.py --push --deploy   # 完整流水线
+  python build.py --stages render   # 只执行 render（及其依赖）
+        """
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        default=list(DEFAULT_STAGES),
+        help=f"要执行的阶段（默认: {' '.join(DEFAULT_STAGES)}）"
+    )
+    parser.add_argument(
+        "--push",
+        action="store_true",
+        help="追加 push 阶段"
+    )
+    parser.add_argument(
+        "--deploy",
+        action="store_true",
+        help="追加 deploy 阶段"
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        help="只处理指定课程（源文件名，不含 .toml）"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略构建清单，全部重新执行"
+    )
+    parser.add_argument(
+        "--token",
+        help="GitHub个人访问令牌（可选，默认从GITHUB_TOKEN环境变量读取）"
+    )
+    parser.add_argument(
+        "--toml-mode",
+        choices=sorted(MATERIALIZE_FALLBACKS),
+        default=TOML_OUTPUT_MODE,
+        help="readme.toml 的生成方式：copy 复制（默认）、reflink 写时复制克隆、hardlink 硬链接；不支持时自动退回 copy"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=TRACE_PATH,
+        help="记录各阶段耗时与 GitHub 请求，逐条写入 FILE（JSON lines）并在结束时打印汇总"
+    )
+    args = parser.parse_args()
+    if args.trace:
+        recorder.configure(args.trace)
+
+    requested = list(args.stages)
+    if args.push:
+        requested.append("push")
+    if args.deploy:
+        requested.append("deploy")
+
+    try:
+        stages = resolve_stages(requested)
+    except ValueError as e:
+        print(f"❌ 错误: {e}")
+        sys.exit(1)
+
+    token = args.token or os.getenv("GITHUB_TOKEN")
+    if ("push" in stages or "deploy" in stages) and not token:
+        print("❌ 错误: push/deploy 阶段需要设置 GITHUB_TOKEN 环境变量或使用 --token 参数")
+        sys.exit(1)
+
+    courses = discover_courses(args.only)
+
+    print("=" * 60)
+    print("构建流水线")
+    print("=" * 60)
+    print(f"阶段: {' → '.join(stages)}")
+    print(f"找到 {len(courses)} 个 .toml 文件")
+    print()
+
+    driver = BuildDriver(stages, force=args.force, github_token=token, toml_mode=args.toml_mode)
+    success = driver.run(courses)
+
+    print()
+    print("=" * 60)
+    print("构建完成! 统计信息:")
+    print("=" * 60)
+    print(f"{'阶段':10s} {'执行':>6s} {'未变化':>6s} {'跳过':>6s} {'失败':>6s}")
+    for stage in driver.stages:
+        s = driver.stats[stage]
+        print(f"{stage:12s} {s['ok']:>6d} {s['clean']:>8d} {s['skip']:>6d} {s['failed']:>6d}")
+    print()
+    recorder.report()
+
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
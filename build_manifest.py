@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+增量构建清单
+记录每个源 TOML 的内容哈希、渲染器版本与输出文件哈希，
+下次构建时未发生变化的课程直接跳过，不再重新渲染和写入
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from typing import Any, Dict, Iterable, Optional
+
+# 清单文件位置
+MANIFEST_PATH = "./.build_cache/manifest.json"
+
+
+def file_hash(path: str) -> Optional[str]:
+    """计算文件内容的 SHA-256，文件不存在时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def renderer_version(*script_paths: str) -> str:
+    """
+    以渲染脚本及其依赖模块内容的哈希作为渲染器版本
+    修改模板或渲染逻辑后版本自动变化，所有课程随之失效重建
+    """
+    digest = hashlib.sha256()
+    for path in script_paths:
+        digest.update((file_hash(path) or '').encode())
+    return digest.hexdigest()[:16]
+
+
+class BuildManifest:
+    def __init__(self, renderer: str, path: str = MANIFEST_PATH):
+        """
+        初始化构建清单
+
+        Args:
+            renderer: 渲染器版本（见 renderer_version）
+            path: 清单文件路径
+        """
+        self.renderer = renderer
+        self.path = path
+        self.entries = self._load()
+        self._touched = set()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('entries', {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def lookup(self, source_path: str, key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        若源文件与所有输出均与上次构建一致，返回清单条目；否则返回 None
+        key 默认为源文件路径，同一源文件参与多个构建阶段时用不同的 key 区分
+        """
+        entry = self.entries.get(key or source_path)
+        if not entry or entry.get('renderer') != self.renderer:
+            return None
+        if entry.get('source_hash') != file_hash(source_path):
+            return None
+        for output_path, output_hash in entry.get('outputs', {}).items():
+            if file_hash(output_path) != output_hash:
+                return None
+        return entry
+
+    def record(self, source_path: str, status: str, outputs: Iterable[str] = (), key: Optional[str] = None):
+        """记录一次成功（或跳过）的构建结果"""
+        key = key or source_path
+        self.entries[key] = {
+            'source_hash': file_hash(source_path),
+            'renderer': self.renderer,
+            'status': status,
+            'outputs': {p: file_hash(p) for p in outputs},
+        }
+        self._touched.add(key)
+
+    def discard(self, source_path: str, key: Optional[str] = None):
+        """移除条目，下次构建时强制重新处理"""
+        key = key or source_path
+        self.entries.pop(key, None)
+        self._touched.add(key)
+
+    def save(self):
+        """
+        保存清单
+        先重新读取磁盘上的清单，只合并本次改动过的条目，
+        避免两个转换脚本先后运行时互相覆盖
+        """
+        merged = self._load()
+        for key in self._touched:
+            if key in self.entries:
+                merged[key] = self.entries[key]
+            else:
+                merged.pop(key, None)
+
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'entries': merged}, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        self.entries = merged
+        self._touched.clear()
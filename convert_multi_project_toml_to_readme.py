@@ -6,32 +6,38 @@
 
 import os
 from pathlib import Path
-import tomli
-import re
-import textwrap
-import shutil
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+import course_schema
+import markdown_text
+import toml_loader
+from build_manifest import BuildManifest, renderer_version
+from course_schema import Author, MultiProjectCourse, repo_type_of
+from instrumentation import TRACE_PATH, recorder
+from markdown_text import MarkdownBuilder, normalize_content
+from output_writer import MATERIALIZE_FALLBACKS, TOML_OUTPUT_MODE, materialize, write_if_changed
+from toml_loader import load_toml, prime_cache
 
 # 目录配置
 DOWNLOADED_FILES_DIR = "./multi-project_repo"
 OUTPUT_DIR = "./readme_output"
 
+# 影响输出内容的源文件，任一文件变化时构建清单中的记录全部失效
+RENDERER_SOURCES = (__file__, course_schema.__file__, markdown_text.__file__, toml_loader.__file__)
+
 
-def format_author_markdown(author_dict: Dict[str, str]) -> str:
+def format_author_markdown(author: Optional[Author]) -> str:
     """
     格式化 author 为 Markdown 引用格式
     格式：文 / [姓名](链接), 年份.月
     """
-    if not author_dict:
-        return ""
-    
-    # 如果 author 不是字典（比如是字符串），直接返回空
-    if not isinstance(author_dict, dict):
+    # 没有 author（或 author 不是表）时不输出
+    if not author:
         return ""
     
-    name = author_dict.get("name", "").strip()
-    link = author_dict.get("link", "").strip()
-    date = author_dict.get("date", "").strip()
+    name = author.name.strip()
+    link = author.link.strip()
+    date = author.date.strip()
     
     # 如果都为空，不输出
     if not name and not link and not date:
@@ -67,228 +73,155 @@ def format_author_markdown(author_dict: Dict[str, str]) -> str:
         return f"文 / {author_str}"
 
 
-def parse_toml_file(toml_path: str) -> Dict[str, Any]:
-    """解析 TOML 文件，带容错"""
+def load_toml_file(toml_path: str, fix_in_place: bool = False) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    解析 TOML 文件，带容错
+    返回 (数据, 修复后的文本)，修复只在内存中进行，除非指定 fix_in_place
+    """
     try:
-        with open(toml_path, 'rb') as f:
-            return tomli.load(f)
-    except Exception as e:
-        try:
-            with open(toml_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            def escape_backslash_in_triple_quotes(match):
-                text = match.group(1)
-                text = re.sub(r'(?<!\\)\\(?!\\)', r'\\\\', text)
-                return f'"""{text}"""'
-            
-            content = re.sub(r'"""(.*?)"""', escape_backslash_in_triple_quotes, content, flags=re.DOTALL)
-            
-            with open(toml_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            with open(toml_path, 'rb') as f:
-                return tomli.load(f)
-        except:
-            print(f"  [ERROR] 无法解析 {toml_path}")
-            return {}
+        return load_toml(toml_path, fix_in_place=fix_in_place)
+    except Exception:
+        print(f"  [ERROR] 无法解析 {toml_path}")
+        return {}, None
+
+
+def parse_toml_file(toml_path: str, fix_in_place: bool = False) -> Dict[str, Any]:
+    """解析 TOML 文件，带容错"""
+    return load_toml_file(toml_path, fix_in_place=fix_in_place)[0]
 
 
-def generate_markdown(data: Dict[str, Any], filename: str) -> str:
-    """将 TOML 数据转换为 Markdown"""
-    lines = []
+def iter_markdown(data: Union[MultiProjectCourse, Dict[str, Any]], filename: str) -> Iterator[str]:
+    """
+    将 TOML 数据（文档模型或解析结果）逐门子课程转换为 Markdown 文本块
+    裸 URL 转链接与空行合并在逐块追加时完成（见 MarkdownBuilder），不再对全文做正则替换；
+    每输出完一门子课程就交出已确定的文本，内存中只保留当前课程
+    """
+    doc = MultiProjectCourse.of(data)
+    md = MarkdownBuilder()
     
     # 标题：课程名称（course_name 作为 H1）
-    if 'course_name' in data:
-        lines.append(f"# {data['course_name']}")
-        lines.append("")
+    if doc.course_name is not None:
+        md.pair(f"# {doc.course_name}")
     
     # Description（全局介绍，放在标题下方）
-    if 'description' in data and data['description']:
-        desc = data['description']
-        if isinstance(desc, str):
-            lines.append(desc.strip())
-            lines.append("")
+    if doc.description:
+        md.pair(doc.description.strip())
     
     # 课程列表
-    if 'courses' in data and data['courses']:
-        for course in data['courses']:
-            if not isinstance(course, dict):
-                continue
-            
-            # 课程标题
-            course_name = course.get('name', '未知课程')
-            course_code = course.get('code', '')
-            
-            lines.append(f"## {course_name}")
-            if course_code:
-                lines.append(f"**课程代码:** {course_code}")
-            lines.append("")
+    for course in doc.courses:
+        # 课程标题
+        course_name = course.name if course.name is not None else '未知课程'
+        
+        md.add(f"## {course_name}")
+        if course.code:
+            md.add(f"**课程代码:** {course.code}")
+        md.blank()
+        
+        # 课程通用评价 (reviews)
+        for review in course.reviews:
+            # 如果有 topic，作为小标题
+            topic = (review.topic or '').strip()
+            if topic:
+                md.pair(f"### {topic}")
             
-            # 课程通用评价 (reviews)
-            if 'reviews' in course and course['reviews']:
-                for review in course['reviews']:
-                    if not isinstance(review, dict):
-                        continue
-                    
-                    # 如果有 topic，作为小标题
-                    topic = review.get('topic', '').strip()
-                    if topic:
-                        lines.append(f"### {topic}")
-                        lines.append("")
-                    
-                    # 内容
-                    content = review.get('content', '')
-                    if content:
-                        # 去除多余缩进并规范空行
-                        normalized = textwrap.dedent(content).strip()
-                        content_lines = []
-                        prev_blank = False
-                        for raw in normalized.splitlines():
-                            line = raw.lstrip()
-                            if line == '':
-                                if not prev_blank:
-                                    content_lines.append('')
-                                prev_blank = True
-                            else:
-                                content_lines.append(line)
-                                prev_blank = False
-
-                        for line in content_lines:
-                            lines.append(line)
-                        lines.append("")
-                    
-                    # 作者
-                    author = review.get('author', {})
-                    author_str = format_author_markdown(author)
-                    if author_str:
-                        lines.append(f"> {author_str}")
-                        lines.append("")
+            # 内容
+            if review.content:
+                # 去除多余缩进并规范空行（结果按原文缓存）
+                md.pair(normalize_content(review.content))
             
-            # 教师评价 (teachers)
-            if 'teachers' in course and course['teachers']:
-                for teacher in course['teachers']:
-                    if not isinstance(teacher, dict):
-                        continue
-                    
-                    teacher_name = teacher.get('name', '')
-                    if teacher_name:
-                        lines.append(f"### 教师：{teacher_name}")
-                        lines.append("")
-                    
-                    # 教师的评价
-                    if 'reviews' in teacher and teacher['reviews']:
-                        for treview in teacher['reviews']:
-                            if not isinstance(treview, dict):
-                                continue
-                            
-                            content = treview.get('content', '')
-                            if content:
-                                normalized = textwrap.dedent(content).strip()
-                                content_lines = []
-                                prev_blank = False
-                                for raw in normalized.splitlines():
-                                    line = raw.lstrip()
-                                    if line == '':
-                                        if not prev_blank:
-                                            content_lines.append('')
-                                        prev_blank = True
-                                    else:
-                                        content_lines.append(line)
-                                        prev_blank = False
-
-                                for line in content_lines:
-                                    lines.append(line)
-                                lines.append("")
-                            
-                            author = treview.get('author', {})
-                            author_str = format_author_markdown(author)
-                            if author_str:
-                                lines.append(f"> {author_str}")
-                                lines.append("")
+            # 作者
+            author_str = format_author_markdown(review.author)
+            if author_str:
+                md.pair(f"> {author_str}")
+        
+        # 教师评价 (teachers)
+        for teacher in course.teachers:
+            if teacher.name:
+                md.pair(f"### 教师：{teacher.name}")
             
-            lines.append("")
+            # 教师的评价
+            for treview in teacher.reviews:
+                if treview.content:
+                    md.pair(normalize_content(treview.content))
+                
+                author_str = format_author_markdown(treview.author)
+                if author_str:
+                    md.pair(f"> {author_str}")
+        
+        md.blank()
+        yield md.take()
     
     # 杂项信息
-    if 'misc' in data and data['misc']:
-        lines.append("## 其他信息")
-        lines.append("")
-        for item in data['misc']:
-            if not isinstance(item, dict):
-                continue
-
-            topic = item.get('topic', '').strip()
+    if doc.misc:
+        md.pair("## 其他信息")
+        for item in doc.misc:
+            topic = (item.topic or '').strip()
             if topic:
-                lines.append(f"### {topic}")
-                lines.append("")
-
-            content = item.get('content', '')
-            if content:
-                normalized = textwrap.dedent(content).strip()
-                content_lines = []
-                prev_blank = False
-                for raw in normalized.splitlines():
-                    line = raw.lstrip()
-                    if line == '':
-                        if not prev_blank:
-                            content_lines.append('')
-                        prev_blank = True
-                    else:
-                        content_lines.append(line)
-                        prev_blank = False
-
-                for line in content_lines:
-                    lines.append(line)
-                lines.append("")
-
-            author = item.get('author', {})
-            author_str = format_author_markdown(author)
+                md.pair(f"### {topic}")
+
+            if item.content:
+                md.pair(normalize_content(item.content))
+
+            author_str = format_author_markdown(item.author)
             if author_str:
-                lines.append(f"> {author_str}")
-                lines.append("")
+                md.pair(f"> {author_str}")
         
-        lines.append("")
-    
-    # 清理末尾多余空行
-    while lines and lines[-1] == '':
-        lines.pop()
+        md.blank()
     
-    s = '\n'.join(lines) + '\n'
-    
-    # 将裸 URL 转为 Markdown 链接
-    s = re.sub(r"(?P<url>https?://[^\s\)\]\">]+)", lambda m: f"[{m.group('url')}]({m.group('url')})", s)
-    
-    # 合并多个空行为最多一个
-    s = re.sub(r'\n{3,}', '\n\n', s)
-    return s
+    yield md.getvalue()
+
+
+def generate_markdown(data: Union[MultiProjectCourse, Dict[str, Any]], filename: str) -> str:
+    """将 TOML 数据转换为完整的 Markdown 文本"""
+    return ''.join(iter_markdown(data, filename))
 
 
-def process_toml_file(toml_path: str, output_path: str) -> bool:
-    """处理单个 TOML 文件生成 README"""
+def resolve_output_folder(data: Union[MultiProjectCourse, Dict[str, Any]], toml_path: str) -> str:
+    """根据 course_code 或 category 确定输出目录名，缺省时使用文件名"""
+    fallback = os.path.basename(toml_path).replace('.toml', '')
+    if not data:
+        return fallback
+    doc = MultiProjectCourse.of(data)
+    if doc.course_code is not None:
+        return doc.course_code
+    if doc.category is not None:
+        return doc.category
+    return fallback
+
+
+def process_document(
+    data: Dict[str, Any],
+    toml_path: str,
+    output_path: str,
+    repaired: Optional[str] = None,
+    toml_mode: str = TOML_OUTPUT_MODE
+) -> bool:
+    """
+    处理已解析的 TOML 文档：检查类型、生成 README 并复制 TOML
+    repaired 为源文件经内存修复后的文本，给出时写入 readme.toml 代替直接复制
+    toml_mode 为 readme.toml 的生成方式（copy / reflink / hardlink，见 output_writer.materialize）
+    """
     try:
-        # 解析 TOML
-        data = parse_toml_file(str(toml_path))
-        if not data:
-            return False
-        
         # 检查 repo_type，只处理 "multi-project" 类型
-        repo_type = data.get('repo_type', '').strip()
-        if repo_type != 'multi-project':
+        if repo_type_of(data) != 'multi-project':
             return None  # 返回 None 表示跳过
         
-        # 生成 Markdown
-        markdown = generate_markdown(data, os.path.basename(toml_path))
-        
         # 确保输出目录存在
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # 写入 README.md 文件
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(markdown)
+        # 逐门课程生成 Markdown 并直接写入 README.md
+        # 内容未变化时不写入，保持 mtime 不变；产生文本块与比较、写盘分别计入 render 与 write 阶段
+        write_if_changed(output_path, iter_markdown(data, os.path.basename(toml_path)), stage="render")
         
         # 复制原 TOML 文件到输出目录并重命名为 readme.toml
         toml_output_path = os.path.join(os.path.dirname(output_path), "readme.toml")
-        shutil.copy2(str(toml_path), toml_output_path)
+        with recorder.stage("copy"):
+            if repaired is None:
+                materialize(str(toml_path), toml_output_path, toml_mode)
+            else:
+                write_if_changed(toml_output_path, repaired)
+        # readme.toml 与已解析的数据一致，预先写入解析缓存供上传等后续阶段使用
+        prime_cache(toml_output_path, data)
         
         return True
     
@@ -299,7 +232,58 @@ def process_toml_file(toml_path: str, output_path: str) -> bool:
         return False
 
 
+def process_toml_file(
+    toml_path: str,
+    output_path: Optional[str] = None,
+    fix_in_place: bool = False,
+    toml_mode: str = TOML_OUTPUT_MODE
+) -> bool:
+    """
+    处理单个 TOML 文件生成 README
+    文件只解析一次，解析结果依次用于确定输出目录、类型过滤、渲染和复制
+    """
+    data, repaired = load_toml_file(str(toml_path), fix_in_place=fix_in_place)
+    if not data:
+        return False
+    
+    if output_path is None:
+        output_path = os.path.join(OUTPUT_DIR, resolve_output_folder(data, toml_path), "README.md")
+    
+    return process_document(data, toml_path, output_path, repaired, toml_mode)
+
+
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="将 repo_type=multi-project 的 TOML 文件转换为 README.md"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略构建清单，重新生成所有文件"
+    )
+    parser.add_argument(
+        "--fix-in-place",
+        action="store_true",
+        help="把反斜杠修复结果写回源 TOML 文件（默认只在内存中修复）"
+    )
+    parser.add_argument(
+        "--toml-mode",
+        choices=sorted(MATERIALIZE_FALLBACKS),
+        default=TOML_OUTPUT_MODE,
+        help="readme.toml 的生成方式：copy 复制（默认）、reflink 写时复制克隆、hardlink 硬链接；不支持时自动退回 copy"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=TRACE_PATH,
+        help="记录各阶段耗时，逐条写入 FILE（JSON lines）并在结束时打印汇总"
+    )
+    args = parser.parse_args()
+    if args.trace:
+        recorder.configure(args.trace)
+
     print("=" * 60)
     print("TOML 转 README 工具 (multi-project_repo 专用)")
     print("=" * 60)
@@ -312,29 +296,50 @@ def main():
     stats = {
         'total': len(toml_files),
         'success': 0,
+        'unchanged': 0,
         'skipped': 0,
         'failed': 0
     }
 
+    manifest = BuildManifest(renderer_version(*RENDERER_SOURCES))
+
     for toml_path in toml_files:
         filename = os.path.basename(toml_path)
-        # 获取 course_code 或 category 作为输出目录名
-        data = parse_toml_file(str(toml_path))
-        output_folder = data.get('course_code', data.get('category', filename.replace('.toml', ''))) if data else filename.replace('.toml', '')
-        
-        output_path = os.path.join(OUTPUT_DIR, output_folder, "README.md")
-        
-        result = process_toml_file(str(toml_path), output_path)
+
+        # 源文件与输出均未变化时直接跳过
+        entry = None if args.force else manifest.lookup(str(toml_path))
+        if entry and entry['status'] == 'skipped':
+            print(f"  [SKIP] 非 multi-project 类型，已跳过: {filename}")
+            stats['skipped'] += 1
+            continue
+        if entry:
+            print(f"  [UNCHANGED] 未变化，已跳过: {filename}")
+            stats['unchanged'] += 1
+            continue
+
+        # 只解析一次，解析结果贯穿目录选择、类型过滤、渲染和复制
+        with recorder.course(toml_path.stem):
+            data, repaired = load_toml_file(str(toml_path), fix_in_place=args.fix_in_place)
+            output_folder = resolve_output_folder(data, str(toml_path))
+            output_path = os.path.join(OUTPUT_DIR, output_folder, "README.md")
+            
+            result = process_document(data, str(toml_path), output_path, repaired, args.toml_mode) if data else False
         
         if result is True:
             print(f"  [OK] 已生成: {output_folder}/README.md + readme.toml")
             stats['success'] += 1
+            toml_output_path = os.path.join(os.path.dirname(output_path), "readme.toml")
+            manifest.record(str(toml_path), 'success', [output_path, toml_output_path])
         elif result is None:
             print(f"  [SKIP] 非 multi-project 类型，已跳过: {filename}")
             stats['skipped'] += 1
+            manifest.record(str(toml_path), 'skipped')
         else:
             print(f"  [ERROR] 处理失败: {filename}")
             stats['failed'] += 1
+            manifest.discard(str(toml_path))
+
+    manifest.save()
 
     print()
     print("=" * 60)
@@ -342,10 +347,12 @@ def main():
     print("=" * 60)
     print(f"总文件数:     {stats['total']}")
     print(f"成功生成:     {stats['success']}")
+    print(f"未变化:       {stats['unchanged']}")
     print(f"已跳过:       {stats['skipped']}")
     print(f"处理失败:     {stats['failed']}")
     print()
     print(f"输出目录:     ./{OUTPUT_DIR}/")
+    recorder.report()
 
 
 if __name__ == "__main__":
@@ -6,32 +6,43 @@
 """
 
 import os
+import io
+import contextlib
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import tomli
-import re
-import shutil
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import course_schema
+import markdown_text
+import toml_loader
+from build_manifest import BuildManifest, renderer_version
+from course_schema import Author, Course, Lecturer, Resource, Review, Textbook, repo_type_of
+from instrumentation import TRACE_PATH, recorder
+from markdown_text import MarkdownBuilder, normalize_content
+from output_writer import MATERIALIZE_FALLBACKS, TOML_OUTPUT_MODE, materialize, write_if_changed
+from toml_loader import load_toml, prime_cache
 
 # 目录配置
 DOWNLOADED_FILES_DIR = "./normal_repo"
 OUTPUT_DIR = "./readme_output"
 
+# 影响输出内容的源文件，任一文件变化时构建清单中的记录全部失效
+RENDERER_SOURCES = (__file__, course_schema.__file__, markdown_text.__file__, toml_loader.__file__)
+
 
-def format_author_markdown(author_dict: Dict[str, str]) -> str:
+def format_author_markdown(author: Optional[Author]) -> str:
     """
     格式化 author 为 Markdown 引用格式
     格式：文 / [姓名](链接), 年份.月
     """
-    if not author_dict:
+    # 没有 author（或 author 不是表）时不输出
+    if not author:
         return ""
     
-    # 如果 author 不是字典（比如是字符串），直接返回空
-    if not isinstance(author_dict, dict):
-        return ""
-    
-    name = author_dict.get("name", "").strip()
-    link = author_dict.get("link", "").strip()
-    date = author_dict.get("date", "").strip()
+    name = author.name.strip()
+    link = author.link.strip()
+    date = author.date.strip()
     
     # 如果都为空，不输出
     if not name and not link and not date:
@@ -68,338 +79,185 @@ def format_author_markdown(author_dict: Dict[str, str]) -> str:
         return f"文 / {author_str}"
 
 
-def parse_toml_file(toml_path: str) -> Dict[str, Any]:
-    """解析 TOML 文件，带容错"""
+def load_toml_file(toml_path: str, fix_in_place: bool = False) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    解析 TOML 文件，带容错
+    返回 (数据, 修复后的文本)，修复只在内存中进行，除非指定 fix_in_place
+    """
     try:
-        with open(toml_path, 'rb') as f:
-            return tomli.load(f)
-    except Exception as e:
-        # 如果解析失败，尝试修复反斜杠
-        try:
-            with open(toml_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            import re
-            def escape_backslash_in_triple_quotes(match):
-                text = match.group(1)
-                text = re.sub(r'(?<!\\)\\(?!\\)', r'\\\\', text)
-                return f'"""{text}"""'
-            
-            content = re.sub(r'"""(.*?)"""', escape_backslash_in_triple_quotes, content, flags=re.DOTALL)
-            
-            with open(toml_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            with open(toml_path, 'rb') as f:
-                return tomli.load(f)
-        except:
-            print(f"  [ERROR] 无法解析 {toml_path}")
-            return {}
+        return load_toml(toml_path, fix_in_place=fix_in_place)
+    except Exception:
+        print(f"  [ERROR] 无法解析 {toml_path}")
+        return {}, None
+
+
+def parse_toml_file(toml_path: str, fix_in_place: bool = False) -> Dict[str, Any]:
+    """解析 TOML 文件，带容错"""
+    return load_toml_file(toml_path, fix_in_place=fix_in_place)[0]
+
+
+def _review_renderer(topic: bool = False, author: bool = True) -> Callable[[Review, MarkdownBuilder], None]:
+    """
+    生成评价类条目的渲染函数：可选的 ### 主题、正文、可选的作者署名
+    正文整段追加，不再逐行拆分
+    """
+    def render(item: Review, md: MarkdownBuilder):
+        if topic and item.topic:
+            title = item.topic.strip()
+            if title:
+                md.pair(f"### {title}")
+        if item.content:
+            content = normalize_content(item.content, dedent=False)
+            if content:
+                md.pair(content)
+        if author:
+            author_str = format_author_markdown(item.author)
+            if author_str:
+                md.pair(f"> {author_str}")
+    return render
+
+
+_render_review = _review_renderer()
 
 
-def generate_markdown(data: Dict[str, Any], filename: str) -> str:
-    """将 TOML 数据转换为 Markdown"""
-    lines = []
+def _render_lecturer(lecturer: Lecturer, md: MarkdownBuilder):
+    if lecturer.name is None:
+        return
+    md.pair(f"### {lecturer.name}")
+    for review in lecturer.reviews:
+        _render_review(review, md)
+
+
+def _render_textbook(book: Textbook, md: MarkdownBuilder):
+    if book.title:
+        md.add(f"**{book.title}**")
+    details = []
+    if book.book_author:
+        details.append(f"作者：{book.book_author}")
+    if book.publisher:
+        details.append(f"出版社：{book.publisher}")
+    if book.edition:
+        details.append(f"版本：{book.edition}")
+    if details:
+        md.add(" | ".join(details))
+    md.blank()
+
+
+def _render_resource(resource: Resource, md: MarkdownBuilder):
+    title = resource.title or ''
+    url = resource.url or ''
+    md.add(f"- [{title}]({url})" if url else f"- {title}")
+    if resource.description:
+        md.add(f"  {resource.description}")
+    md.blank()
+
+
+def _render_link(item: Review, md: MarkdownBuilder):
+    content = (item.content or '').strip()
+    if content:
+        md.pair(f"- [{content}]({content})" if content.startswith('http') else f"- {content}")
+
+
+class SectionSpec(NamedTuple):
+    """README 中的一个栏目：Course 的字段名、二级标题、单个条目的渲染函数"""
+    key: str
+    title: str
+    render: Callable[[Any, MarkdownBuilder], None]
+
+
+# 栏目按此顺序输出；新增栏目只需在表中加一行
+SECTIONS = (
+    SectionSpec('lecturers', "授课教师", _render_lecturer),
+    SectionSpec('textbooks', "教材与参考书", _render_textbook),
+    SectionSpec('online_resources', "在线资源", _render_resource),
+    SectionSpec('course', "课程评价", _render_review),
+    SectionSpec('homework', "作业", _render_review),
+    SectionSpec('exam', "考试", _render_review),
+    SectionSpec('lab', "实验", _render_review),
+    SectionSpec('advice', "建议", _review_renderer(author=False)),
+    SectionSpec('schedule', "课程安排", _review_renderer(author=False)),
+    SectionSpec('related_links', "相关链接", _render_link),
+    SectionSpec('misc', "其他信息", _review_renderer(topic=True)),
+)
+
+
+def iter_markdown(data: Union[Course, Dict[str, Any]], filename: str) -> Iterator[str]:
+    """
+    将 TOML 数据（文档模型或解析结果）逐栏目转换为 Markdown 文本块
+    裸 URL 转链接与空行合并在逐块追加时完成（见 MarkdownBuilder），不再对全文做正则替换；
+    每输出完一个栏目就交出已确定的文本，内存中只保留当前栏目
+    """
+    doc = Course.of(data)
+    md = MarkdownBuilder()
     
     # 标题：课程名称
-    if 'course_name' in data:
-        lines.append(f"# {data['course_name']}")
-        lines.append("")
+    if doc.course_name is not None:
+        md.pair(f"# {doc.course_name}")
     
     # 课程代码
-    if 'course_code' in data:
-        lines.append(f"**课程代码:** {data['course_code']}")
-        lines.append("")
+    if doc.course_code is not None:
+        md.pair(f"**课程代码:** {doc.course_code}")
     
     # Description（全局介绍）
-    if 'description' in data and data['description']:
-        desc = data['description']
-        if isinstance(desc, str):
-            lines.append(desc.strip())
-            lines.append("")
-    
-    # Lecturers（授课教师）
-    if 'lecturers' in data and data['lecturers']:
-        lines.append("## 授课教师")
-        lines.append("")
-        lecturers = data['lecturers']
-        if isinstance(lecturers, list):
-            for lecturer in lecturers:
-                if isinstance(lecturer, dict) and 'name' in lecturer:
-                    lines.append(f"### {lecturer['name']}")
-                    lines.append("")
-                    
-                    # 教师的reviews
-                    if 'reviews' in lecturer and lecturer['reviews']:
-                        for review in lecturer['reviews']:
-                            if isinstance(review, dict):
-                                content = review.get('content', '').strip()
-                                if content:
-                                    content_lines = content.split('\n')
-                                    for line in content_lines:
-                                        lines.append(line)
-                                    lines.append("")
-                                
-                                author = review.get('author', {})
-                                author_str = format_author_markdown(author)
-                                if author_str:
-                                    lines.append(f"> {author_str}")
-                                    lines.append("")
-        lines.append("")
-    
-    # Textbooks（教材与参考书）
-    if 'textbooks' in data and data['textbooks']:
-        lines.append("## 教材与参考书")
-        lines.append("")
-        textbooks = data['textbooks']
-        if isinstance(textbooks, list):
-            for book in textbooks:
-                if isinstance(book, dict):
-                    title = book.get('title', '')
-                    book_author = book.get('book_author', '')
-                    publisher = book.get('publisher', '')
-                    edition = book.get('edition', '')
-                    
-                    if title:
-                        lines.append(f"**{title}**")
-                    details = []
-                    if book_author:
-                        details.append(f"作者：{book_author}")
-                    if publisher:
-                        details.append(f"出版社：{publisher}")
-                    if edition:
-                        details.append(f"版本：{edition}")
-                    if details:
-                        lines.append(" | ".join(details))
-                    lines.append("")
-        lines.append("")
-    
-    # Online Resources（在线资源）
-    if 'online_resources' in data and data['online_resources']:
-        lines.append("## 在线资源")
-        lines.append("")
-        resources = data['online_resources']
-        if isinstance(resources, list):
-            for resource in resources:
-                if isinstance(resource, dict):
-                    title = resource.get('title', '')
-                    url = resource.get('url', '')
-                    description = resource.get('description', '')
-                    
-                    if url:
-                        lines.append(f"- [{title}]({url})")
-                    else:
-                        lines.append(f"- {title}")
-                    
-                    if description:
-                        lines.append(f"  {description}")
-                    lines.append("")
-        lines.append("")
-    
-    # Course（课程评价）
-    if 'course' in data and data['course']:
-        lines.append("## 课程评价")
-        lines.append("")
-        course_items = data['course']
-        if isinstance(course_items, list):
-            for item in course_items:
-                if isinstance(item, dict):
-                    content = item.get('content', '').strip()
-                    if content:
-                        content_lines = content.split('\n')
-                        for line in content_lines:
-                            lines.append(line)
-                        lines.append("")
-                    
-                    author = item.get('author', {})
-                    author_str = format_author_markdown(author)
-                    if author_str:
-                        lines.append(f"> {author_str}")
-                        lines.append("")
-        lines.append("")
-    
-    # Homework（作业）
-    if 'homework' in data and data['homework']:
-        lines.append("## 作业")
-        lines.append("")
-        homework_items = data['homework']
-        if isinstance(homework_items, list):
-            for item in homework_items:
-                if isinstance(item, dict):
-                    content = item.get('content', '').strip()
-                    if content:
-                        content_lines = content.split('\n')
-                        for line in content_lines:
-                            lines.append(line)
-                        lines.append("")
-                    
-                    author = item.get('author', {})
-                    author_str = format_author_markdown(author)
-                    if author_str:
-                        lines.append(f"> {author_str}")
-                        lines.append("")
-        lines.append("")
+    if doc.description:
+        md.pair(doc.description.strip())
     
-    # Exam（考试）
-    if 'exam' in data and data['exam']:
-        lines.append("## 考试")
-        lines.append("")
-        exam_items = data['exam']
-        if isinstance(exam_items, list):
-            for item in exam_items:
-                if isinstance(item, dict):
-                    content = item.get('content', '').strip()
-                    if content:
-                        content_lines = content.split('\n')
-                        for line in content_lines:
-                            lines.append(line)
-                        lines.append("")
-                    
-                    author = item.get('author', {})
-                    author_str = format_author_markdown(author)
-                    if author_str:
-                        lines.append(f"> {author_str}")
-                        lines.append("")
-        lines.append("")
+    # 各栏目：标题 + 逐条渲染，栏目末尾空一行
+    for key, title, render in SECTIONS:
+        items = getattr(doc, key)
+        if not items:
+            continue
+        md.pair(f"## {title}")
+        for item in items:
+            render(item, md)
+        md.blank()
+        yield md.take()
     
-    # Lab（实验）
-    if 'lab' in data and data['lab']:
-        lines.append("## 实验")
-        lines.append("")
-        lab_items = data['lab']
-        if isinstance(lab_items, list):
-            for item in lab_items:
-                if isinstance(item, dict):
-                    content = item.get('content', '').strip()
-                    if content:
-                        content_lines = content.split('\n')
-                        for line in content_lines:
-                            lines.append(line)
-                        lines.append("")
-                    
-                    author = item.get('author', {})
-                    author_str = format_author_markdown(author)
-                    if author_str:
-                        lines.append(f"> {author_str}")
-                        lines.append("")
-        lines.append("")
-    
-    # Advice（建议）
-    if 'advice' in data and data['advice']:
-        lines.append("## 建议")
-        lines.append("")
-        advice_items = data['advice']
-        if isinstance(advice_items, list):
-            for item in advice_items:
-                if isinstance(item, dict):
-                    content = item.get('content', '').strip()
-                    if content:
-                        content_lines = content.split('\n')
-                        for line in content_lines:
-                            lines.append(line)
-                        lines.append("")
-        lines.append("")
-    
-    # Schedule（课程安排）
-    if 'schedule' in data and data['schedule']:
-        lines.append("## 课程安排")
-        lines.append("")
-        schedule_items = data['schedule']
-        if isinstance(schedule_items, list):
-            for item in schedule_items:
-                if isinstance(item, dict):
-                    content = item.get('content', '').strip()
-                    if content:
-                        content_lines = content.split('\n')
-                        for line in content_lines:
-                            lines.append(line)
-                        lines.append("")
-        lines.append("")
-    
-    # Related Links（相关链接）
-    if 'related_links' in data and data['related_links']:
-        lines.append("## 相关链接")
-        lines.append("")
-        links_items = data['related_links']
-        if isinstance(links_items, list):
-            for item in links_items:
-                if isinstance(item, dict):
-                    content = item.get('content', '').strip()
-                    if content:
-                        if content.startswith('http'):
-                            lines.append(f"- [{content}]({content})")
-                        else:
-                            lines.append(f"- {content}")
-                        lines.append("")
-        lines.append("")
-    
-    # Misc（杂项）
-    if 'misc' in data and data['misc']:
-        lines.append("## 其他信息")
-        lines.append("")
-        misc_items = data['misc']
-        if isinstance(misc_items, list):
-            for item in misc_items:
-                if isinstance(item, dict):
-                    topic = item.get('topic', '').strip()
-                    if topic:
-                        lines.append(f"### {topic}")
-                        lines.append("")
-                    
-                    content = item.get('content', '').strip()
-                    if content:
-                        content_lines = content.split('\n')
-                        for line in content_lines:
-                            lines.append(line)
-                        lines.append("")
-                    
-                    author = item.get('author', {})
-                    author_str = format_author_markdown(author)
-                    if author_str:
-                        lines.append(f"> {author_str}")
-                        lines.append("")
-        lines.append("")
-    
-    # 清理末尾多余空行
-    while lines and lines[-1] == '':
-        lines.pop()
-    
-    s = '\n'.join(lines) + '\n'
-    
-    # 将裸 URL 转为 Markdown 链接
-    s = re.sub(r"(?P<url>https?://[^\s\)\]\">]+)", lambda m: f"[{m.group('url')}]({m.group('url')})", s)
-    
-    # 合并多个空行为最多一个
-    s = re.sub(r'\n{3,}', '\n\n', s)
-    return s
+    yield md.getvalue()
+
+
+def generate_markdown(data: Union[Course, Dict[str, Any]], filename: str) -> str:
+    """将 TOML 数据转换为完整的 Markdown 文本"""
+    return ''.join(iter_markdown(data, filename))
 
 
-def process_toml_file(toml_path: str, output_path: str) -> bool:
-    """处理单个 TOML 文件生成 README"""
+def process_toml_file(
+    toml_path: str,
+    output_path: str,
+    fix_in_place: bool = False,
+    toml_mode: str = TOML_OUTPUT_MODE
+) -> bool:
+    """
+    处理单个 TOML 文件生成 README
+    toml_mode 为 readme.toml 的生成方式（copy / reflink / hardlink，见 output_writer.materialize）
+    """
     try:
         # 解析 TOML
-        data = parse_toml_file(str(toml_path))
+        data, repaired = load_toml_file(str(toml_path), fix_in_place=fix_in_place)
         if not data:
             return False
         
         # 检查 repo_type，只处理 "normal" 类型
-        repo_type = data.get('repo_type', '').strip()
-        if repo_type != 'normal':
+        if repo_type_of(data) != 'normal':
             return None  # 返回 None 表示跳过
         
-        # 生成 Markdown
-        markdown = generate_markdown(data, os.path.basename(toml_path))
-        
         # 确保输出目录存在
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # 写入 README.md 文件
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(markdown)
+        # 逐栏目生成 Markdown 并直接写入 README.md
+        # 内容未变化时不写入，保持 mtime 不变；产生文本块与比较、写盘分别计入 render 与 write 阶段
+        write_if_changed(output_path, iter_markdown(data, os.path.basename(toml_path)), stage="render")
         
         # 复制原 TOML 文件到输出目录并重命名为 readme.toml
+        # 源文件经过内存修复时写出修复后的内容，保证 readme.toml 可被解析
         toml_output_path = os.path.join(os.path.dirname(output_path), "readme.toml")
-        shutil.copy2(str(toml_path), toml_output_path)
+        with recorder.stage("copy"):
+            if repaired is None:
+                materialize(str(toml_path), toml_output_path, toml_mode)
+            else:
+                write_if_changed(toml_output_path, repaired)
+        # readme.toml 与已解析的数据一致，预先写入解析缓存供上传等后续阶段使用
+        prime_cache(toml_output_path, data)
         
         return True
     
@@ -410,39 +268,162 @@ def process_toml_file(toml_path: str, output_path: str) -> bool:
         return False
 
 
+def convert_one(
+    toml_path: str,
+    fix_in_place: bool = False,
+    trace: bool = False,
+    toml_mode: str = TOML_OUTPUT_MODE
+) -> Tuple[str, Optional[bool], str, List[Dict[str, Any]]]:
+    """
+    转换单个 TOML 文件，并捕获过程中的输出
+    供进程池调用，返回 (文件路径, 处理结果, 日志文本, 埋点记录)
+    trace 为 True 时在子进程中也开启埋点，记录随结果返回主进程
+    """
+    filename = os.path.basename(toml_path)
+    course_code = filename.replace('.toml', '')
+    output_path = os.path.join(OUTPUT_DIR, course_code, "README.md")
+
+    if trace and not recorder.enabled:
+        recorder.collect()
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer), recorder.course(course_code):
+        result = process_toml_file(toml_path, output_path, fix_in_place=fix_in_place, toml_mode=toml_mode)
+    return toml_path, result, buffer.getvalue(), recorder.drain()
+
+
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="将 repo_type=normal 的 TOML 文件转换为 README.md",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # 顺序处理
+  python convert_normal_repo_toml_to_readme.py
+
+  # 使用 8 个进程并行处理
+  python convert_normal_repo_toml_to_readme.py --jobs 8
+
+  # 使用全部 CPU 核心
+  python convert_normal_repo_toml_to_readme.py --jobs 0
+
+  # 忽略构建清单，强制全部重新生成
+  python convert_normal_repo_toml_to_readme.py --force
+
+  # 把反斜杠修复结果写回源文件
+  python convert_normal_repo_toml_to_readme.py --fix-in-place
+
+  # readme.toml 以硬链接代替复制（不支持时退回 reflink / copy）
+  python convert_normal_repo_toml_to_readme.py --toml-mode hardlink
+        """
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="并行进程数（默认 1 为顺序处理，0 表示使用全部 CPU 核心）"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略构建清单，重新生成所有文件"
+    )
+    parser.add_argument(
+        "--fix-in-place",
+        action="store_true",
+        help="把反斜杠修复结果写回源 TOML 文件（默认只在内存中修复）"
+    )
+    parser.add_argument(
+        "--toml-mode",
+        choices=sorted(MATERIALIZE_FALLBACKS),
+        default=TOML_OUTPUT_MODE,
+        help="readme.toml 的生成方式：copy 复制（默认）、reflink 写时复制克隆、hardlink 硬链接；不支持时自动退回 copy"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=TRACE_PATH,
+        help="记录各阶段耗时，逐条写入 FILE（JSON lines）并在结束时打印汇总"
+    )
+    args = parser.parse_args()
+    if args.trace:
+        recorder.configure(args.trace)
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
     print("=" * 60)
     print("TOML 转 README 工具 (normal_repo 专用)")
     print("=" * 60)
     print("将所有 repo_type=normal 的 TOML 文件转换为格式化的 README.md")
     print()
 
-    toml_files = sorted(Path(DOWNLOADED_FILES_DIR).glob("*.toml"))
-    print(f"找到 {len(toml_files)} 个 .toml 文件\n")
+    toml_files = [str(p) for p in sorted(Path(DOWNLOADED_FILES_DIR).glob("*.toml"))]
+    print(f"找到 {len(toml_files)} 个 .toml 文件")
+    if jobs > 1:
+        print(f"并行进程数: {jobs}")
+    print()
 
     stats = {
         'total': len(toml_files),
         'success': 0,
+        'unchanged': 0,
         'skipped': 0,
         'failed': 0
     }
 
+    # 根据构建清单筛出源文件或渲染器发生变化的课程
+    manifest = BuildManifest(renderer_version(*RENDERER_SOURCES))
+    clean = {} if args.force else {p: e for p in toml_files if (e := manifest.lookup(p))}
+    dirty = [p for p in toml_files if p not in clean]
+
+    # map 按输入顺序返回结果，日志与统计均按文件名排序合并
+    convert = functools.partial(convert_one, fix_in_place=args.fix_in_place, trace=recorder.enabled,
+                                toml_mode=args.toml_mode)
+    if jobs > 1 and len(dirty) > 1:
+        chunksize = max(1, len(dirty) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            converted = list(executor.map(convert, dirty, chunksize=chunksize))
+    else:
+        converted = list(map(convert, dirty))
+    results = {}
+    for toml_path, result, log, events in converted:
+        results[toml_path] = (result, log)
+        recorder.merge(events)
+
     for toml_path in toml_files:
         filename = os.path.basename(toml_path)
         course_code = filename.replace('.toml', '')
         output_path = os.path.join(OUTPUT_DIR, course_code, "README.md")
-        
-        result = process_toml_file(str(toml_path), output_path)
-        
+
+        if toml_path in clean:
+            if clean[toml_path]['status'] == 'skipped':
+                print(f"  [SKIP] 非 normal 类型，已跳过: {filename}")
+                stats['skipped'] += 1
+            else:
+                print(f"  [UNCHANGED] 未变化，已跳过: {course_code}")
+                stats['unchanged'] += 1
+            continue
+
+        result, log = results[toml_path]
+        if log:
+            print(log, end="")
+
         if result is True:
             print(f"  [OK] 已生成: {course_code}/README.md + readme.toml")
             stats['success'] += 1
+            toml_output_path = os.path.join(os.path.dirname(output_path), "readme.toml")
+            manifest.record(toml_path, 'success', [output_path, toml_output_path])
         elif result is None:
             print(f"  [SKIP] 非 normal 类型，已跳过: {filename}")
             stats['skipped'] += 1
+            manifest.record(toml_path, 'skipped')
         else:
             print(f"  [ERROR] 处理失败: {filename}")
             stats['failed'] += 1
+            manifest.discard(toml_path)
+
+    manifest.save()
 
     print()
     print("=" * 60)
@@ -450,10 +431,12 @@ def main():
     print("=" * 60)
     print(f"总文件数:     {stats['total']}")
     print(f"成功生成:     {stats['success']}")
+    print(f"未变化:       {stats['unchanged']}")
     print(f"已跳过:       {stats['skipped']}")
     print(f"处理失败:     {stats['failed']}")
     print()
     print(f"输出目录:     ./{OUTPUT_DIR}/")
+    recorder.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+课程 TOML 的文档模型
+tomli 解析出的是原始字典，格式化、生成 README、上传等模块每次访问字段时都要重复
+isinstance(..., dict) 与 .get('content', '').strip() 之类的检查。这里在解析后一次性把
+文档转换为带 __slots__ 的数据类，并在转换时完成校验：
+- 非字典的条目、非列表的栏目直接丢弃
+- 字符串字段保留原文（是否去除空白由使用方决定），其他标量转为字符串
+- 文件中没有出现的字段为 None，格式化脚本据此区分"缺省"与"空字符串"
+
+两类文档：
+- Course:             repo_type="normal"，包含授课教师、教材、在线资源和各类评价栏目
+- MultiProjectCourse: repo_type="multi-project"，courses 为其中各门子课程（Project）
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+
+REPO_TYPES = ("normal", "multi-project")
+
+T = TypeVar("T")
+
+
+def _text(value: Any) -> Optional[str]:
+    """字段值转为字符串；缺省（None）或为表/数组时返回 None"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return None
+    return str(value)
+
+
+def _items(value: Any, build: Callable[[Dict[str, Any]], T]) -> List[T]:
+    """把表数组转换为模型列表，跳过非字典的条目"""
+    if not isinstance(value, list):
+        return []
+    return [build(item) for item in value if isinstance(item, dict)]
+
+
+def repo_type_of(data: Dict[str, Any]) -> str:
+    """返回文档的仓库类型（"normal" / "multi-project"），无法识别时返回 "unknown" """
+    repo_type = data.get('repo_type', '') if isinstance(data, dict) else getattr(data, 'repo_type', '')
+    if isinstance(repo_type, str) and repo_type.strip() in REPO_TYPES:
+        return repo_type.strip()
+    return "unknown"
+
+
+@dataclass(slots=True)
+class Author:
+    """评价作者，三个字段缺省时均为空字符串"""
+    name: str = ""
+    link: str = ""
+    date: str = ""
+
+    @classmethod
+    def from_dict(cls, data: Any) -> Optional["Author"]:
+        # author 不是表（比如写成了字符串）时视为没有作者
+        if not isinstance(data, dict):
+            return None
+        return cls(
+            name=_text(data.get('name')) or "",
+            link=_text(data.get('link')) or "",
+            date=_text(data.get('date')) or "",
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.name or self.link or self.date)
+
+
+@dataclass(slots=True)
+class Review:
+    """一条评价；也用于 advice、schedule、related_links、misc 等只有正文（和主题）的条目"""
+    content: Optional[str] = None
+    topic: Optional[str] = None
+    author: Optional[Author] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Review":
+        return cls(
+            content=_text(data.get('content')),
+            topic=_text(data.get('topic')),
+            author=Author.from_dict(data.get('author')),
+        )
+
+
+@dataclass(slots=True)
+class Lecturer:
+    name: Optional[str] = None
+    reviews: List[Review] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Lecturer":
+        return cls(name=_text(data.get('name')), reviews=_items(data.get('reviews'), Review.from_dict))
+
+
+@dataclass(slots=True)
+class Textbook:
+    title: Optional[str] = None
+    book_author: Optional[str] = None
+    publisher: Optional[str] = None
+    edition: Optional[str] = None
+    type: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Textbook":
+        return cls(
+            title=_text(data.get('title')),
+            book_author=_text(data.get('book_author')),
+            publisher=_text(data.get('publisher')),
+            edition=_text(data.get('edition')),
+            type=_text(data.get('type')),
+        )
+
+
+@dataclass(slots=True)
+class Resource:
+    title: Optional[str] = None
+    url: Optional[str] = None
+    description: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Resource":
+        return cls(
+            title=_text(data.get('title')),
+            url=_text(data.get('url')),
+            description=_text(data.get('description')),
+        )
+
+
+@dataclass(slots=True)
+class Course:
+    """repo_type="normal" 的课程文档"""
+    course_name: Optional[str] = None
+    repo_type: Optional[str] = None
+    course_code: Optional[str] = None
+    description: Optional[str] = None
+    lecturers: List[Lecturer] = field(default_factory=list)
+    textbooks: List[Textbook] = field(default_factory=list)
+    online_resources: List[Resource] = field(default_factory=list)
+    course: List[Review] = field(default_factory=list)
+    homework: List[Review] = field(default_factory=list)
+    exam: List[Review] = field(default_factory=list)
+    lab: List[Review] = field(default_factory=list)
+    advice: List[Review] = field(default_factory=list)
+    schedule: List[Review] = field(default_factory=list)
+    related_links: List[Review] = field(default_factory=list)
+    misc: List[Review] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Course":
+        description = data.get('description')
+        return cls(
+            course_name=_text(data.get('course_name')),
+            repo_type=_text(data.get('repo_type')),
+            course_code=_text(data.get('course_code')),
+            description=description if isinstance(description, str) else None,
+            lecturers=_items(data.get('lecturers'), Lecturer.from_dict),
+            textbooks=_items(data.get('textbooks'), Textbook.from_dict),
+            online_resources=_items(data.get('online_resources'), Resource.from_dict),
+            course=_items(data.get('course'), Review.from_dict),
+            homework=_items(data.get('homework'), Review.from_dict),
+            exam=_items(data.get('exam'), Review.from_dict),
+            lab=_items(data.get('lab'), Review.from_dict),
+            advice=_items(data.get('advice'), Review.from_dict),
+            schedule=_items(data.get('schedule'), Review.from_dict),
+            related_links=_items(data.get('related_links'), Review.from_dict),
+            misc=_items(data.get('misc'), Review.from_dict),
+        )
+
+    @classmethod
+    def of(cls, data: Union["Course", Dict[str, Any]]) -> "Course":
+        """已是模型时原样返回，否则从解析结果构建"""
+        return data if isinstance(data, cls) else cls.from_dict(data)
+
+
+@dataclass(slots=True)
+class Teacher:
+    name: Optional[str] = None
+    reviews: List[Review] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Teacher":
+        return cls(name=_text(data.get('name')), reviews=_items(data.get('reviews'), Review.from_dict))
+
+
+@dataclass(slots=True)
+class Project:
+    """multi-project 文档中的一门子课程"""
+    name: Optional[str] = None
+    code: Optional[str] = None
+    reviews: List[Review] = field(default_factory=list)
+    teachers: List[Teacher] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Project":
+        return cls(
+            name=_text(data.get('name')),
+            code=_text(data.get('code')),
+            reviews=_items(data.get('reviews'), Review.from_dict),
+            teachers=_items(data.get('teachers'), Teacher.from_dict),
+        )
+
+
+@dataclass(slots=True)
+class MultiProjectCourse:
+    """repo_type="multi-project" 的课程文档"""
+    course_code: Optional[str] = None
+    repo_type: Optional[str] = None
+    course_name: Optional[str] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    courses: List[Project] = field(default_factory=list)
+    misc: List[Review] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MultiProjectCourse":
+        description = data.get('description')
+        return cls(
+            course_code=_text(data.get('course_code')),
+            repo_type=_text(data.get('repo_type')),
+            course_name=_text(data.get('course_name')),
+            category=_text(data.get('category')),
+            description=description if isinstance(description, str) else None,
+            courses=_items(data.get('courses'), Project.from_dict),
+            misc=_items(data.get('misc'), Review.from_dict),
+        )
+
+    @classmethod
+    def of(cls, data: Union["MultiProjectCourse", Dict[str, Any]]) -> "MultiProjectCourse":
+        """已是模型时原样返回，否则从解析结果构建"""
+        return data if isinstance(data, cls) else cls.from_dict(data)
+
+
+def build_document(data: Dict[str, Any]) -> Union[Course, MultiProjectCourse, None]:
+    """按 repo_type 构建对应的文档模型，类型无法识别时返回 None"""
+    repo_type = repo_type_of(data)
+    if repo_type == "normal":
+        return Course.from_dict(data)
+    if repo_type == "multi-project":
+        return MultiProjectCourse.from_dict(data)
+    return None
@@ -8,58 +8,77 @@
 """
 
 import os
-import sys
 import base64
 from pathlib import Path
-from typing import Optional, Dict, Any
-import requests
+from typing import Optional, Dict, Any, Iterable, Iterator, Tuple
+
+from github_api import DEFAULT_POOL_SIZE, WORKFLOW_PATH, GitHubClient, git_blob_sha, log
+from instrumentation import TRACE_PATH, recorder
+from toml_loader import load_repo_type
 
 class WorkflowDeployer:
-    def __init__(self, github_token: str, org: str = "HITSZ-OpenAuto"):
+    def __init__(
+        self,
+        github_token: str,
+        org: str = "HITSZ-OpenAuto",
+        pool_size: int = DEFAULT_POOL_SIZE,
+        client: Optional[GitHubClient] = None
+    ):
         self.token = github_token
         self.org = org
-        self.base_url = "https://api.github.com"
-        self.headers = {
-            "Authorization": f"token {github_token}",
-            "Accept": "application/vnd.github.v3+json",
-            "Content-Type": "application/json"
-        }
+        # 所有仓库共用同一个客户端，复用 keep-alive 连接
+        self.client = client or GitHubClient(github_token, pool_size=pool_size)
+        # 预取的仓库元数据快照，可与 GitHubAPIPusher 共用
+        self.snapshot: Dict[str, Dict[str, Any]] = {}
         
-    def _api_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
-        """发送API请求"""
-        url = f"{self.base_url}{endpoint}"
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=self.headers)
-            elif method == "PUT":
-                response = requests.put(url, headers=self.headers, json=data)
-            else:
-                raise ValueError(f"不支持的方法: {method}")
-            
-            response.raise_for_status()
-            return response.json() if response.text else {}
-        except requests.exceptions.RequestException as e:
-            print(f"    ❌ API请求失败: {e}")
-            return None
+    def prefetch(self, repos: Iterable[str]) -> int:
+        """用批量 GraphQL 查询预取所有仓库中工作流文件的 blob SHA，返回命中的仓库数"""
+        self.snapshot.update(self.client.run(self.client.prefetch(self.org, repos)))
+        return len(self.snapshot)
+        
+    async def _api_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """发送API请求；查询的文件不存在（GET 404）时静默返回 None"""
+        result = await self.client.request(method, endpoint, data)
+        if result.ok:
+            return result.data
+        if not (method == "GET" and result.status == 404):
+            log(f"    ❌ {result.error}")
+        return None
     
-    def _get_file_content(self, repo: str, path: str) -> Optional[Dict[str, Any]]:
+    async def _get_file_content(self, repo: str, path: str) -> Optional[Dict[str, Any]]:
         """获取仓库中的文件信息"""
         endpoint = f"/repos/{self.org}/{repo}/contents/{path}"
-        return self._api_request("GET", endpoint)
+        return await self._api_request("GET", endpoint)
     
     def deploy_workflow(
         self,
         repo: str,
         workflow_content: str,
         commit_message: str = "ci: Add automatic format and update workflow"
+    ) -> bool:
+        """部署工作流文件到仓库（在客户端的事件循环上执行 deploy_workflow_async）"""
+        return self.client.run(self.deploy_workflow_async(repo, workflow_content, commit_message))
+
+    async def deploy_workflow_async(
+        self,
+        repo: str,
+        workflow_content: str,
+        commit_message: str = "ci: Add automatic format and update workflow"
     ) -> bool:
         """部署工作流文件到仓库"""
-        path = ".github/workflows/format-readme.yml"
+        path = WORKFLOW_PATH
         endpoint = f"/repos/{self.org}/{repo}/contents/{path}"
         
-        # 检查文件是否已存在
-        file_info = self._get_file_content(repo, path)
-        sha = file_info.get("sha") if file_info else None
+        # 检查文件是否已存在（优先使用预取快照）
+        snapshot = self.snapshot.get(repo)
+        if snapshot:
+            sha = snapshot["files"].get(path)
+        else:
+            file_info = await self._get_file_content(repo, path)
+            sha = file_info.get("sha") if file_info else None
+        if sha == git_blob_sha(workflow_content):
+            # 远程文件已是最新，无需提交
+            return True
         
         # 编码内容为base64
         encoded_content = base64.b64encode(workflow_content.encode()).decode()
@@ -72,56 +91,60 @@ class WorkflowDeployer:
         if sha:
             data["sha"] = sha
         
-        result = self._api_request("PUT", endpoint, data)
+        result = await self._api_request("PUT", endpoint, data)
         return result is not None
-    
-    def deploy_course(
-        self,
-        course_code: str,
-        repo_type: str,
-        workflow_content: str
-    ) -> bool:
-        """部署工作流到课程仓库"""
-        print(f"  {course_code:20s} ({repo_type:15s})...", end=" ")
-        
+
+
+def deploy_courses(
+    deployer: WorkflowDeployer,
+    jobs: Iterable[Tuple[str, str, str]],
+    concurrency: int = 1
+) -> Iterator[Tuple[str, bool, str]]:
+    """
+    为多个课程仓库部署工作流，同时最多处理 concurrency 个仓库
+
+    Args:
+        deployer: 工作流部署器（连接池大小应不小于 concurrency）
+        jobs: (course_code, repo_type, workflow_content) 列表
+        concurrency: 同时处理的仓库数
+
+    Yields:
+        (course_code, 是否成功, 日志)，按完成顺序产出
+    """
+    async def deploy(job):
+        course_code, repo_type, workflow_content = job
         try:
-            if self.deploy_workflow(
-                course_code,
-                workflow_content,
-                f"ci: Add automatic format and update workflow for {repo_type} repos"
-            ):
-                print("✓")
-                return True
-            else:
-                print("❌")
-                return False
+            with recorder.course(course_code), recorder.stage("deploy"):
+                return await deployer.deploy_workflow_async(
+                    course_code,
+                    workflow_content,
+                    f"ci: Add automatic format and update workflow for {repo_type} repos"
+                )
         except Exception as e:
-            print(f"❌ ({e})")
+            log(f"    ❌ {e}")
             return False
 
+    for job, ok, output in deployer.client.run_many(deploy, jobs, concurrency):
+        yield job[0], ok, output
+
 
 def determine_repo_type(course_code: str, readme_output_path: Path) -> str:
-    """根据readme.toml内容判断仓库类型"""
+    """根据readme.toml的repo_type字段判断仓库类型（优先读取共享解析缓存）"""
     readme_toml = readme_output_path / course_code / "readme.toml"
     
     if not readme_toml.exists():
         return "unknown"
     
-    try:
-        with open(readme_toml, 'r', encoding='utf-8') as f:
-            content = f.read()
-            if 'repo_type = "normal"' in content:
-                return "normal"
-            elif 'repo_type = "multi-project"' in content:
-                return "multi-project"
-    except:
-        pass
-    
-    return "unknown"
+    return load_repo_type(str(readme_toml))
 
 
-def deploy_all_workflows(readme_output_path: Path, workflows_dir: Path, github_token: Optional[str] = None):
-    """为所有课程仓库部署工作流"""
+def deploy_all_workflows(
+    readme_output_path: Path,
+    workflows_dir: Path,
+    github_token: Optional[str] = None,
+    concurrency: int = 1
+):
+    """为所有课程仓库部署工作流，同时最多处理 concurrency 个仓库"""
     
     if not github_token:
         github_token = os.getenv("GITHUB_TOKEN")
@@ -146,8 +169,9 @@ def deploy_all_workflows(readme_output_path: Path, workflows_dir: Path, github_t
     with open(multi_workflow_path, 'r', encoding='utf-8') as f:
         multi_workflow = f.read()
     
-    # 初始化部署器
-    deployer = WorkflowDeployer(github_token)
+    # 初始化部署器（连接池不小于并发数）
+    concurrency = max(1, concurrency)
+    deployer = WorkflowDeployer(github_token, pool_size=max(DEFAULT_POOL_SIZE, concurrency))
     
     # 收集所有课程
     courses = sorted([d.name for d in readme_output_path.iterdir() if d.is_dir()])
@@ -156,9 +180,16 @@ def deploy_all_workflows(readme_output_path: Path, workflows_dir: Path, github_t
     print("GitHub 工作流部署工具")
     print("=" * 70)
     print(f"找到 {len(courses)} 个课程仓库")
+    if concurrency > 1:
+        print(f"并发数: {concurrency}")
     print()
     print("⚠️  注意: 此操作需要有效的GitHub令牌和目标仓库的push权限")
     print()
+    if courses:
+        with recorder.stage("prefetch"):
+            prefetched = deployer.prefetch(courses)
+        print(f"预取仓库元数据: {prefetched}/{len(courses)} 个仓库")
+        print()
     
     stats = {
         "success": 0,
@@ -168,7 +199,8 @@ def deploy_all_workflows(readme_output_path: Path, workflows_dir: Path, github_t
         "unknown": 0
     }
     
-    # 部署工作流
+    # 收集待部署的课程
+    jobs = []
     for course_code in courses:
         repo_type = determine_repo_type(course_code, readme_output_path)
         
@@ -178,10 +210,17 @@ def deploy_all_workflows(readme_output_path: Path, workflows_dir: Path, github_t
             continue
         
         workflow_content = normal_workflow if repo_type == "normal" else multi_workflow
-        
-        if deployer.deploy_course(course_code, repo_type, workflow_content):
+        jobs.append((course_code, repo_type, workflow_content))
+    
+    # 部署工作流（并发模式下按完成顺序输出）
+    repo_types = {job[0]: job[1] for job in jobs}
+    for course_code, ok, output in deploy_courses(deployer, jobs, concurrency):
+        print(f"  {course_code:20s} ({repo_types[course_code]:15s})... {'✓' if ok else '❌'}")
+        if output:
+            print(output, end="")
+        if ok:
             stats["success"] += 1
-            stats[repo_type] += 1
+            stats[repo_types[course_code]] += 1
         else:
             stats["failed"] += 1
     
@@ -219,6 +258,9 @@ def main():
   
   # 只显示摘要，不实际部署
   python deploy_workflows.py --dry-run
+  
+  # 同时处理 8 个仓库
+  python deploy_workflows.py --concurrency 8
         """
     )
     
@@ -232,10 +274,22 @@ def main():
         action="store_true",
         help="只显示摘要，不实际部署"
     )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=1,
+        help="同时处理的仓库数（默认 1 为逐个处理）"
+    )
     parser.add_argument(
         "--token",
         help="GitHub个人访问令牌（可选，默认从GITHUB_TOKEN环境变量读取）"
     )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=TRACE_PATH,
+        help="记录每个仓库的耗时与每个 GitHub 请求，逐条写入 FILE（JSON lines）并在结束时打印汇总"
+    )
     
     args = parser.parse_args()
     
@@ -292,7 +346,10 @@ def main():
     
     # 实际部署
     token = args.token or os.getenv("GITHUB_TOKEN")
-    deploy_all_workflows(readme_output, workflows_dir, token)
+    if args.trace:
+        recorder.configure(args.trace)
+    deploy_all_workflows(readme_output, workflows_dir, token, concurrency=args.concurrency)
+    recorder.report()
 
 
 if __name__ == "__main__":
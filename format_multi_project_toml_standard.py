@@ -7,13 +7,21 @@
 
 import os
 from pathlib import Path
-import tomli
-import re
-from typing import Any, Dict, List
+import textwrap
+from typing import Any, Dict, Optional, Union
+
+import course_schema
+import toml_loader
+from course_schema import Author, MultiProjectCourse, repo_type_of
+from output_writer import write_if_changed
+from toml_loader import load_toml
 
 # 目录配置
 DOWNLOADED_FILES_DIR = "./multi-project_repo"
 
+# 影响格式化结果的源文件，任一文件变化时构建清单中的记录全部失效
+FORMATTER_SOURCES = (__file__, course_schema.__file__, toml_loader.__file__)
+
 
 def escape_toml_string(text: str) -> str:
     """转义 TOML 字符串中的特殊字符"""
@@ -22,169 +30,128 @@ def escape_toml_string(text: str) -> str:
     return text
 
 
-def format_author(author_dict: Dict[str, str]) -> str:
-    """格式化 author 字典"""
-    if not author_dict or all(not v for v in author_dict.values()):
+def format_author(author: Optional[Author]) -> str:
+    """格式化 author（缺省或各字段均为空时输出空字段）"""
+    if not author:
         return '{ name = "", link = "", date = "" }'
     
-    return (f'{{ name = "{escape_toml_string(author_dict.get("name", ""))}", '
-            f'link = "{escape_toml_string(author_dict.get("link", ""))}", '
-            f'date = "{escape_toml_string(author_dict.get("date", ""))}" }}')
+    return (f'{{ name = "{escape_toml_string(author.name)}", '
+            f'link = "{escape_toml_string(author.link)}", '
+            f'date = "{escape_toml_string(author.date)}" }}')
 
 
-def parse_toml_file(toml_path: str) -> Dict[str, Any]:
-    """解析 TOML 文件，如果标准解析失败则尝试修复"""
+def parse_toml_file(toml_path: str, fix_in_place: bool = False) -> Dict[str, Any]:
+    """解析 TOML 文件，如果标准解析失败则在内存中修复后解析"""
     try:
-        with open(toml_path, 'rb') as f:
-            return tomli.load(f)
+        data, repaired = load_toml(toml_path, fix_in_place=fix_in_place)
     except Exception as e:
-        print(f"    [WARNING] {toml_path} 解析失败，尝试修复...")
-        try:
-            with open(toml_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            def escape_backslash_in_triple_quotes(match):
-                text = match.group(1)
-                text = re.sub(r'(?<!\\)\\(?!\\)', r'\\\\', text)
-                return f'"""{text}"""'
-            
-            content = re.sub(r'"""(.*?)"""', escape_backslash_in_triple_quotes, content, flags=re.DOTALL)
-            
-            with open(toml_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            with open(toml_path, 'rb') as f:
-                return tomli.load(f)
-        except Exception as e2:
-            print(f"  [ERROR] 无法解析 {toml_path}: {e2}")
-            return {}
+        print(f"  [ERROR] 无法解析 {toml_path}: {e}")
+        return {}
+    
+    if repaired is not None:
+        action = "已修复并写回源文件" if fix_in_place else "已在内存中修复"
+        print(f"    [WARNING] {toml_path} 含未转义的反斜杠，{action}")
+    return data
 
 
-def format_toml_content(data: Dict[str, Any]) -> str:
-    """将数据转换为标准 TOML 格式"""
+def format_toml_content(data: Union[MultiProjectCourse, Dict[str, Any]]) -> str:
+    """将数据（文档模型或解析结果）转换为标准 TOML 格式"""
+    doc = MultiProjectCourse.of(data)
     lines = []
     
     # 1. course_code、repo_type、course_name 和 category
-    if 'course_code' in data:
-        lines.append(f'course_code = "{escape_toml_string(data["course_code"])}"')
+    if doc.course_code is not None:
+        lines.append(f'course_code = "{escape_toml_string(doc.course_code)}"')
     lines.append('repo_type = "multi-project"')
-    if 'course_name' in data:
-        lines.append(f'course_name = "{escape_toml_string(data["course_name"])}"')
-    if 'category' in data:
-        lines.append(f'category = "{escape_toml_string(data["category"])}"')
+    if doc.course_name is not None:
+        lines.append(f'course_name = "{escape_toml_string(doc.course_name)}"')
+    if doc.category is not None:
+        lines.append(f'category = "{escape_toml_string(doc.category)}"')
     
     lines.append('')
     
     # 2. Description
-    if 'description' in data and data['description']:
-        desc_text = data['description']
-        if isinstance(desc_text, str):
-            desc_lines = desc_text.strip().split('\n')
-            if len(desc_lines) == 1:
-                lines.append(f'description = """{desc_text}"""')
-            else:
-                lines.append('description = """')
-                for line in desc_lines:
-                    lines.append(line)
-                lines.append('"""')
+    if doc.description:
+        desc_text = doc.description
+        desc_lines = desc_text.strip().split('\n')
+        if len(desc_lines) == 1:
+            lines.append(f'description = """{desc_text}"""')
+        else:
+            lines.append('description = """')
+            for line in desc_lines:
+                lines.append(line)
+            lines.append('"""')
         lines.append('')
     
     # 3. Courses
-    if 'courses' in data and data['courses']:
-        for course in data['courses']:
-            if not isinstance(course, dict):
-                continue
-            
-            lines.append('[[courses]]')
-            if 'name' in course:
-                lines.append(f'name = "{escape_toml_string(course["name"])}"')
-            if 'code' in course:
-                lines.append(f'code = "{escape_toml_string(course["code"])}"')
+    for course in doc.courses:
+        lines.append('[[courses]]')
+        if course.name is not None:
+            lines.append(f'name = "{escape_toml_string(course.name)}"')
+        if course.code is not None:
+            lines.append(f'code = "{escape_toml_string(course.code)}"')
+        
+        # Course Reviews
+        for review in course.reviews:
+            lines.append('')
+            lines.append('  [[courses.reviews]]')
             
-            # Course Reviews
-            if 'reviews' in course and course['reviews']:
-                for review in course['reviews']:
-                    if not isinstance(review, dict):
-                        continue
-                    
-                    lines.append('')
-                    lines.append('  [[courses.reviews]]')
-                    
-                    if 'topic' in review:
-                        lines.append(f'  topic = "{escape_toml_string(review["topic"])}"')
-                    
-                    if 'content' in review:
-                        content = review['content']
-                        import textwrap
-                        normalized = textwrap.dedent(content).strip()
-                        content_lines = normalized.split('\n')
-                        if len(content_lines) == 1 and content_lines[0]:
-                            lines.append('  content = """' + content_lines[0] + '"""')
-                        else:
-                            lines.append('  content = """')
-                            for line in content_lines:
-                                clean_line = line.lstrip()
-                                lines.append('  ' + clean_line)
-                            lines.append('  """')
-                    
-                    author = review.get('author', {})
-                    author_str = format_author(author)
-                    lines.append(f'  author = {author_str}')
+            if review.topic is not None:
+                lines.append(f'  topic = "{escape_toml_string(review.topic)}"')
             
-            # Course Teachers
-            if 'teachers' in course and course['teachers']:
-                for teacher in course['teachers']:
-                    if not isinstance(teacher, dict):
-                        continue
-                    
-                    lines.append('')
-                    lines.append('  [[courses.teachers]]')
-                    if 'name' in teacher:
-                        lines.append(f'  name = "{escape_toml_string(teacher["name"])}"')
-                    
-                    # Teacher Reviews
-                    if 'reviews' in teacher and teacher['reviews']:
-                        for treview in teacher['reviews']:
-                            if not isinstance(treview, dict):
-                                continue
-                            
-                            lines.append('')
-                            lines.append('    [[courses.teachers.reviews]]')
-                            
-                            if 'content' in treview:
-                                content = treview['content']
-                                import textwrap
-                                normalized = textwrap.dedent(content).strip()
-                                content_lines = normalized.split('\n')
-                                if len(content_lines) == 1 and content_lines[0]:
-                                    lines.append('    content = """' + content_lines[0] + '"""')
-                                else:
-                                    lines.append('    content = """')
-                                    for line in content_lines:
-                                        clean_line = line.lstrip()
-                                        lines.append('    ' + clean_line)
-                                    lines.append('    """')
-                            
-                            author = treview.get('author', {})
-                            author_str = format_author(author)
-                            lines.append(f'    author = {author_str}')
+            if review.content is not None:
+                normalized = textwrap.dedent(review.content).strip()
+                content_lines = normalized.split('\n')
+                if len(content_lines) == 1 and content_lines[0]:
+                    lines.append('  content = """' + content_lines[0] + '"""')
+                else:
+                    lines.append('  content = """')
+                    for line in content_lines:
+                        clean_line = line.lstrip()
+                        lines.append('  ' + clean_line)
+                    lines.append('  """')
             
+            author_str = format_author(review.author)
+            lines.append(f'  author = {author_str}')
+        
+        # Course Teachers
+        for teacher in course.teachers:
             lines.append('')
+            lines.append('  [[courses.teachers]]')
+            if teacher.name is not None:
+                lines.append(f'  name = "{escape_toml_string(teacher.name)}"')
+            
+            # Teacher Reviews
+            for treview in teacher.reviews:
+                lines.append('')
+                lines.append('    [[courses.teachers.reviews]]')
+                
+                if treview.content is not None:
+                    normalized = textwrap.dedent(treview.content).strip()
+                    content_lines = normalized.split('\n')
+                    if len(content_lines) == 1 and content_lines[0]:
+                        lines.append('    content = """' + content_lines[0] + '"""')
+                    else:
+                        lines.append('    content = """')
+                        for line in content_lines:
+                            clean_line = line.lstrip()
+                            lines.append('    ' + clean_line)
+                        lines.append('    """')
+                
+                author_str = format_author(treview.author)
+                lines.append(f'    author = {author_str}')
+        
+        lines.append('')
     
     # 4. Misc
-    if 'misc' in data and data['misc']:
+    if doc.misc:
         lines.append('# 杂项信息')
-        for item in data['misc']:
-            if not isinstance(item, dict):
-                continue
-            
+        for item in doc.misc:
             lines.append('[[misc]]')
-            if 'topic' in item:
-                lines.append(f'topic = "{escape_toml_string(item["topic"])}"')
-            if 'content' in item:
-                content = item['content']
-                import textwrap
-                normalized = textwrap.dedent(content).strip()
+            if item.topic is not None:
+                lines.append(f'topic = "{escape_toml_string(item.topic)}"')
+            if item.content is not None:
+                normalized = textwrap.dedent(item.content).strip()
                 content_lines = normalized.split('\n')
                 if len(content_lines) == 1 and content_lines[0]:
                     lines.append('content = """' + content_lines[0] + '"""')
@@ -194,8 +161,7 @@ def format_toml_content(data: Dict[str, Any]) -> str:
                         clean_line = line.lstrip()
                         lines.append(clean_line)
                     lines.append('"""')
-            author = item.get('author', {})
-            author_str = format_author(author)
+            author_str = format_author(item.author)
             lines.append(f'author = {author_str}')
             lines.append('')
     
@@ -206,25 +172,23 @@ def format_toml_content(data: Dict[str, Any]) -> str:
     return '\n'.join(lines) + '\n'
 
 
-def process_toml_file(toml_path: str) -> bool:
+def process_toml_file(toml_path: str, fix_in_place: bool = False) -> bool:
     """处理单个 TOML 文件"""
     try:
         # 解析原始 TOML
-        data = parse_toml_file(str(toml_path))
+        data = parse_toml_file(str(toml_path), fix_in_place=fix_in_place)
         if not data:
             return False
         
         # 检查 repo_type，只处理 "multi-project" 类型
-        repo_type = data.get('repo_type', '').strip()
-        if repo_type != 'multi-project':
+        if repo_type_of(data) != 'multi-project':
             return None  # 返回 None 表示跳过
         
         # 格式化内容
         formatted_content = format_toml_content(data)
         
-        # 写入文件
-        with open(toml_path, 'w', encoding='utf-8') as f:
-            f.write(formatted_content)
+        # 写入文件（内容未变化时不重写；改写时替换为新文件，不会经由硬链接改动 readme.toml）
+        write_if_changed(toml_path, formatted_content)
         
         return True
     
@@ -234,6 +198,18 @@ def process_toml_file(toml_path: str) -> bool:
 
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="将 repo_type=multi-project 的 TOML 文件格式化为标准格式"
+    )
+    parser.add_argument(
+        "--fix-in-place",
+        action="store_true",
+        help="对被跳过的文件也把反斜杠修复结果写回源文件（默认只在内存中修复）"
+    )
+    args = parser.parse_args()
+
     print("=" * 60)
     print("TOML 格式化工具 (multi-project_repo 专用)")
     print("=" * 60)
@@ -252,7 +228,7 @@ def main():
 
     for toml_path in toml_files:
         filename = os.path.basename(toml_path)
-        result = process_toml_file(str(toml_path))
+        result = process_toml_file(str(toml_path), fix_in_place=args.fix_in_place)
         
         if result is True:
             print(f"  [OK] 已格式化: {filename}")
@@ -7,13 +7,20 @@
 
 import os
 from pathlib import Path
-import tomli
-import re
-from typing import Any, Dict, List
+from typing import Any, Dict, Optional, Union
+
+import course_schema
+import toml_loader
+from course_schema import Author, Course, repo_type_of
+from output_writer import write_if_changed
+from toml_loader import load_toml
 
 # 目录配置
 DOWNLOADED_FILES_DIR = "./normal_repo"
 
+# 影响格式化结果的源文件，任一文件变化时构建清单中的记录全部失效
+FORMATTER_SOURCES = (__file__, course_schema.__file__, toml_loader.__file__)
+
 
 def escape_toml_string(text: str) -> str:
     """转义 TOML 字符串中的特殊字符"""
@@ -41,150 +48,129 @@ def format_multiline_text(text: str, indent: int = 0) -> str:
         return '\n'.join(formatted_lines)
 
 
-def format_author(author_dict: Dict[str, str]) -> str:
-    """格式化 author 字典"""
-    if not author_dict or all(not v for v in author_dict.values()):
+def format_author(author: Optional[Author]) -> str:
+    """格式化 author（缺省或各字段均为空时输出空字段）"""
+    if not author:
         return '{ name = "", link = "", date = "" }'
     
-    return (f'{{ name = "{escape_toml_string(author_dict.get("name", ""))}", '
-            f'link = "{escape_toml_string(author_dict.get("link", ""))}", '
-            f'date = "{escape_toml_string(author_dict.get("date", ""))}" }}')
+    return (f'{{ name = "{escape_toml_string(author.name)}", '
+            f'link = "{escape_toml_string(author.link)}", '
+            f'date = "{escape_toml_string(author.date)}" }}')
 
 
-def parse_toml_file(toml_path: str) -> Dict[str, Any]:
-    """解析 TOML 文件，如果标准解析失败则尝试修复"""
+def parse_toml_file(toml_path: str, fix_in_place: bool = False) -> Dict[str, Any]:
+    """解析 TOML 文件，如果标准解析失败则在内存中修复后解析"""
     try:
-        with open(toml_path, 'rb') as f:
-            return tomli.load(f)
+        data, repaired = load_toml(toml_path, fix_in_place=fix_in_place)
     except Exception as e:
-        # 如果标准解析失败，尝试修复未转义的反斜杠
-        print(f"    [WARNING] {toml_path} 解析失败，尝试修复...")
-        try:
-            with open(toml_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 在三引号字符串内转义反斜杠
-            # 先找到所有 """...""" 块
-            def escape_backslash_in_triple_quotes(match):
-                text = match.group(1)
-                # 只转义尚未转义的反斜杠（不是 \\ 的反斜杠）
-                text = re.sub(r'(?<!\\)\\(?!\\)', r'\\\\', text)
-                return f'"""{text}"""'
-            
-            content = re.sub(r'"""(.*?)"""', escape_backslash_in_triple_quotes, content, flags=re.DOTALL)
-            
-            # 写回临时文件再解析
-            with open(toml_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            with open(toml_path, 'rb') as f:
-                return tomli.load(f)
-        except Exception as e2:
-            print(f"  [ERROR] 无法解析 {toml_path}: {e2}")
-            return {}
+        print(f"  [ERROR] 无法解析 {toml_path}: {e}")
+        return {}
+    
+    if repaired is not None:
+        action = "已修复并写回源文件" if fix_in_place else "已在内存中修复"
+        print(f"    [WARNING] {toml_path} 含未转义的反斜杠，{action}")
+    return data
 
 
-def format_toml_content(data: Dict[str, Any]) -> str:
-    """将数据转换为标准 TOML 格式"""
+def format_toml_content(data: Union[Course, Dict[str, Any]]) -> str:
+    """将数据（文档模型或解析结果）转换为标准 TOML 格式"""
+    doc = Course.of(data)
     lines = []
     
     # 1. 基本信息
-    if 'course_name' in data:
-        lines.append(f'course_name = "{escape_toml_string(data["course_name"])}"')
-    if 'repo_type' in data:
-        lines.append(f'repo_type = "{escape_toml_string(data["repo_type"])}"')
-    if 'course_code' in data:
-        lines.append(f'course_code = "{escape_toml_string(data["course_code"])}"')
+    if doc.course_name is not None:
+        lines.append(f'course_name = "{escape_toml_string(doc.course_name)}"')
+    if doc.repo_type is not None:
+        lines.append(f'repo_type = "{escape_toml_string(doc.repo_type)}"')
+    if doc.course_code is not None:
+        lines.append(f'course_code = "{escape_toml_string(doc.course_code)}"')
     
     lines.append('')
     
     # 2. Description
-    if 'description' in data and data['description']:
+    if doc.description:
         lines.append('# 全局注意事项/简介 (多行文本)')
-        desc_text = data['description']
-        if isinstance(desc_text, str):
-            desc_lines = desc_text.strip().split('\n')
-            if len(desc_lines) == 1:
-                lines.append(f'description = """{desc_text}"""')
-            else:
-                lines.append('description = """')
-                for line in desc_lines:
-                    lines.append(line)
-                lines.append('"""')
+        desc_text = doc.description
+        desc_lines = desc_text.strip().split('\n')
+        if len(desc_lines) == 1:
+            lines.append(f'description = """{desc_text}"""')
+        else:
+            lines.append('description = """')
+            for line in desc_lines:
+                lines.append(line)
+            lines.append('"""')
         lines.append('')
     
     # 3. Lecturers
-    if 'lecturers' in data and data['lecturers']:
+    if doc.lecturers:
         lines.append('# 授课教师 (Lecturers)')
-        for lecturer in data['lecturers']:
+        for lecturer in doc.lecturers:
             lines.append('[[lecturers]]')
-            if 'name' in lecturer:
-                lines.append(f'name = "{escape_toml_string(lecturer["name"])}"')
+            if lecturer.name is not None:
+                lines.append(f'name = "{escape_toml_string(lecturer.name)}"')
             
             # Reviews
-            if 'reviews' in lecturer:
-                for review in lecturer['reviews']:
-                    lines.append('')
-                    lines.append('  [[lecturers.reviews]]')
-                    if 'content' in review:
-                        content = review['content']
-                        content_lines = content.strip().split('\n')
-                        if len(content_lines) == 1:
-                            lines.append(f'  content = """{content}"""')
-                        else:
-                            lines.append('  content = """')
-                            for line in content_lines:
-                                lines.append(f'  {line}')
-                            lines.append('  """')
-                    
-                    author = review.get('author', {})
-                    author_str = format_author(author)
-                    lines.append(f'  author = {author_str}')
+            for review in lecturer.reviews:
+                lines.append('')
+                lines.append('  [[lecturers.reviews]]')
+                if review.content is not None:
+                    content = review.content
+                    content_lines = content.strip().split('\n')
+                    if len(content_lines) == 1:
+                        lines.append(f'  content = """{content}"""')
+                    else:
+                        lines.append('  content = """')
+                        for line in content_lines:
+                            lines.append(f'  {line}')
+                        lines.append('  """')
+                
+                author_str = format_author(review.author)
+                lines.append(f'  author = {author_str}')
         lines.append('')
     
     # 4. Textbooks
-    if 'textbooks' in data and data['textbooks']:
+    if doc.textbooks:
         lines.append('# 教材与参考书(不需要author)')
-        for book in data['textbooks']:
+        for book in doc.textbooks:
             lines.append('[[textbooks]]')
-            if 'title' in book:
-                lines.append(f'title = "{escape_toml_string(book["title"])}"')
-            if 'book_author' in book:
-                lines.append(f'book_author = "{escape_toml_string(book["book_author"])}"')
-            if 'publisher' in book:
-                lines.append(f'publisher = "{escape_toml_string(book["publisher"])}"')
-            if 'edition' in book:
-                lines.append(f'edition = "{escape_toml_string(book["edition"])}"')
-            if 'type' in book:
-                lines.append(f'type = "{escape_toml_string(book["type"])}"')
+            if book.title is not None:
+                lines.append(f'title = "{escape_toml_string(book.title)}"')
+            if book.book_author is not None:
+                lines.append(f'book_author = "{escape_toml_string(book.book_author)}"')
+            if book.publisher is not None:
+                lines.append(f'publisher = "{escape_toml_string(book.publisher)}"')
+            if book.edition is not None:
+                lines.append(f'edition = "{escape_toml_string(book.edition)}"')
+            if book.type is not None:
+                lines.append(f'type = "{escape_toml_string(book.type)}"')
             lines.append('')
         if lines[-1] == '':
             lines.pop()
         lines.append('')
     
     # 5. Online Resources
-    if 'online_resources' in data and data['online_resources']:
+    if doc.online_resources:
         lines.append('# 网络资源（电子书、网课等）')
-        for resource in data['online_resources']:
+        for resource in doc.online_resources:
             lines.append('[[online_resources]]')
-            if 'title' in resource:
-                lines.append(f'title = "{escape_toml_string(resource["title"])}"')
-            if 'url' in resource:
-                lines.append(f'url = "{escape_toml_string(resource["url"])}"')
-            if 'description' in resource:
-                lines.append(f'description = "{escape_toml_string(resource["description"])}"')
+            if resource.title is not None:
+                lines.append(f'title = "{escape_toml_string(resource.title)}"')
+            if resource.url is not None:
+                lines.append(f'url = "{escape_toml_string(resource.url)}"')
+            if resource.description is not None:
+                lines.append(f'description = "{escape_toml_string(resource.description)}"')
             lines.append('')
         if lines[-1] == '':
             lines.pop()
         lines.append('')
     
     # 6. Course
-    if 'course' in data and data['course']:
+    if doc.course:
         lines.append('# 核心课程评价区块')
-        for item in data['course']:
+        for item in doc.course:
             lines.append('[[course]]')
-            if 'content' in item:
-                content = item['content']
+            if item.content is not None:
+                content = item.content
                 content_lines = content.strip().split('\n')
                 if len(content_lines) == 1:
                     lines.append(f'content = """{content}"""')
@@ -193,8 +179,7 @@ def format_toml_content(data: Dict[str, Any]) -> str:
                     for line in content_lines:
                         lines.append(line)
                     lines.append('"""')
-            author = item.get('author', {})
-            author_str = format_author(author)
+            author_str = format_author(item.author)
             lines.append(f'author = {author_str}')
             lines.append('')
         if lines[-1] == '':
@@ -202,11 +187,11 @@ def format_toml_content(data: Dict[str, Any]) -> str:
         lines.append('')
     
     # 7. Exam
-    if 'exam' in data and data['exam']:
-        for item in data['exam']:
+    if doc.exam:
+        for item in doc.exam:
             lines.append('[[exam]]')
-            if 'content' in item:
-                content = item['content']
+            if item.content is not None:
+                content = item.content
                 content_lines = content.strip().split('\n')
                 if len(content_lines) == 1:
                     lines.append(f'content = """{content}"""')
@@ -215,8 +200,7 @@ def format_toml_content(data: Dict[str, Any]) -> str:
                     for line in content_lines:
                         lines.append(line)
                     lines.append('"""')
-            author = item.get('author', {})
-            author_str = format_author(author)
+            author_str = format_author(item.author)
             lines.append(f'author = {author_str}')
             lines.append('')
         if lines[-1] == '':
@@ -224,11 +208,11 @@ def format_toml_content(data: Dict[str, Any]) -> str:
         lines.append('')
     
     # 8. Lab
-    if 'lab' in data and data['lab']:
-        for item in data['lab']:
+    if doc.lab:
+        for item in doc.lab:
             lines.append('[[lab]]')
-            if 'content' in item:
-                content = item['content']
+            if item.content is not None:
+                content = item.content
                 content_lines = content.strip().split('\n')
                 if len(content_lines) == 1:
                     lines.append(f'content = """{content}"""')
@@ -237,8 +221,7 @@ def format_toml_content(data: Dict[str, Any]) -> str:
                     for line in content_lines:
                         lines.append(line)
                     lines.append('"""')
-            author = item.get('author', {})
-            author_str = format_author(author)
+            author_str = format_author(item.author)
             lines.append(f'author = {author_str}')
             lines.append('')
         if lines[-1] == '':
@@ -246,11 +229,11 @@ def format_toml_content(data: Dict[str, Any]) -> str:
         lines.append('')
     
     # 9. Advice
-    if 'advice' in data and data['advice']:
-        for item in data['advice']:
+    if doc.advice:
+        for item in doc.advice:
             lines.append('[[advice]]')
-            if 'content' in item:
-                content = item['content']
+            if item.content is not None:
+                content = item.content
                 content_lines = content.strip().split('\n')
                 if len(content_lines) == 1:
                     lines.append(f'content = """{content}"""')
@@ -260,9 +243,8 @@ def format_toml_content(data: Dict[str, Any]) -> str:
                         lines.append(line)
                     lines.append('"""')
             # advice 可能有 author，也可能没有
-            if 'author' in item:
-                author = item.get('author', {})
-                author_str = format_author(author)
+            if item.author is not None:
+                author_str = format_author(item.author)
                 lines.append(f'author = {author_str}')
             lines.append('')
         if lines[-1] == '':
@@ -270,12 +252,12 @@ def format_toml_content(data: Dict[str, Any]) -> str:
         lines.append('')
     
     # 10. Schedule
-    if 'schedule' in data and data['schedule']:
+    if doc.schedule:
         lines.append('# 课程安排')
-        for item in data['schedule']:
+        for item in doc.schedule:
             lines.append('[[schedule]]')
-            if 'content' in item:
-                content = item['content']
+            if item.content is not None:
+                content = item.content
                 content_lines = content.strip().split('\n')
                 if len(content_lines) == 1:
                     lines.append(f'content = """{content}"""')
@@ -290,26 +272,26 @@ def format_toml_content(data: Dict[str, Any]) -> str:
         lines.append('')
     
     # 11. Related Links
-    if 'related_links' in data and data['related_links']:
+    if doc.related_links:
         lines.append('# 相关链接')
-        for item in data['related_links']:
+        for item in doc.related_links:
             lines.append('[[related_links]]')
-            if 'content' in item:
-                lines.append(f'content = "{escape_toml_string(item["content"])}"')
+            if item.content is not None:
+                lines.append(f'content = "{escape_toml_string(item.content)}"')
             lines.append('')
         if lines[-1] == '':
             lines.pop()
         lines.append('')
     
     # 12. Misc
-    if 'misc' in data and data['misc']:
+    if doc.misc:
         lines.append('# 兜底板块')
-        for item in data['misc']:
+        for item in doc.misc:
             lines.append('[[misc]]')
-            if 'topic' in item:
-                lines.append(f'topic = "{escape_toml_string(item["topic"])}"')
-            if 'content' in item:
-                content = item['content']
+            if item.topic is not None:
+                lines.append(f'topic = "{escape_toml_string(item.topic)}"')
+            if item.content is not None:
+                content = item.content
                 content_lines = content.strip().split('\n')
                 if len(content_lines) == 1:
                     lines.append(f'content = """{content}"""')
@@ -318,8 +300,7 @@ def format_toml_content(data: Dict[str, Any]) -> str:
                     for line in content_lines:
                         lines.append(line)
                     lines.append('"""')
-            author = item.get('author', {})
-            author_str = format_author(author)
+            author_str = format_author(item.author)
             lines.append(f'author = {author_str}')
             lines.append('')
         if lines[-1] == '':
@@ -332,25 +313,23 @@ def format_toml_content(data: Dict[str, Any]) -> str:
     return '\n'.join(lines) + '\n'
 
 
-def process_toml_file(toml_path: str) -> bool:
+def process_toml_file(toml_path: str, fix_in_place: bool = False) -> bool:
     """处理单个 TOML 文件"""
     try:
         # 解析原始 TOML
-        data = parse_toml_file(str(toml_path))
+        data = parse_toml_file(str(toml_path), fix_in_place=fix_in_place)
         if not data:
             return False
         
         # 检查 repo_type，只处理 "normal" 类型
-        repo_type = data.get('repo_type', '').strip()
-        if repo_type != 'normal':
+        if repo_type_of(data) != 'normal':
             return None  # 返回 None 表示跳过
         
         # 格式化内容
         formatted_content = format_toml_content(data)
         
-        # 写入文件
-        with open(toml_path, 'w', encoding='utf-8') as f:
-            f.write(formatted_content)
+        # 写入文件（内容未变化时不重写；改写时替换为新文件，不会经由硬链接改动 readme.toml）
+        write_if_changed(toml_path, formatted_content)
         
         return True
     
@@ -360,6 +339,18 @@ def process_toml_file(toml_path: str) -> bool:
 
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="将 repo_type=normal 的 TOML 文件格式化为标准格式"
+    )
+    parser.add_argument(
+        "--fix-in-place",
+        action="store_true",
+        help="对被跳过的文件也把反斜杠修复结果写回源文件（默认只在内存中修复）"
+    )
+    args = parser.parse_args()
+
     print("=" * 60)
     print("TOML 格式化工具 (normal_repo 专用)")
     print("=" * 60)
@@ -378,7 +369,7 @@ def main():
 
     for toml_path in toml_files:
         filename = os.path.basename(toml_path)
-        result = process_toml_file(str(toml_path))
+        result = process_toml_file(str(toml_path), fix_in_place=args.fix_in_place)
         
         if result is True:
             print(f"  [OK] 已格式化: {filename}")
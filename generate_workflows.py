@@ -19,6 +19,8 @@ from pathlib import Path
 from typing import Dict, Any
 import json
 
+from toml_loader import load_repo_type
+
 # ============================================================================
 # NORMAL 类型仓库工作流
 # ============================================================================
@@ -466,19 +468,9 @@ def generate_workflows(readme_output_path: Path):
             stats["unknown"] += 1
             continue
         
-        try:
-            with open(readme_toml, 'r', encoding='utf-8') as f:
-                content = f.read()
-                if 'repo_type = "normal"' in content:
-                    repo_type = "normal"
-                elif 'repo_type = "multi-project"' in content:
-                    repo_type = "multi-project"
-                else:
-                    print(f"⚠️  {course_code}: 无法判断仓库类型")
-                    stats["unknown"] += 1
-                    continue
-        except Exception as e:
-            print(f"❌ {course_code}: 读取readme.toml失败 - {e}")
+        repo_type = load_repo_type(str(readme_toml))
+        if repo_type == "unknown":
+            print(f"⚠️  {course_code}: 无法判断仓库类型")
             stats["unknown"] += 1
             continue
         
@@ -0,0 +1,690 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GitHub API 公共组件
+供 push_to_github.py 和 deploy_workflows.py 共用：
+- RateLimitScheduler: 跨仓库共享的速率限制调度与退避
+- ETagCache:          GET 响应的持久化缓存，重复读取时发送条件请求
+- GitHubClient:       基于 asyncio / aiohttp 的统一请求入口与响应模型 ApiResponse
+
+上传与部署的每个步骤都是协程。同时处理多个仓库时，所有仓库的请求在同一个事件循环上
+并发执行、共用一个连接池，几百个请求同时在途也只占用一个线程。
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import asyncio
+import hashlib
+import tempfile
+import threading
+import contextvars
+from email.utils import parsedate_to_datetime
+from typing import (Any, Awaitable, Callable, Dict, Iterable, Iterator, Mapping, NamedTuple, Optional, Tuple,
+                    TypeVar, Union)
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from instrumentation import recorder
+
+GITHUB_API_URL = "https://api.github.com"
+# 默认连接池大小（每个主机保持的长连接数）
+DEFAULT_POOL_SIZE = 10
+# 请求超时（秒）
+DEFAULT_TIMEOUT = 15
+# 最大重试次数与退避参数（秒）
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# 次级速率限制未给出 Retry-After 时至少等待的时间（秒）
+SECONDARY_LIMIT_WAIT = 60.0
+# 剩余额度低于此值时开始把剩余请求均匀分布到重置时间之前
+LOW_REMAINING = 100
+# 需要发送 JSON 请求体的方法
+BODY_METHODS = frozenset({"PUT", "POST", "PATCH"})
+# 遇到网络错误或 5xx 时可以安全重试的方法
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUS = frozenset({500, 502, 503, 504})
+# ETag 缓存文件（位于脚本目录下，与工作目录无关），设置 GITHUB_ETAG_CACHE=0 可关闭
+ETAG_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".build_cache", "etags.json")
+ETAG_CACHE_ENABLED = os.environ.get("GITHUB_ETAG_CACHE", "1") != "0"
+# ETag 缓存最多保留的条目数（超出时丢弃最久未使用的）与单个响应体的最大字符数（更大的响应不缓存）
+ETAG_CACHE_MAX_ENTRIES = 2000
+ETAG_CACHE_MAX_BODY = 64 * 1024
+# 命中 304 时从缓存还原的响应头
+_CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+# 每个 GraphQL 请求查询的仓库数与超时（秒）
+GRAPHQL_BATCH_SIZE = 40
+GRAPHQL_TIMEOUT = 30
+# 部署到各仓库的工作流文件路径
+WORKFLOW_PATH = ".github/workflows/format-readme.yml"
+
+T = TypeVar("T")
+
+# 每个仓库查询默认分支、最新提交、根目录树条目以及工作流文件的 blob SHA
+_REPO_FIELDS = """
+    defaultBranchRef {
+      name
+      target { oid ... on Commit { tree { oid entries { name oid type } } } }
+    }
+    workflow: object(expression: "HEAD:%s") { oid }
+""" % WORKFLOW_PATH
+
+
+def github_headers(github_token: str) -> Dict[str, str]:
+    """GitHub REST API 的通用请求头"""
+    return {
+        "Authorization": f"token {github_token}",
+        "Accept": "application/vnd.github.v3+json",
+        "Content-Type": "application/json"
+    }
+
+
+def endpoint_class(url: str) -> str:
+    """
+    把请求 URL 归为端点类别，去掉组织、仓库名和文件路径，用于埋点统计
+    例如 /repos/org/AUTO1001/contents/README.md -> contents，/repos/org/x/git/refs -> git/refs
+    """
+    parts = [p for p in urlsplit(url).path.split("/") if p]
+    if parts[:2] == ["api", "v3"]:
+        parts = parts[2:]
+    if not parts:
+        return "root"
+    if parts[-1] == "graphql":
+        return "graphql"
+    if parts[0] == "repos":
+        rest = parts[3:]
+        if not rest:
+            return "repo"
+        if rest[0] == "git" and len(rest) > 1:
+            return f"git/{rest[1]}"
+        return rest[0]
+    if parts[0] == "user":
+        return "/".join(parts[:2])
+    if parts[0] in ("orgs", "users") and len(parts) > 2:
+        # 去掉组织名/用户名
+        return f"{parts[0]}/{parts[2]}"
+    return parts[0]
+
+
+def _header_float(response: "HttpResponse", name: str, http_date: bool = False) -> Optional[float]:
+    """读取数值响应头，缺失或格式错误时返回 None"""
+    value = response.headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        if not http_date:
+            return None
+    # Retry-After 也可能是 HTTP 日期，换算为距现在的秒数
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitScheduler:
+    """
+    所有并发任务共享的速率限制调度器
+    根据响应头 X-RateLimit-Remaining / X-RateLimit-Reset 跟踪剩余额度：
+    额度充足时不做限制，额度偏低时把剩余请求均匀分布到重置时间之前，
+    额度耗尽或触发 Retry-After / 次级速率限制时让所有任务一起暂停
+    """
+
+    def __init__(self, low_remaining: int = LOW_REMAINING):
+        self.low_remaining = low_remaining
+        self._lock = threading.Lock()
+        # 资源（core/graphql）-> (剩余额度, 重置时间戳)
+        self._budget: Dict[str, tuple] = {}
+        # 全局暂停截止时间与下一个可用的发送时间（time.time()）
+        self._resume_at = 0.0
+        self._next_slot: Dict[str, float] = {}
+
+    @staticmethod
+    def resource_for(url: str) -> str:
+        return "graphql" if url.rstrip("/").endswith("/graphql") else "core"
+
+    def _reserve(self, resource: str) -> float:
+        """预约本次请求的发送时间，返回需要等待的秒数"""
+        with self._lock:
+            now = time.time()
+            start = max(now, self._resume_at)
+            remaining, reset_at = self._budget.get(resource, (None, 0.0))
+            if remaining is not None and reset_at > start:
+                if remaining <= 0:
+                    start = reset_at + 1
+                elif remaining < self.low_remaining:
+                    # 额度偏低：按 剩余时间/剩余额度 的间隔发送
+                    interval = (reset_at - start) / remaining
+                    start = max(start, self._next_slot.get(resource, 0.0))
+                    self._next_slot[resource] = start + interval
+                    self._budget[resource] = (remaining - 1, reset_at)
+        return start - now
+
+    async def acquire(self, resource: str = "core"):
+        """发送请求前调用：必要时挂起当前任务到允许发送为止"""
+        delay = self._reserve(resource)
+        if delay > 0:
+            recorder.count("rate_limit_wait_seconds", delay)
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float, reason: str):
+        """让所有任务暂停 seconds 秒"""
+        with self._lock:
+            resume_at = time.time() + seconds
+            if resume_at <= self._resume_at:
+                return
+            self._resume_at = resume_at
+        print(f"[WARN] {reason}，全局暂停 {seconds:.0f} 秒")
+
+    async def wait_paused(self):
+        delay = self._resume_at - time.time()
+        if delay > 0:
+            recorder.count("rate_limit_wait_seconds", delay)
+            await asyncio.sleep(delay)
+
+    def update(self, response: "HttpResponse"):
+        """根据响应头更新额度；返回该响应是否为速率限制（请求未被执行，可以重试）"""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = _header_float(response, "X-RateLimit-Reset")
+        resource = response.headers.get("X-RateLimit-Resource") or self.resource_for(response.url)
+        if remaining is not None and reset is not None:
+            try:
+                with self._lock:
+                    self._budget[resource] = (int(remaining), reset)
+            except ValueError:
+                pass
+
+        if response.status_code not in (403, 429):
+            return False
+        retry_after = _header_float(response, "Retry-After", http_date=True)
+        if retry_after is not None:
+            self.pause(max(retry_after, 1.0), "触发速率限制 (Retry-After)")
+            return True
+        if remaining == "0":
+            # 重置时间缺失或无法解析时按次级速率限制的时长等待
+            wait = SECONDARY_LIMIT_WAIT if reset is None else max(reset - time.time(), 1.0)
+            self.pause(wait, "速率限制额度已用完")
+            return True
+        if response.status_code == 429 or "secondary rate limit" in response.text.lower():
+            self.pause(SECONDARY_LIMIT_WAIT, "触发次级速率限制")
+            return True
+        # 普通的权限不足
+        return False
+
+
+class ETagCache:
+    """
+    GET 响应的持久化缓存（URL -> ETag/Last-Modified 与响应体）
+    再次请求时发送 If-None-Match / If-Modified-Since，服务器返回 304 时直接使用缓存内容；
+    GitHub 的 304 响应不计入速率限制
+    条目按最近使用排序，超过 max_entries 时丢弃最久未使用的；响应体超过 max_body 的不缓存
+    """
+
+    def __init__(
+        self,
+        path: str = ETAG_CACHE_PATH,
+        max_entries: int = ETAG_CACHE_MAX_ENTRIES,
+        max_body: int = ETAG_CACHE_MAX_BODY
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            entries = {}
+        # 旧版本写出的缓存可能含有过大的响应体或过多的条目，载入时一并清理
+        self.entries: Dict[str, Dict[str, Any]] = {
+            key: entry for key, entry in entries.items() if len(entry.get("body", "")) <= max_body
+        }
+        self._dirty = len(self.entries) != len(entries)
+        self._trim()
+
+    @staticmethod
+    def key(url: str, authorization: Optional[str]) -> str:
+        # 不同令牌可见的内容可能不同，键中包含令牌的指纹（不保存令牌本身）
+        fingerprint = hashlib.sha256((authorization or "").encode()).hexdigest()[:12]
+        return f"{fingerprint} {url}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                # 移到末尾，保留最近使用的条目
+                self.entries[key] = entry
+            return entry
+
+    def store(self, key: str, response: "HttpResponse"):
+        headers = {h: response.headers[h] for h in _CACHED_HEADERS if h in response.headers}
+        cacheable = ("ETag" in headers or "Last-Modified" in headers) and len(response.text) <= self.max_body
+        with self._lock:
+            if not cacheable:
+                # 已缓存的旧内容不再有效，一并丢弃
+                if self.entries.pop(key, None) is not None:
+                    self._dirty = True
+                return
+            self.entries.pop(key, None)
+            self.entries[key] = {"headers": headers, "body": response.text}
+            self._dirty = True
+            self._trim()
+
+    def _trim(self):
+        """丢弃最久未使用的条目，直到不超过 max_entries（调用方持有锁或尚未共享）"""
+        excess = len(self.entries) - self.max_entries
+        if excess > 0:
+            for key in list(self.entries)[:excess]:
+                del self.entries[key]
+            self._dirty = True
+
+    def save(self):
+        """原子写入缓存文件（只在有新内容时写入）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self.entries, ensure_ascii=False)
+            self._dirty = False
+        try:
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # 缓存只是加速手段，写入失败不影响正常流程
+            pass
+
+
+_shared_etag_cache: Optional[ETagCache] = None
+_shared_etag_lock = threading.Lock()
+
+
+def shared_etag_cache() -> ETagCache:
+    """进程内共享的 ETag 缓存，进程退出时自动保存"""
+    global _shared_etag_cache
+    with _shared_etag_lock:
+        if _shared_etag_cache is None:
+            _shared_etag_cache = ETagCache()
+            atexit.register(_shared_etag_cache.save)
+        return _shared_etag_cache
+
+
+class HttpResponse(NamedTuple):
+    """一次 HTTP 交互的结果（响应体已完整读取），供调度器与 ETag 缓存读取响应头和正文"""
+    status_code: int
+    reason: str
+    url: str
+    headers: Mapping[str, str]
+    text: str
+
+
+class ApiResponse(NamedTuple):
+    """一次 GitHub API 调用的结果"""
+    status: int
+    # 解析后的 JSON；响应为空或不是 JSON 时为 None
+    data: Any = None
+    # 网络错误或非 2xx 响应的说明
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+# run_many 中每个任务的日志缓冲区；任务持有自己的上下文副本，互不影响
+_task_output: contextvars.ContextVar = contextvars.ContextVar("task_output", default=None)
+
+
+def log(*args: Any, **kwargs: Any):
+    """
+    与 print 相同；在 run_many 的任务中执行时写入该任务的日志缓冲区，
+    并发处理多个仓库时每个仓库的日志保持完整、互不穿插，也不影响其他代码的 sys.stdout
+    """
+    buffer = _task_output.get()
+    print(*args, file=sys.stdout if buffer is None else buffer, **kwargs)
+
+
+class GitHubClient:
+    """
+    基于 asyncio / aiohttp 的 GitHub REST API 客户端，GitHubAPIPusher 与 WorkflowDeployer 共用
+    - 客户端持有自己的事件循环和连接池，同时处理的每个仓库只是循环上的一个任务，
+      几百个请求可以同时在途，不必为每个仓库占用一个阻塞的线程
+    - 所有请求先经过共享的 RateLimitScheduler
+    - 速率限制响应（请求未被执行）对任何方法都会等待后重试
+    - 网络错误、超时与 5xx 只对幂等方法按带抖动的指数退避重试
+    - 设置了 ETag 缓存时 GET 请求改为条件请求
+    同步代码通过 run() / run_many() 执行协程；客户端只能在创建它的线程中使用
+    """
+
+    def __init__(
+        self,
+        github_token: str,
+        base_url: str = GITHUB_API_URL,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        etag_cache: Union[ETagCache, bool] = ETAG_CACHE_ENABLED,
+        scheduler: Optional[RateLimitScheduler] = None,
+        max_retries: int = MAX_RETRIES,
+        timeout: float = DEFAULT_TIMEOUT
+    ):
+        """
+        Args:
+            github_token: GitHub个人访问令牌
+            base_url: REST API 地址（GitHub Enterprise 为 https://HOST/api/v3）
+            pool_size: 连接池大小（同时打开的连接数上限），应不小于同时处理的仓库数
+            etag_cache: ETag 缓存；True 使用进程内共享的持久化缓存，False 不发送条件请求
+            scheduler: 速率限制调度器（可选，默认新建）
+            max_retries: 最大重试次数
+            timeout: 单个请求的超时（秒）
+        """
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.headers = github_headers(github_token)
+        self.etag_cache = shared_etag_cache() if etag_cache is True else (etag_cache or None)
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._session: Optional[aiohttp.ClientSession] = None
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    # 同步入口
+    # ------------------------------------------------------------------
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """在客户端的事件循环上执行协程并返回结果"""
+        return self._loop.run_until_complete(coro)
+
+    def run_many(
+        self,
+        worker: Callable[[Any], Awaitable[Any]],
+        jobs: Iterable[Any],
+        concurrency: int
+    ) -> Iterator[Tuple[Any, Any, str]]:
+        """
+        在客户端的事件循环上为每个 job 执行 worker(job)，同时最多执行 concurrency 个
+        每个任务中通过 log() 输出的日志先缓存，完成后与结果一起产出
+
+        Yields:
+            (job, worker 的返回值, 日志)，按完成顺序产出；worker 抛出的异常原样抛出
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(job):
+            async with semaphore:
+                buffer = io.StringIO()
+                _task_output.set(buffer)
+                return job, await worker(job), buffer.getvalue()
+
+        pending = {self._loop.create_task(run(job)) for job in jobs}
+        try:
+            while pending:
+                done, pending = self._loop.run_until_complete(
+                    asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            # 调用方提前停止迭代时取消其余任务
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+    def close(self):
+        """关闭连接池与事件循环（可重复调用）"""
+        if self._loop.is_closed():
+            return
+        if self._session is not None:
+            self._loop.run_until_complete(self._session.close())
+            self._session = None
+        self._loop.close()
+
+    # ------------------------------------------------------------------
+    # 协程接口
+    # ------------------------------------------------------------------
+
+    async def request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> ApiResponse:
+        """发送请求并返回 ApiResponse，不抛出网络异常（网络错误时 status 为 0）"""
+        url = f"{self.base_url}{endpoint}"
+        if method not in BODY_METHODS and method not in ("GET", "DELETE"):
+            raise ValueError(f"不支持的方法: {method}")
+        # 删除文件（contents API）同样需要在请求体中提供 message 与 sha
+        body = data if method in BODY_METHODS or (method == "DELETE" and data is not None) else None
+        return await self._request_url(method, url, body)
+
+    async def call(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Any]:
+        """
+        发送请求，成功时返回响应数据
+        404/422 视为不存在/无法处理，静默返回 None；其他失败打印原因后返回 None
+        """
+        result = await self.request(method, endpoint, data)
+        if result.ok:
+            return result.data
+        if result.status not in (404, 422):
+            log(result.error)
+        return None
+
+    async def graphql(self, query: str) -> ApiResponse:
+        """发送 GraphQL 查询"""
+        return await self._request_url("POST", graphql_url(self.base_url), {"query": query},
+                                       timeout=GRAPHQL_TIMEOUT)
+
+    async def prefetch(self, org: str, repos: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """批量 GraphQL 预取仓库元数据快照，见 fetch_repo_snapshot"""
+        return await fetch_repo_snapshot(self, org, repos)
+
+    # ------------------------------------------------------------------
+    # 传输层：ETag 条件请求、速率限制调度与重试
+    # ------------------------------------------------------------------
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # aiohttp 会话须在事件循环运行时创建，第一次发送请求时才建立
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _request_url(
+        self,
+        method: str,
+        url: str,
+        body: Optional[Any] = None,
+        timeout: Optional[float] = None
+    ) -> ApiResponse:
+        try:
+            response = await self._fetch(method, url, body, timeout)
+        except asyncio.TimeoutError:
+            return ApiResponse(0, error=f"API 请求超时: {method} {url}")
+        except aiohttp.ClientError as e:
+            return ApiResponse(0, error=f"API请求失败: {e}")
+
+        try:
+            payload = json.loads(response.text) if response.text else None
+        except ValueError:
+            payload = None
+        if 200 <= response.status_code < 300:
+            return ApiResponse(response.status_code, {} if payload is None else payload)
+        return ApiResponse(
+            response.status_code,
+            payload,
+            f"API请求失败: {response.status_code} {response.reason} for url: {url}"
+        )
+
+    async def _fetch(self, method: str, url: str, body: Optional[Any], timeout: Optional[float]) -> HttpResponse:
+        """GET 请求在有缓存时改为条件请求，服务器返回 304 时用缓存内容还原为 200 响应"""
+        if self.etag_cache is None or method != "GET":
+            return await self._send(method, url, body, {}, timeout)
+
+        key = self.etag_cache.key(url, self.headers.get("Authorization"))
+        cached = self.etag_cache.get(key)
+        conditional = {}
+        if cached:
+            if "ETag" in cached["headers"]:
+                conditional["If-None-Match"] = cached["headers"]["ETag"]
+            if "Last-Modified" in cached["headers"]:
+                conditional["If-Modified-Since"] = cached["headers"]["Last-Modified"]
+
+        response = await self._send(method, url, body, conditional, timeout)
+        if response.status_code == 304 and cached:
+            return response._replace(status_code=200, reason="OK (cached)", text=cached["body"])
+        if response.status_code == 200:
+            self.etag_cache.store(key, response)
+        return response
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        body: Optional[Any],
+        headers: Dict[str, str],
+        timeout: Optional[float]
+    ) -> HttpResponse:
+        session = self._get_session()
+        payload = None if body is None else json.dumps(body).encode()
+        # 只在需要覆盖时传 timeout；传入 None 会让 aiohttp 取消会话的默认超时
+        options = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        idempotent = method in IDEMPOTENT_METHODS
+        resource = self.scheduler.resource_for(url)
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(resource)
+            start = time.perf_counter()
+            try:
+                async with session.request(method, url, data=payload, headers=headers, **options) as raw:
+                    content = await raw.read()
+                    response = HttpResponse(raw.status, raw.reason or "", url, raw.headers,
+                                            content.decode("utf-8", errors="replace"))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if recorder.enabled:
+                    recorder.request(method, endpoint_class(url), 0, time.perf_counter() - start,
+                                     attempt=attempt, error=type(e).__name__)
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                await self._sleep_backoff(attempt)
+                attempt += 1
+                continue
+            if recorder.enabled:
+                recorder.request(method, endpoint_class(url), response.status_code,
+                                 time.perf_counter() - start, len(content),
+                                 len(payload) if payload else 0, attempt)
+
+            if self.scheduler.update(response):
+                if attempt >= self.max_retries:
+                    return response
+                await self.scheduler.wait_paused()
+            elif response.status_code in RETRY_STATUS and idempotent and attempt < self.max_retries:
+                await self._sleep_backoff(attempt)
+            else:
+                return response
+            attempt += 1
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # full jitter：在 [0, min(上限, 基数 * 2^attempt)] 内随机
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    async def _sleep_backoff(self, attempt: int):
+        delay = self._backoff(attempt)
+        recorder.count("retry_backoff_seconds", delay)
+        await asyncio.sleep(delay)
+
+
+def git_blob_sha(content: str) -> str:
+    """
+    计算文本内容的 git blob SHA-1，与 GitHub 返回的文件 sha 一致
+    用于在本地判断远程文件是否已经是最新内容
+    """
+    data = content.encode()
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def graphql_url(base_url: str) -> str:
+    """
+    由 REST API 地址推出 GraphQL 地址
+    https://api.github.com -> https://api.github.com/graphql
+    https://HOST/api/v3    -> https://HOST/api/graphql（GitHub Enterprise）
+    """
+    base_url = base_url.rstrip("/")
+    if base_url.endswith("/v3"):
+        return base_url[:-len("/v3")] + "/graphql"
+    return base_url + "/graphql"
+
+
+def _snapshot_entry(repo: str, node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    branch = node.get("defaultBranchRef")
+    if not branch or not branch.get("target"):
+        # 空仓库没有默认分支，交给 REST 流程处理
+        return None
+    commit = branch["target"]
+    tree = commit.get("tree") or {}
+    entries = [
+        {"path": e["name"], "sha": e["oid"], "type": e["type"]}
+        for e in tree.get("entries") or []
+    ]
+    root = {e["path"]: e["sha"] for e in entries}
+    workflow = node.get("workflow")
+    return {
+        "default_branch": branch["name"],
+        "head_sha": commit["oid"],
+        # 与 REST git/trees 接口的返回格式一致，可直接用于比较与建树
+        "tree": {"sha": tree.get("oid"), "tree": entries},
+        "files": {
+            "readme.toml": root.get("readme.toml"),
+            "README.md": root.get("README.md"),
+            f"{repo}.toml": root.get(f"{repo}.toml"),
+            f"{repo}.yaml": root.get(f"{repo}.yaml"),
+            WORKFLOW_PATH: workflow.get("oid") if workflow else None,
+        },
+    }
+
+
+async def fetch_repo_snapshot(
+    client: GitHubClient,
+    org: str,
+    repos: Iterable[str],
+    batch_size: int = GRAPHQL_BATCH_SIZE
+) -> Dict[str, Dict[str, Any]]:
+    """
+    用批量 GraphQL 查询一次性获取多个仓库的元数据快照，
+    代替每个仓库各自的 仓库信息/分支引用/文件内容 REST 请求；各批次同时发出
+
+    Returns:
+        仓库名 -> {default_branch, head_sha, tree, files}；
+        files 中文件不存在时值为 None。查询失败或不存在的仓库不在结果中，调用方应回退到 REST
+    """
+    repos = list(dict.fromkeys(repos))
+    batches = [repos[start:start + batch_size] for start in range(0, len(repos), batch_size)]
+    queries = []
+    for batch in batches:
+        # GraphQL 字符串字面量与 JSON 字符串兼容
+        fields = "\n".join(
+            f"  r{i}: repository(owner: {json.dumps(org)}, name: {json.dumps(repo)}) {{{_REPO_FIELDS}  }}"
+            for i, repo in enumerate(batch)
+        )
+        queries.append(client.graphql(f"query {{\n{fields}\n}}"))
+
+    snapshot = {}
+    for batch, result in zip(batches, await asyncio.gather(*queries)):
+        if not result.ok or not isinstance(result.data, dict):
+            print(f"[WARN] GraphQL 预取失败，将逐个仓库查询: {result.error or '响应不是 JSON 对象'}")
+            continue
+        data = result.data.get("data") or {}
+        for i, repo in enumerate(batch):
+            node = data.get(f"r{i}")
+            entry = _snapshot_entry(repo, node) if node else None
+            if entry:
+                snapshot[repo] = entry
+    return snapshot
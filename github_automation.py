@@ -21,8 +21,10 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 try:
-    from push_to_github import GitHubAPIPusher, determine_repo_type as determine_type_push
-    from deploy_workflows import WorkflowDeployer, determine_repo_type as determine_type_deploy
+    from push_to_github import GitHubAPIPusher, push_courses, determine_repo_type as determine_type_push
+    from deploy_workflows import WorkflowDeployer, deploy_courses, determine_repo_type as determine_type_deploy
+    from github_api import DEFAULT_POOL_SIZE, GitHubClient
+    from instrumentation import TRACE_PATH, recorder
 except ImportError as e:
     print(f"❌ 错误: 无法导入必要的模块: {e}")
     print("请确保push_to_github.py和deploy_workflows.py在同一目录中")
@@ -30,10 +32,16 @@ except ImportError as e:
 
 
 class GitHubAutomation:
-    def __init__(self, github_token: str):
+    def __init__(self, github_token: str, concurrency: int = 1, use_git_data: bool = False):
         self.token = github_token
-        self.pusher = GitHubAPIPusher(github_token)
-        self.deployer = WorkflowDeployer(github_token)
+        self.concurrency = max(1, concurrency)
+        # 上传与部署共用一个连接池，大小不小于并发数
+        self.client = GitHubClient(github_token, pool_size=max(DEFAULT_POOL_SIZE, self.concurrency))
+        self.pusher = GitHubAPIPusher(github_token, client=self.client, use_git_data=use_git_data)
+        self.deployer = WorkflowDeployer(github_token, client=self.client)
+        # 上传与部署共用同一份仓库元数据快照，只预取一次
+        self.deployer.snapshot = self.pusher.snapshot
+        self._prefetched = False
         self.script_dir = Path(__file__).parent
         self.readme_output = self.script_dir / "readme_output"
         self.workflows_dir = self.script_dir / "workflow_templates"
@@ -45,6 +53,16 @@ class GitHubAutomation:
             return []
         return sorted([d.name for d in self.readme_output.iterdir() if d.is_dir()])
     
+    def prefetch(self, courses):
+        """批量预取所有仓库的元数据快照（每次运行只执行一次）"""
+        if self._prefetched or not courses:
+            return
+        self._prefetched = True
+        with recorder.stage("prefetch"):
+            prefetched = self.pusher.prefetch(courses)
+        print(f"预取仓库元数据: {prefetched}/{len(courses)} 个仓库")
+        print()
+    
     def push_all_files(self):
         """推送所有文件到GitHub"""
         courses = self.get_courses()
@@ -56,36 +74,50 @@ class GitHubAutomation:
         print("第一步: 上传文件到GitHub")
         print("=" * 70)
         print(f"找到 {len(courses)} 个课程仓库")
+        if self.concurrency > 1:
+            print(f"并发数: {self.concurrency}")
         print()
+        self.prefetch(courses)
         
         stats = {
             "success": 0,
+            "unchanged": 0,
             "failed": 0,
             "normal": 0,
             "multi-project": 0,
             "unknown": 0
         }
         
-        for i, course_code in enumerate(courses, 1):
+        jobs = []
+        repo_types = {}
+        for course_code in courses:
             course_dir = self.readme_output / course_code
             repo_type = determine_type_push(course_code, self.readme_output)
             
             if repo_type == "unknown":
-                print(f"[{i:3d}/{len(courses)}] ⚠️  {course_code}: 无法判断仓库类型，跳过")
+                print(f"⚠️  {course_code}: 无法判断仓库类型，跳过")
                 stats["unknown"] += 1
                 continue
             
-            toml_path = course_dir / "readme.toml"
-            readme_path = course_dir / "README.md"
-            
-            print(f"[{i:3d}/{len(courses)}] 处理 {course_code}...")
-            
-            if self.pusher.push_course(course_code, repo_type, str(toml_path), str(readme_path)):
+            repo_types[course_code] = repo_type
+            jobs.append((course_code, repo_type, str(course_dir / "readme.toml"), str(course_dir / "README.md")))
+        
+        # 并发模式下按完成顺序输出，每个仓库的日志整体打印
+        failed = []
+        for i, (course_code, ok, log) in enumerate(push_courses(self.pusher, jobs, self.concurrency), 1):
+            status = "未变化" if ok is None else ("完成" if ok else "失败")
+            print(f"[{i:3d}/{len(jobs)}] {course_code} {status}")
+            if log:
+                print(log, end="")
+            if ok is None:
+                stats["unchanged"] += 1
+                stats[repo_types[course_code]] += 1
+            elif ok:
                 stats["success"] += 1
-                stats[repo_type] += 1
+                stats[repo_types[course_code]] += 1
             else:
                 stats["failed"] += 1
-            
+                failed.append(course_code)
             print()
         
         # 统计信息
@@ -94,11 +126,14 @@ class GitHubAutomation:
         print("=" * 70)
         print(f"总课程数:       {len(courses)}")
         print(f"成功上传:       {stats['success']}")
+        print(f"远程未变化:     {stats['unchanged']}")
         print(f"上传失败:       {stats['failed']}")
         print(f"无法识别:       {stats['unknown']}")
         print()
         print(f"  Normal类型:       {stats['normal']} 个")
         print(f"  Multi-project类型: {stats['multi-project']} 个")
+        if failed:
+            print(f"  失败的仓库: {', '.join(sorted(failed))}")
         print()
         
         return stats["failed"] == 0
@@ -131,6 +166,7 @@ class GitHubAutomation:
         print("=" * 70)
         print(f"找到 {len(courses)} 个课程仓库")
         print()
+        self.prefetch(courses)
         
         stats = {
             "success": 0,
@@ -140,32 +176,28 @@ class GitHubAutomation:
             "unknown": 0
         }
         
-        for i, course_code in enumerate(courses, 1):
+        jobs = []
+        for course_code in courses:
             repo_type = determine_type_deploy(course_code, self.readme_output)
             
             if repo_type == "unknown":
-                print(f"[{i:3d}/{len(courses)}] ⚠️  {course_code}: 无法判断仓库类型，跳过")
+                print(f"⚠️  {course_code}: 无法判断仓库类型，跳过")
                 stats["unknown"] += 1
                 continue
             
             workflow_content = normal_workflow if repo_type == "normal" else multi_workflow
-            
-            print(f"[{i:3d}/{len(courses)}] {course_code:20s} ({repo_type:15s})...", end=" ")
-            
-            try:
-                if self.deployer.deploy_workflow(
-                    course_code,
-                    workflow_content,
-                    f"ci: Add automatic format and update workflow for {repo_type} repos"
-                ):
-                    print("✓")
-                    stats["success"] += 1
-                    stats[repo_type] += 1
-                else:
-                    print("❌")
-                    stats["failed"] += 1
-            except Exception as e:
-                print(f"❌ ({e})")
+            jobs.append((course_code, repo_type, workflow_content))
+        
+        # 并发模式下按完成顺序输出
+        repo_types = {job[0]: job[1] for job in jobs}
+        for i, (course_code, ok, log) in enumerate(deploy_courses(self.deployer, jobs, self.concurrency), 1):
+            print(f"[{i:3d}/{len(jobs)}] {course_code:20s} ({repo_types[course_code]:15s})... {'✓' if ok else '❌'}")
+            if log:
+                print(log, end="")
+            if ok:
+                stats["success"] += 1
+                stats[repo_types[course_code]] += 1
+            else:
                 stats["failed"] += 1
         
         # 统计信息
@@ -243,8 +275,27 @@ def main():
         "--token",
         help="GitHub Personal Access Token（可选，默认从GITHUB_TOKEN环境变量读取）"
     )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=1,
+        help="上传与部署时同时处理的仓库数（默认 1 为逐个处理）"
+    )
+    parser.add_argument(
+        "--git-data",
+        action="store_true",
+        help="上传时通过 Git Data API 把每个仓库的改动合并为一个提交"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=TRACE_PATH,
+        help="记录每个仓库的耗时与每个 GitHub 请求，逐条写入 FILE（JSON lines）并在结束时打印汇总"
+    )
     
     args = parser.parse_args()
+    if args.trace:
+        recorder.configure(args.trace)
     
     # 获取token
     token = args.token or os.getenv("GITHUB_TOKEN")
@@ -263,7 +314,7 @@ def main():
         sys.exit(1)
     
     # 初始化自动化工具
-    automation = GitHubAutomation(token)
+    automation = GitHubAutomation(token, concurrency=args.concurrency, use_git_data=args.git_data)
     
     # 执行指定操作
     if args.push:
@@ -296,6 +347,7 @@ def main():
             automation.run_all()
         else:
             print("已退出")
+    recorder.report()
 
 
 if __name__ == "__main__":
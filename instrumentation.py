@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行埋点：分阶段耗时与计数
+- 每门课程各阶段（parse/repair/format/render/write/copy/push/deploy）的耗时；逐块写出 README 时
+  产生文本块（render）与比较、写盘（write）分开计时
+- 每个 GitHub 请求的方法、端点类别、状态码、延迟和收发字节数
+- 速率限制等待、重试退避、解析缓存命中等计数
+
+每条记录写为一行 JSON，运行结束时打印汇总，用来判断一次慢的运行究竟慢在
+TOML 修复、磁盘还是 GitHub。默认关闭（每个埋点只多一次属性判断），
+通过各脚本的 --trace FILE 参数或环境变量 PIPELINE_TRACE=FILE 开启。
+
+多进程转换时，子进程中的记录先缓存在内存中，由 drain() 取出后随结果返回主进程，
+再由 merge() 写入同一个文件并计入汇总。
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+import contextvars
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+# 默认的埋点输出文件，命令行 --trace 参数优先
+TRACE_PATH = os.environ.get("PIPELINE_TRACE") or None
+# 汇总中列出的最慢课程数
+SLOWEST_COURSES = 5
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Recorder:
+    """线程安全的埋点记录器（并发的 asyncio 任务各自归属自己的课程）；同一进程中的所有模块共用 recorder 单例"""
+
+    def __init__(self):
+        self.enabled = False
+        self.path: Optional[str] = None
+        self._file = None
+        self._lock = threading.Lock()
+        # 当前课程随线程和 asyncio 任务各自独立（每个任务持有自己的上下文副本）
+        self._course: contextvars.ContextVar = contextvars.ContextVar("course", default=None)
+        # 写出记录的进程；在其他进程（fork 出的子进程）中产生的记录只缓存，等待 drain()
+        self._pid: Optional[int] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._reset()
+
+    def _reset(self):
+        # 阶段 -> 每次耗时；课程 -> 总耗时
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self.courses: Dict[str, float] = defaultdict(float)
+        # (方法, 端点类别) -> 统计
+        self.requests: Dict[tuple, Dict[str, Any]] = {}
+        self.counters: Counter = Counter()
+
+    def configure(self, path: Optional[str] = TRACE_PATH):
+        """
+        开启埋点
+
+        Args:
+            path: JSON lines 输出文件；为 None 时只在内存中汇总
+        """
+        self.close()
+        self._reset()
+        self.enabled = True
+        self.path = path
+        self._pid = os.getpid()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # 行缓冲：每条记录立即落盘，fork 出的子进程不会继承未写出的缓冲
+            self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def collect(self):
+        """开启埋点但不写文件，所有记录留待 drain() 取出（供进程池中的子进程使用）"""
+        if not self.enabled:
+            self.configure(None)
+        self._pid = None
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+
+    @property
+    def current_course(self) -> Optional[str]:
+        return self._course.get()
+
+    @contextlib.contextmanager
+    def course(self, name: str):
+        """标记当前线程（或 asyncio 任务）正在处理的课程，期间的阶段与请求记录都归属该课程"""
+        token = self._course.set(name)
+        try:
+            yield
+        finally:
+            self._course.reset(token)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """记录 with 块的耗时（出现异常时同样记录）"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds(name, time.perf_counter() - start)
+
+    def stage_seconds(self, name: str, seconds: float):
+        """直接记录一个阶段的耗时（用于无法用 with 块包住的阶段，如交错执行的渲染与写盘）"""
+        if not self.enabled:
+            return
+        self._record({
+            "type": "stage",
+            "course": self.current_course,
+            "stage": name,
+            "seconds": round(seconds, 6),
+        })
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        status: int,
+        seconds: float,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+        attempt: int = 0,
+        error: Optional[str] = None
+    ):
+        """记录一次 HTTP 请求（每次重试单独记录）；status 为 0 表示网络错误"""
+        if not self.enabled:
+            return
+        event = {
+            "type": "request",
+            "course": self.current_course,
+            "method": method,
+            "endpoint": endpoint,
+            "status": status,
+            "seconds": round(seconds, 6),
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "attempt": attempt,
+        }
+        if error:
+            event["error"] = error
+        self._record(event)
+
+    def count(self, name: str, value: float = 1):
+        """累加计数器（只计入汇总，不逐条写出）"""
+        if not self.enabled:
+            return
+        self._record({"type": "count", "name": name, "value": value})
+
+    def _record(self, event: Dict[str, Any]):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pending.append(event)
+                return
+            self._aggregate(event)
+            if self._file is not None and event["type"] != "count":
+                event["ts"] = round(time.time(), 3)
+                self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def _aggregate(self, event: Dict[str, Any]):
+        kind = event["type"]
+        if kind == "count":
+            self.counters[event["name"]] += event["value"]
+            return
+        if kind == "stage":
+            self.stages[event["stage"]].append(event["seconds"])
+            # 课程耗时只累加阶段记录（请求耗时已包含在 push/deploy 阶段中）
+            if event.get("course"):
+                self.courses[event["course"]] += event["seconds"]
+            return
+        entry = self.requests.setdefault((event["method"], event["endpoint"]), {
+            "latencies": [], "bytes_in": 0, "bytes_out": 0, "statuses": Counter(),
+        })
+        entry["latencies"].append(event["seconds"])
+        entry["bytes_in"] += event["bytes_in"]
+        entry["bytes_out"] += event["bytes_out"]
+        entry["statuses"][event["status"]] += 1
+
+    # ------------------------------------------------------------------
+    # 跨进程合并
+    # ------------------------------------------------------------------
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """取出并清空本进程缓存的记录"""
+        with self._lock:
+            events, self._pending = self._pending, []
+        return events
+
+    def merge(self, events: Iterable[Dict[str, Any]]):
+        """把子进程返回的记录写入输出文件并计入汇总"""
+        for event in events:
+            self._record(event)
+
+    # ------------------------------------------------------------------
+    # 汇总
+    # ------------------------------------------------------------------
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {
+                    name: {
+                        "count": len(values),
+                        "seconds": round(sum(values), 4),
+                        "max_ms": round(max(values) * 1000, 2),
+                    }
+                    for name, values in self.stages.items()
+                },
+                "requests": {
+                    f"{method} {endpoint}": {
+                        "count": len(entry["latencies"]),
+                        "seconds": round(sum(entry["latencies"]), 4),
+                        "p50_ms": round(_percentile(entry["latencies"], 50) * 1000, 1),
+                        "p99_ms": round(_percentile(entry["latencies"], 99) * 1000, 1),
+                        "bytes_in": entry["bytes_in"],
+                        "bytes_out": entry["bytes_out"],
+                        "statuses": {str(k): v for k, v in sorted(entry["statuses"].items())},
+                    }
+                    for (method, endpoint), entry in sorted(self.requests.items())
+                },
+                "slowest_courses": [
+                    [name, round(seconds, 4)]
+                    for name, seconds in sorted(self.courses.items(), key=lambda item: -item[1])[:SLOWEST_COURSES]
+                ],
+                "counters": {name: round(value, 4) for name, value in sorted(self.counters.items())},
+            }
+
+    def report(self):
+        """打印汇总，并把汇总作为最后一条记录写入输出文件；未开启埋点时什么也不做"""
+        if not self.enabled:
+            return
+        summary = self.summary()
+        if self._file is not None:
+            with self._lock:
+                self._file.write(json.dumps({"type": "summary", "ts": round(time.time(), 3), **summary},
+                                            ensure_ascii=False) + "\n")
+
+        print()
+        print("=" * 60)
+        print("耗时统计")
+        print("=" * 60)
+        if summary["stages"]:
+            print(f"{'阶段':10s} {'次数':>6s} {'总计(s)':>10s} {'平均(ms)':>10s} {'最大(ms)':>10s}")
+            for name, s in summary["stages"].items():
+                mean_ms = s["seconds"] * 1000 / s["count"] if s["count"] else 0.0
+                print(f"{name:12s} {s['count']:>6d} {s['seconds']:>10.3f} {mean_ms:>10.2f} {s['max_ms']:>10.2f}")
+            print()
+        if summary["requests"]:
+            print(f"{'GitHub 请求':24s} {'次数':>6s} {'总计(s)':>9s} {'p50(ms)':>8s} {'p99(ms)':>8s} "
+                  f"{'收(KB)':>8s} {'发(KB)':>8s}  状态码")
+            for name, r in summary["requests"].items():
+                statuses = " ".join(f"{code}×{n}" for code, n in r["statuses"].items())
+                print(f"{name:28s} {r['count']:>6d} {r['seconds']:>9.3f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                      f"{r['bytes_in'] / 1024:>8.1f} {r['bytes_out'] / 1024:>8.1f}  {statuses}")
+            print()
+        if summary["slowest_courses"]:
+            slowest = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in summary["slowest_courses"])
+            print(f"最慢的课程: {slowest}")
+        for name, value in summary["counters"].items():
+            print(f"{name}: {value:g}")
+        if self.path:
+            print(f"埋点记录已写入: {self.path}")
+        self.close()
+
+
+# 进程内共用的记录器
+recorder = Recorder()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+README 文本处理公共组件
+供 normal 与 multi-project 两个转换脚本共用：
+- normalize_content: 评价正文的规范化（去缩进、去行首空白、合并空行），按原文缓存结果
+- autolink:          把裸 URL 转为 Markdown 链接，已有的链接、图片、<URL>、行内代码和 HTML 标签保持原样
+- MarkdownBuilder:   逐块构建文档，追加时就完成 URL 转换和空行合并，最后只拼接一次
+
+以前的做法是先拼出整篇文档，再对全文依次执行 URL 替换和 \\n{3,} 合并两次正则；
+URL 正则会把 [文字](链接) 中的链接再包一层，得到 [文字]([链接](链接))。
+"""
+
+import re
+import textwrap
+import functools
+from typing import List
+
+# 正文规范化与 URL 转换结果的缓存条数；同一段评价常在多个课程和多次渲染中重复出现
+CONTENT_CACHE_SIZE = 4096
+
+# 一次扫描中按优先级匹配：已有的 Markdown 图片/链接（链接文字可嵌套一层方括号，如徽章链接）、
+# <URL> 自动链接、行内代码、HTML 标签——原样保留；其余位置的裸 URL 转为链接。
+# 每个分支都以固定字符开头且不使用分组，正则引擎可以直接跳到候选字符处尝试匹配；
+# 匹配结果以 h 开头即为裸 URL
+_LINK = r"\[(?:[^\[\]\n]|\[[^\[\]\n]*\])*\]\((?:[^()\s]|\([^()\s]*\))*(?:\s+\"[^\"\n]*\")?\)"
+_LINK_OR_URL = re.compile(
+    "!" + _LINK
+    + "|" + _LINK
+    + r"|<https?://[^>\s]*>"
+    + r"|`[^`\n]+`"
+    + r"|<[A-Za-z][^<>\n]*>"
+    + r"|https?://[^\s\)\]\">]+"
+)
+_BLANK_RUN = re.compile(r'\n{3,}')
+
+
+@functools.lru_cache(maxsize=CONTENT_CACHE_SIZE)
+def normalize_content(raw: str, dedent: bool = True) -> str:
+    """
+    规范化一段评价正文（结果按原文缓存）
+
+    Args:
+        raw: TOML 中的原始文本
+        dedent: 为 True 时去除公共缩进和每行行首空白（multi-project 评价）；
+                为 False 时只去掉首尾空白（normal 评价保留行首缩进，如列表和 HTML）
+
+    Returns:
+        首尾无空白、连续空行合并为一个的文本
+    """
+    if dedent:
+        text = '\n'.join(line.lstrip() for line in textwrap.dedent(raw).strip().splitlines())
+    else:
+        text = raw.strip()
+    if '\n\n\n' in text:
+        text = _BLANK_RUN.sub('\n\n', text)
+    return text
+
+
+def _link_or_keep(match: re.Match) -> str:
+    text = match.group(0)
+    return f"[{text}]({text})" if text[0] == 'h' else text
+
+
+@functools.lru_cache(maxsize=CONTENT_CACHE_SIZE)
+def autolink(text: str) -> str:
+    """
+    把文本中的裸 URL 转为 [URL](URL)，不处理已在链接语法中的 URL
+    需要保留的语法都不跨行，因此只扫描含有 URL 的行
+    """
+    if '://' not in text:
+        return text
+    if '\n' not in text:
+        return _LINK_OR_URL.sub(_link_or_keep, text)
+    return '\n'.join(
+        _LINK_OR_URL.sub(_link_or_keep, line) if '://' in line else line
+        for line in text.split('\n')
+    )
+
+
+class MarkdownBuilder:
+    """
+    按块构建 Markdown 文档
+    add() 追加一个块（块之间以换行分隔，块本身可以包含多行），blank() 追加一个空行；
+    连续的空行最多保留一个，末尾的空行去掉，文档以单个换行结尾
+    """
+
+    __slots__ = ("_parts", "_newlines", "_tail", "_empty")
+
+    def __init__(self):
+        self._parts: List[str] = []
+        # 尚未输出的换行数，遇到下一个非空块时最多输出两个（即最多一个空行）
+        self._newlines = 0
+        # 最后一个非空块自身末尾的换行数
+        self._tail = 0
+        self._empty = True
+
+    def add(self, text: str):
+        """追加一个文本块，块内的裸 URL 转为链接、连续空行合并"""
+        if self._empty:
+            self._empty = False
+        else:
+            self._newlines += 1
+        if not text:
+            return
+        if text[0] == '\n' or text[-1] == '\n':
+            body = text.strip('\n')
+            if not body:
+                self._newlines += len(text)
+                self._tail = self._newlines
+                return
+            self._newlines += len(text) - len(text.lstrip('\n'))
+            trailing = len(text) - len(text.rstrip('\n'))
+            text = body
+        else:
+            trailing = 0
+        if self._newlines:
+            self._parts.append('\n\n' if self._newlines >= 2 else '\n')
+        if '\n\n\n' in text:
+            text = _BLANK_RUN.sub('\n\n', text)
+        if '://' in text:
+            text = autolink(text)
+        self._parts.append(text)
+        self._newlines = self._tail = trailing
+
+    def blank(self):
+        if self._empty:
+            self._empty = False
+        else:
+            self._newlines += 1
+
+    def pair(self, text: str):
+        """追加一个文本块和其后的空行（最常见的用法）"""
+        self.add(text)
+        self._newlines += 1
+
+    def take(self) -> str:
+        """取出已确定的文本并清空缓冲；末尾待定的换行留到下一个块或 getvalue() 时输出"""
+        text = ''.join(self._parts)
+        self._parts.clear()
+        return text
+
+    def getvalue(self) -> str:
+        """返回尚未取出的文本（未调用 take() 时即整篇文档）"""
+        # 去掉末尾的空行后以单个换行结尾
+        newlines = self._tail + 1
+        return ''.join(self._parts) + ('\n\n' if newlines >= 2 else '\n')
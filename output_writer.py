@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+readme_output 输出文件的写入
+- 新内容与已有文件相同时不写入，文件的 mtime 保持不变，下游的增量工具不会被触发
+- 需要写入时先写同目录下的临时文件，再用 os.replace 原子替换；
+  并行运行被中断时不会留下写了一半的 README.md / readme.toml
+
+比较时先看文件大小，大小一致再逐块比较内容。渲染器逐块产生的文本流也可以直接写入：
+边生成边与旧文件比较，只有出现差异后才开始写临时文件（先补上已比较过的相同部分）。
+
+readme.toml 与源 TOML 内容相同，可以不复制数据而直接链接（见 materialize）：
+- copy:     普通复制（默认）
+- reflink:  写时复制的克隆（Btrfs、XFS 等文件系统），不占用额外空间，之后两个文件互不影响
+- hardlink: 硬链接，与源文件共享同一份数据；源文件被原地改写时 readme.toml 随之变化
+通过命令行 --toml-mode 或环境变量 TOML_OUTPUT_MODE 选择。
+"""
+
+import os
+import sys
+import time
+import uuid
+import shutil
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+from instrumentation import recorder
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 比较与复制时每次读取的字节数
+BLOCK_SIZE = 1 << 16
+
+# 每种方式失败（文件系统不支持、跨设备等）时依次尝试的方式
+MATERIALIZE_FALLBACKS = {
+    "copy": ("copy",),
+    "reflink": ("reflink", "copy"),
+    "hardlink": ("hardlink", "reflink", "copy"),
+}
+
+
+def _env_toml_mode() -> str:
+    """读取环境变量 TOML_OUTPUT_MODE，取值无效时提示并退回 copy"""
+    mode = os.environ.get("TOML_OUTPUT_MODE", "copy")
+    if mode not in MATERIALIZE_FALLBACKS:
+        print(f"[WARN] 环境变量 TOML_OUTPUT_MODE 的取值无效: {mode}"
+              f"（可选 {' / '.join(MATERIALIZE_FALLBACKS)}），改用 copy")
+        return "copy"
+    return mode
+
+
+# readme.toml 的生成方式，命令行 --toml-mode 参数优先
+TOML_OUTPUT_MODE = _env_toml_mode()
+# Linux 的 FICLONE ioctl（Python 3.12 起 fcntl 模块才提供该常量）
+FICLONE = getattr(fcntl, "FICLONE", 0x40049409) if fcntl and sys.platform.startswith("linux") else None
+
+
+def _temp_path(path: str) -> str:
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex[:12]}.tmp")
+
+
+def _open_temp(path: str) -> Tuple[BinaryIO, str]:
+    """在目标文件所在目录创建临时文件（权限与普通 open 创建的文件相同）"""
+    tmp_path = _temp_path(path)
+    return open(tmp_path, 'xb'), tmp_path
+
+
+def _discard(tmp_path: Optional[str]):
+    if tmp_path is None:
+        return
+    try:
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+def _same_content(path: str, data: bytes) -> bool:
+    """已有文件与 data 完全相同时返回 True（大小不同时不读取文件）"""
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+        with open(path, 'rb') as f:
+            view = memoryview(data)
+            for offset in range(0, len(data), BLOCK_SIZE):
+                if f.read(BLOCK_SIZE) != view[offset:offset + BLOCK_SIZE]:
+                    return False
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _same_files(src: str, dst: str) -> bool:
+    """两个文件内容相同时返回 True（大小不同时不读取文件）"""
+    try:
+        if os.stat(src).st_size != os.stat(dst).st_size:
+            return False
+        with open(src, 'rb') as a, open(dst, 'rb') as b:
+            while True:
+                block = a.read(BLOCK_SIZE)
+                if block != b.read(BLOCK_SIZE):
+                    return False
+                if not block:
+                    return True
+    except FileNotFoundError:
+        return False
+
+
+def _copy_prefix(src: BinaryIO, dst: BinaryIO, size: int):
+    """把 src 开头的 size 个字节复制到 dst"""
+    while size > 0:
+        block = src.read(min(BLOCK_SIZE, size))
+        if not block:
+            break
+        dst.write(block)
+        size -= len(block)
+
+
+def _finish(changed: bool, size: int = 0) -> bool:
+    recorder.count("outputs_written" if changed else "outputs_unchanged")
+    if changed and size:
+        recorder.count("output_bytes_written", size)
+    return changed
+
+
+class _TimedChunks:
+    """包装文本块流，累计等待下一个文本块（即产生文本块）的耗时"""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self.seconds = 0.0
+
+    def __iter__(self) -> Iterator[str]:
+        return self
+
+    def __next__(self) -> str:
+        start = time.perf_counter()
+        try:
+            return next(self._chunks)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def write_if_changed(
+    path: str,
+    content: Union[str, Iterable[str]],
+    encoding: str = 'utf-8',
+    stage: Optional[str] = None
+) -> bool:
+    """
+    把文本写入 path，内容与已有文件相同时不写入
+
+    Args:
+        path: 输出文件路径（所在目录须已存在）
+        content: 完整文本，或按顺序产生的文本块（如渲染器的 iter_markdown）
+        encoding: 文件编码
+        stage: 埋点阶段名（可选）；给出时产生文本块的耗时记为该阶段，比较与写盘的耗时记为 write 阶段
+
+    Returns:
+        True 表示写入了新内容，False 表示内容未变化
+    """
+    if stage is None or not recorder.enabled:
+        return _write_if_changed(path, content, encoding)
+
+    chunks = content if isinstance(content, str) else _TimedChunks(content)
+    start = time.perf_counter()
+    try:
+        return _write_if_changed(path, chunks, encoding)
+    finally:
+        produced = getattr(chunks, "seconds", 0.0)
+        recorder.stage_seconds(stage, produced)
+        recorder.stage_seconds("write", time.perf_counter() - start - produced)
+
+
+def _write_if_changed(path: str, content: Union[str, Iterable[str]], encoding: str) -> bool:
+    if isinstance(content, str):
+        data = content.encode(encoding)
+        if _same_content(path, data):
+            return _finish(False)
+        # 已确定内容不同，直接写入临时文件
+        content, old = (content,), None
+    else:
+        try:
+            old = open(path, 'rb')
+        except FileNotFoundError:
+            old = None
+
+    tmp, tmp_path = None, None
+    matched = 0  # 与旧文件开头相同、尚未写入临时文件的字节数
+    size = 0
+    try:
+        for chunk in content:
+            if not chunk:
+                continue
+            data = chunk.encode(encoding)
+            size += len(data)
+            if tmp is None:
+                if old is not None and old.read(len(data)) == data:
+                    matched += len(data)
+                    continue
+                tmp, tmp_path = _open_temp(path)
+                if matched:
+                    old.seek(0)
+                    _copy_prefix(old, tmp, matched)
+            tmp.write(data)
+
+        if tmp is None:
+            # 所有文本块都与旧文件开头一致，旧文件没有多余内容时即完全相同
+            if old is not None and not old.read(1):
+                return _finish(False)
+            tmp, tmp_path = _open_temp(path)
+            if matched:
+                old.seek(0)
+                _copy_prefix(old, tmp, matched)
+
+        tmp.close()
+        os.replace(tmp_path, path)
+        tmp_path = None
+        return _finish(True, size)
+    finally:
+        if tmp is not None:
+            tmp.close()
+        _discard(tmp_path)
+        if old is not None:
+            old.close()
+
+
+def _same_inode(src: str, dst: str) -> bool:
+    try:
+        return os.path.samefile(src, dst)
+    except FileNotFoundError:
+        return False
+
+
+def _link(src: str, tmp_path: str):
+    os.link(src, tmp_path)
+
+
+def _reflink(src: str, tmp_path: str):
+    if FICLONE is None:
+        raise OSError("当前平台不支持 reflink")
+    with open(src, 'rb') as s, open(tmp_path, 'xb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    shutil.copystat(src, tmp_path)
+
+
+def _copy(src: str, tmp_path: str):
+    with open(src, 'rb') as s, open(tmp_path, 'xb') as d:
+        shutil.copyfileobj(s, d, BLOCK_SIZE)
+    shutil.copystat(src, tmp_path)
+
+
+_METHODS = {"hardlink": _link, "reflink": _reflink, "copy": _copy}
+# 已提示过的 (请求的方式, 实际使用的方式)，每种退回只提示一次
+_warned = set()
+
+
+def materialize(src: str, dst: str, mode: str = TOML_OUTPUT_MODE) -> bool:
+    """
+    在 dst 生成与 src 内容相同的文件，已经相同时不做任何事
+    先在同目录下生成临时文件并校验（硬链接须指向同一文件，其余方式须内容一致），
+    再用 os.replace 原子替换；当前方式失败或校验不通过时按 MATERIALIZE_FALLBACKS 退回
+
+    Args:
+        src: 源文件
+        dst: 目标文件（所在目录须已存在）
+        mode: "copy" / "reflink" / "hardlink"
+
+    Returns:
+        True 表示 dst 发生了变化，False 表示无需改动
+
+    Raises:
+        ValueError: 未知的 mode
+        OSError: 所有方式均失败
+    """
+    if mode not in MATERIALIZE_FALLBACKS:
+        raise ValueError(f"未知的 readme.toml 生成方式: {mode}")
+
+    # 硬链接模式下已链接即无需改动；其他模式下已链接的文件要替换为独立的文件
+    linked = _same_inode(src, dst)
+    if linked if mode == "hardlink" else (not linked and _same_files(src, dst)):
+        return _finish(False)
+
+    errors = []
+    for method in MATERIALIZE_FALLBACKS[mode]:
+        tmp_path = _temp_path(dst)
+        try:
+            _METHODS[method](src, tmp_path)
+            verified = _same_inode(src, tmp_path) if method == "hardlink" else _same_files(src, tmp_path)
+            if not verified:
+                raise OSError("生成的文件与源文件不一致")
+            os.replace(tmp_path, dst)
+        except OSError as e:
+            _discard(tmp_path)
+            errors.append(f"{method}: {e}")
+            continue
+
+        if method != mode and (mode, method) not in _warned:
+            _warned.add((mode, method))
+            print(f"  [WARN] 无法以 {mode} 方式生成 readme.toml（{'；'.join(errors)}），改用 {method}")
+        recorder.count(f"toml_{method}")
+        return _finish(True)
+
+    raise OSError(f"无法生成 {dst}: {'；'.join(errors)}")
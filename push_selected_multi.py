@@ -23,4 +23,7 @@ if __name__ == '__main__':
             print('  本地文件不存在，跳过')
             continue
         ok = pusher.push_course(t, 'multi-project', str(toml), str(readme))
-        print(f'  结果: {ok}')
+        if ok is None:
+            print('  结果: 远程未变化，已跳过')
+        else:
+            print(f'  结果: {ok}')
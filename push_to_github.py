@@ -8,76 +8,158 @@
 """
 
 import os
-import json
 import base64
 import sys
 import time
+import asyncio
 from pathlib import Path
-from typing import Optional, Dict, Any
-import requests
+from typing import Optional, Dict, Any, Iterable, Iterator, Tuple
+
+from github_api import DEFAULT_POOL_SIZE, GitHubClient, git_blob_sha, log
+from instrumentation import TRACE_PATH, recorder
+from toml_loader import load_repo_type
+
+# 等待 Fork 就绪的默认期限与轮询间隔（秒）
+FORK_TIMEOUT = 120.0
+FORK_POLL_INITIAL = 1.0
+FORK_POLL_MAX = 16.0
+
+
+class ForkManager:
+    """
+    管理当前用户名下的 Fork
+    - 第一次使用时用一次列表查询找出已有的 Fork，之后直接复用
+    - 新建的 Fork 按指数退避轮询，直到默认分支可读或超过期限
+    - 等待只挂起当前仓库的任务，并发模式下其他仓库照常处理
+    """
+
+    def __init__(self, pusher: "GitHubAPIPusher", timeout: float = FORK_TIMEOUT):
+        self.pusher = pusher
+        self.timeout = timeout
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._login: Optional[str] = None
+        self._forks: set = set()
+
+    async def _load(self):
+        """获取当前用户名，并列出其名下所有 Fork（只执行一次）"""
+        async with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            me = await self.pusher._get_authenticated_user()
+            self._login = me.get("login") if me else None
+            if not self._login:
+                return
+            page = 1
+            while True:
+                repos = await self.pusher._api_request(
+                    "GET", f"/user/repos?affiliation=owner&per_page=100&page={page}"
+                )
+                if not repos:
+                    break
+                self._forks.update(r["name"] for r in repos if r.get("fork"))
+                if len(repos) < 100:
+                    break
+                page += 1
+
+    async def login(self) -> Optional[str]:
+        await self._load()
+        return self._login
+
+    async def ensure_fork(self, repo: str, default_branch: str, upstream_owner: Optional[str] = None) -> Optional[str]:
+        """
+        确保当前用户名下存在可用的 Fork
+
+        Returns:
+            Fork 所属用户名；无法获取用户信息、Fork 失败或超时时返回 None
+        """
+        login = await self.login()
+        if not login:
+            log(f"    [WARN] 无法获取当前用户信息，放弃 Fork 路径")
+            return None
+        if repo in self._forks:
+            log(f"    [OK] 复用已有 Fork: {login}/{repo}")
+            return login
+
+        if not await self.pusher._create_fork(repo, owner=upstream_owner):
+            log(f"    [WARN] Fork 操作失败或不可用")
+            return None
+
+        # Fork 在后台异步创建，轮询到默认分支可读为止
+        deadline = time.monotonic() + self.timeout
+        delay = FORK_POLL_INITIAL
+        while True:
+            if await self.pusher._get_branch_ref_owner(repo, default_branch, owner=login):
+                self._forks.add(repo)
+                return login
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                log(f"    [WARN] 等待 Fork 就绪超时 ({self.timeout:.0f} 秒): {login}/{repo}")
+                return None
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, FORK_POLL_MAX)
+
 
 class GitHubAPIPusher:
-    def __init__(self, github_token: str, org: str = "HITSZ-OpenAuto"):
+    def __init__(
+        self,
+        github_token: str,
+        org: str = "HITSZ-OpenAuto",
+        pool_size: int = DEFAULT_POOL_SIZE,
+        client: Optional[GitHubClient] = None,
+        use_git_data: bool = False,
+        fork_timeout: float = FORK_TIMEOUT
+    ):
         """
         初始化GitHub API推送器
         
         Args:
             github_token: GitHub个人访问令牌
             org: GitHub组织名称
+            pool_size: HTTP连接池大小
+            client: 共享的 GitHubClient（可选，默认新建带连接池的客户端）
+            use_git_data: 是否通过 Git Data API 把所有改动合并为一个提交
+            fork_timeout: 等待新建 Fork 就绪的最长时间（秒）
         """
         self.token = github_token
         self.org = org
-        self.base_url = "https://api.github.com"
-        self.headers = {
-            "Authorization": f"token {github_token}",
-            "Accept": "application/vnd.github.v3+json",
-            "Content-Type": "application/json"
-        }
+        self.use_git_data = use_git_data
+        # 所有仓库共用同一个客户端，复用 keep-alive 连接
+        self.client = client or GitHubClient(github_token, pool_size=pool_size)
+        # 预取的仓库元数据快照（见 prefetch），未命中的仓库走 REST 查询
+        self.snapshot: Dict[str, Dict[str, Any]] = {}
+        self.forks = ForkManager(self, timeout=fork_timeout)
         
-    def _api_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict[str, Any]:
-        """发送API请求"""
-        url = f"{self.base_url}{endpoint}"
-        try:
-            timeout = 15
-            if method == "GET":
-                response = requests.get(url, headers=self.headers, timeout=timeout)
-            elif method == "PUT":
-                response = requests.put(url, headers=self.headers, json=data, timeout=timeout)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=self.headers, timeout=timeout)
-            elif method == "POST":
-                response = requests.post(url, headers=self.headers, json=data, timeout=timeout)
-            else:
-                raise ValueError(f"不支持的方法: {method}")
-            
-            # 如果是 404/422，视为不存在/无法处理
-            if response.status_code in [404, 422]:
-                return None
-
-            # 其他非 2xx 抛出异常
-            response.raise_for_status()
-            return response.json() if response.text else {}
-        except requests.exceptions.Timeout:
-            print(f"API 请求超时: {method} {url}")
-            return None
-        except requests.exceptions.RequestException as e:
-            # 其他错误才输出日志
-            print(f"API请求失败: {e}")
-            return None
-
+    def prefetch(self, repos: Iterable[str]) -> int:
+        """用批量 GraphQL 查询预取所有仓库的默认分支、最新提交和根目录文件，返回命中的仓库数"""
+        self.snapshot.update(self.client.run(self.client.prefetch(self.org, repos)))
+        return len(self.snapshot)
+        
+    async def _api_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Optional[Any]:
+        """发送API请求；404/422 及其他失败返回 None"""
+        return await self.client.call(method, endpoint, data)
     
-    def _get_file_content(self, repo: str, path: str) -> Optional[Dict[str, Any]]:
+    async def _get_file_content(self, repo: str, path: str) -> Optional[Dict[str, Any]]:
         """获取仓库中的文件信息"""
-        return self._get_file_content_owner(repo, path, owner=self.org)
+        return await self._get_file_content_owner(repo, path, owner=self.org)
 
-    def _get_file_content_owner(self, repo: str, path: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    async def _get_file_content_owner(
+        self,
+        repo: str,
+        path: str,
+        owner: Optional[str] = None,
+        ref: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         owner = owner or self.org
         endpoint = f"/repos/{owner}/{repo}/contents/{path}"
-        return self._api_request("GET", endpoint)
+        if ref:
+            endpoint += f"?ref={ref}"
+        return await self._api_request("GET", endpoint)
     
-    def _delete_file(self, repo: str, path: str, commit_message: str) -> bool:
+    async def _delete_file(self, repo: str, path: str, commit_message: str) -> bool:
         """删除仓库中的文件"""
-        file_info = self._get_file_content_owner(repo, path, owner=self.org)
+        file_info = await self._get_file_content_owner(repo, path, owner=self.org)
         if not file_info:
             return False
         endpoint = f"/repos/{self.org}/{repo}/contents/{path}"
@@ -85,12 +167,19 @@ class GitHubAPIPusher:
             "message": commit_message,
             "sha": file_info.get("sha")
         }
-        result = self._api_request("DELETE", endpoint, data)
+        result = await self._api_request("DELETE", endpoint, data)
         return result is not None
 
-    def _delete_file_owner(self, repo: str, path: str, commit_message: str, owner: Optional[str] = None) -> bool:
+    async def _delete_file_owner(
+        self,
+        repo: str,
+        path: str,
+        commit_message: str,
+        owner: Optional[str] = None,
+        branch: Optional[str] = None
+    ) -> bool:
         owner = owner or self.org
-        file_info = self._get_file_content_owner(repo, path, owner=owner)
+        file_info = await self._get_file_content_owner(repo, path, owner=owner, ref=branch)
         if not file_info:
             return False
         endpoint = f"/repos/{owner}/{repo}/contents/{path}"
@@ -98,10 +187,12 @@ class GitHubAPIPusher:
             "message": commit_message,
             "sha": file_info.get("sha")
         }
-        result = self._api_request("DELETE", endpoint, data)
+        if branch:
+            data["branch"] = branch
+        result = await self._api_request("DELETE", endpoint, data)
         return result is not None
     
-    def _create_or_update_file(
+    async def _create_or_update_file(
         self, 
         repo: str, 
         path: str, 
@@ -115,8 +206,11 @@ class GitHubAPIPusher:
         endpoint = f"/repos/{owner}/{repo}/contents/{path}"
 
         # 检查文件是否已存在（在指定分支上）
-        file_info = self._get_file_content_owner(repo, path, owner=owner)
+        file_info = await self._get_file_content_owner(repo, path, owner=owner, ref=branch)
         sha = file_info.get("sha") if file_info else None
+        if sha == git_blob_sha(content):
+            # 内容完全相同，无需提交
+            return True
         
         # 编码内容为base64
         encoded_content = base64.b64encode(content.encode()).decode()
@@ -130,44 +224,44 @@ class GitHubAPIPusher:
             data["sha"] = sha  # 必须提供SHA来更新现有文件
         
         try:
-            result = self._api_request("PUT", endpoint, data)
+            result = await self._api_request("PUT", endpoint, data)
             return result is not None
         except Exception:
             return False
     
-    def _get_repo_info(self, repo: str) -> Optional[Dict[str, Any]]:
+    async def _get_repo_info(self, repo: str) -> Optional[Dict[str, Any]]:
         """获取仓库信息，包括默认分支"""
-        return self._get_repo_info_owner(repo, owner=self.org)
+        return await self._get_repo_info_owner(repo, owner=self.org)
 
-    def _get_repo_info_owner(self, repo: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    async def _get_repo_info_owner(self, repo: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
         owner = owner or self.org
         endpoint = f"/repos/{owner}/{repo}"
-        return self._api_request("GET", endpoint)
+        return await self._api_request("GET", endpoint)
     
-    def _get_default_branch(self, repo: str) -> str:
+    async def _get_default_branch(self, repo: str) -> str:
         """获取仓库的默认分支名"""
-        repo_info = self._get_repo_info_owner(repo, owner=self.org)
+        repo_info = await self._get_repo_info_owner(repo, owner=self.org)
         if repo_info and "default_branch" in repo_info:
             return repo_info["default_branch"]
         return "main"  # 默认fallback
     
-    def _get_branch_ref(self, repo: str, branch: str = "main") -> Optional[Dict[str, Any]]:
+    async def _get_branch_ref(self, repo: str, branch: str = "main") -> Optional[Dict[str, Any]]:
         """获取分支的最新commit SHA"""
-        return self._get_branch_ref_owner(repo, branch=branch, owner=self.org)
+        return await self._get_branch_ref_owner(repo, branch=branch, owner=self.org)
 
-    def _get_branch_ref_owner(self, repo: str, branch: str = "main", owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    async def _get_branch_ref_owner(self, repo: str, branch: str = "main", owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
         owner = owner or self.org
         endpoint = f"/repos/{owner}/{repo}/git/refs/heads/{branch}"
-        return self._api_request("GET", endpoint)
+        return await self._api_request("GET", endpoint)
     
-    def _create_branch(self, repo: str, new_branch: str, from_branch: Optional[str] = None) -> bool:
+    async def _create_branch(self, repo: str, new_branch: str, from_branch: Optional[str] = None) -> bool:
         """创建新分支"""
         # 如果没有指定源分支，获取默认分支
         if not from_branch:
-            from_branch = self._get_default_branch(repo)
+            from_branch = await self._get_default_branch(repo)
         
         # 获取源分支的最新commit SHA
-        branch_ref = self._get_branch_ref_owner(repo, from_branch, owner=self.org)
+        branch_ref = await self._get_branch_ref_owner(repo, from_branch, owner=self.org)
         if not branch_ref or "object" not in branch_ref:
             return False
         
@@ -181,17 +275,17 @@ class GitHubAPIPusher:
             "ref": f"refs/heads/{new_branch}",
             "sha": sha
         }
-        result = self._api_request("POST", endpoint, data)
+        result = await self._api_request("POST", endpoint, data)
         return result is not None
 
-    def _create_branch_owner(self, repo: str, new_branch: str, from_branch: Optional[str] = None, owner: Optional[str] = None) -> bool:
+    async def _create_branch_owner(self, repo: str, new_branch: str, from_branch: Optional[str] = None, owner: Optional[str] = None) -> bool:
         owner = owner or self.org
         if not from_branch:
             # get default branch from upstream owner if necessary
-            from_branch = self._get_repo_info_owner(repo, owner=self.org).get("default_branch", "main")
+            from_branch = (await self._get_repo_info_owner(repo, owner=self.org)).get("default_branch", "main")
 
         # try to get ref sha from owner (may be upstream or fork)
-        branch_ref = self._get_branch_ref_owner(repo, from_branch, owner=owner)
+        branch_ref = await self._get_branch_ref_owner(repo, from_branch, owner=owner)
         if not branch_ref or "object" not in branch_ref:
             return False
 
@@ -204,19 +298,19 @@ class GitHubAPIPusher:
             "ref": f"refs/heads/{new_branch}",
             "sha": sha
         }
-        result = self._api_request("POST", endpoint, data)
+        result = await self._api_request("POST", endpoint, data)
         return result is not None
 
-    def _create_fork(self, repo: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    async def _create_fork(self, repo: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
         owner = owner or self.org
         endpoint = f"/repos/{owner}/{repo}/forks"
-        return self._api_request("POST", endpoint)
+        return await self._api_request("POST", endpoint)
 
-    def _get_authenticated_user(self) -> Optional[Dict[str, Any]]:
+    async def _get_authenticated_user(self) -> Optional[Dict[str, Any]]:
         endpoint = "/user"
-        return self._api_request("GET", endpoint)
+        return await self._api_request("GET", endpoint)
     
-    def _create_pr(
+    async def _create_pr(
         self,
         repo: str,
         head: str,
@@ -238,15 +332,179 @@ class GitHubAPIPusher:
             "head": head,
             "base": base
         }
-        return self._api_request("POST", endpoint, data)
+        return await self._api_request("POST", endpoint, data)
     
+    async def _get_tree_owner(self, repo: str, tree_ish: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """获取根目录树（tree_ish 可以是树、提交的 SHA 或分支名）"""
+        owner = owner or self.org
+        endpoint = f"/repos/{owner}/{repo}/git/trees/{tree_ish}"
+        return await self._api_request("GET", endpoint)
+
+    @staticmethod
+    def _target_files(course_code: str, toml_content: str, readme_content: str) -> Dict[str, Optional[str]]:
+        """推送后仓库根目录应有的状态：路径 -> 内容，None 表示该文件应被删除"""
+        return {
+            f"{course_code}.toml": None,
+            f"{course_code}.yaml": None,
+            "readme.yaml": None,
+            "readme.toml": toml_content,
+            "README.md": readme_content,
+        }
+
+    @staticmethod
+    def _tree_up_to_date(tree: Dict[str, Any], files: Dict[str, Optional[str]]) -> bool:
+        """比较根目录树中的 blob SHA 与本地内容的 git blob SHA，全部一致时返回 True"""
+        remote = {entry.get("path"): entry.get("sha") for entry in tree.get("tree", [])}
+        for path, content in files.items():
+            if content is None:
+                if path in remote:
+                    return False
+            elif remote.get(path) != git_blob_sha(content):
+                return False
+        return True
+
+    async def _commit_files(
+        self,
+        repo: str,
+        base_sha: str,
+        files: Dict[str, Optional[str]],
+        commit_message: str,
+        owner: Optional[str] = None,
+        base_tree: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        通过 Git Data API 在 base_sha 之上创建一个包含所有改动的提交
+
+        Args:
+            files: 路径 -> 新内容，内容为 None 表示删除（只删除基础树中确实存在的文件）
+            base_tree: 已获取的 base_sha 根目录树（可选，避免重复请求）
+
+        Returns:
+            新提交的 SHA，失败时返回 None
+        """
+        owner = owner or self.org
+        if base_tree is None:
+            base_tree = await self._get_tree_owner(repo, base_sha, owner=owner)
+        if not base_tree or "sha" not in base_tree:
+            return None
+        existing = {entry.get("path") for entry in base_tree.get("tree", [])}
+
+        entries = []
+        for path, content in files.items():
+            if content is None:
+                if path in existing:
+                    entries.append({"path": path, "mode": "100644", "type": "blob", "sha": None})
+            else:
+                entries.append({"path": path, "mode": "100644", "type": "blob", "content": content})
+
+        tree = await self._api_request("POST", f"/repos/{owner}/{repo}/git/trees", {
+            "base_tree": base_tree["sha"],
+            "tree": entries
+        })
+        if not tree or "sha" not in tree:
+            return None
+
+        commit = await self._api_request("POST", f"/repos/{owner}/{repo}/git/commits", {
+            "message": commit_message,
+            "tree": tree["sha"],
+            "parents": [base_sha]
+        })
+        if not commit:
+            return None
+        return commit.get("sha")
+
+    async def _set_branch_owner(
+        self,
+        repo: str,
+        branch: str,
+        sha: str,
+        owner: Optional[str] = None,
+        reuse: bool = False
+    ) -> bool:
+        """
+        创建分支指向 sha；分支已存在时只做快进，不强制更新
+        分支上有 sha 之外的提交（比如维护者推送到待审 PR 的提交）时不改动分支：
+        reuse=True 时原样复用该分支（之后的提交叠加在其上），否则返回 False
+        """
+        owner = owner or self.org
+        created = await self._api_request("POST", f"/repos/{owner}/{repo}/git/refs", {
+            "ref": f"refs/heads/{branch}",
+            "sha": sha
+        })
+        if created is not None:
+            return True
+        updated = await self.client.request("PATCH", f"/repos/{owner}/{repo}/git/refs/heads/{branch}", {
+            "sha": sha,
+            "force": False
+        })
+        if updated.ok:
+            return True
+        # 422: 不是快进（或分支不存在）；403/404 等表示没有写权限
+        if not reuse or updated.status != 422:
+            return False
+        return await self._get_branch_ref_owner(repo, branch, owner=owner) is not None
+
+    async def _push_course_git_data(
+        self,
+        course_code: str,
+        default_branch: str,
+        base_sha: str,
+        base_tree: Optional[Dict[str, Any]],
+        files: Dict[str, Optional[str]]
+    ) -> Optional[bool]:
+        """
+        单提交模式：一次性构建新树（上传新文件、删除旧文件），
+        生成一个提交并让更新分支指向它，再创建PR
+
+        Returns:
+            是否成功；上游没有写权限等情况返回 None，由调用方回退到逐文件模式
+        """
+        repo = course_code
+        branch_name = f"auto/update-{course_code.lower()}"
+
+        log(f"  [1/3] 创建提交...")
+        commit_sha = await self._commit_files(repo, base_sha, files, f"Update readme.toml and README.md for {course_code}",
+                                              base_tree=base_tree)
+        if not commit_sha:
+            return None
+        log(f"    [OK] 提交已创建: {commit_sha[:7]}")
+
+        log(f"  [2/3] 更新分支: {branch_name}...")
+        if not await self._set_branch_owner(repo, branch_name, commit_sha):
+            return None
+        log(f"    [OK] 分支已指向新提交")
+
+        log(f"  [3/3] 创建Pull Request...")
+        pr = await self._create_pr(repo, branch_name, default_branch, f"docs: Update {course_code} resources", f"""自动更新 {course_code} 课程资源
+
+- 更新 readme.toml
+- 更新 README.md
+
+本PR由自动化工具生成。""")
+        if pr:
+            log(f"    [OK] PR已创建: #{pr.get('number', '')}")
+            log(f"      Link: {pr.get('html_url', '')}")
+        else:
+            log(f"    [WARN] PR创建失败（可能分支已有待审PR或权限问题）")
+        return True
+
     def push_course(
         self,
         course_code: str,
         repo_type: str,
         local_toml_path: str,
         local_readme_path: str
-    ) -> bool:
+    ) -> Optional[bool]:
+        """推送课程文件到GitHub仓库（在客户端的事件循环上执行 push_course_async）"""
+        return self.client.run(self.push_course_async(course_code, repo_type, local_toml_path, local_readme_path))
+
+    async def push_course_async(
+        self,
+        course_code: str,
+        repo_type: str,
+        local_toml_path: str,
+        local_readme_path: str
+    ) -> Optional[bool]:
         """
         推送课程文件到GitHub仓库
         
@@ -257,118 +515,119 @@ class GitHubAPIPusher:
             local_readme_path: 本地README文件路径
         
         Returns:
-            是否成功
+            是否成功；远程文件已与本地一致、无需推送时返回 None
         """
-        print(f"\n处理仓库: {course_code}")
+        log(f"\n处理仓库: {course_code}")
         
         repo = course_code
         branch_name = f"auto/update-{course_code.lower()}"
         
         try:
-            # 第0步：验证仓库存在
-            print(f"  [0/5] 验证仓库...")
-            repo_info = self._get_repo_info(repo)
-            if not repo_info:
-                print(f"    [ERROR] 仓库不存在或无权限访问: {self.org}/{repo}")
+            # 第0步：验证仓库存在，读取本地文件并与远程比较
+            log(f"  [0/5] 验证仓库...")
+            snapshot = self.snapshot.get(repo)
+            if snapshot:
+                default_branch = snapshot["default_branch"]
+            else:
+                repo_info = await self._get_repo_info(repo)
+                if not repo_info:
+                    log(f"    [ERROR] 仓库不存在或无权限访问: {self.org}/{repo}")
+                    return False
+                default_branch = repo_info.get("default_branch", "main")
+            log(f"    [OK] 仓库验证成功 (默认分支: {default_branch})")
+            
+            if not Path(local_toml_path).exists():
+                log(f"    [ERROR] TOML文件不存在: {local_toml_path}")
                 return False
-            default_branch = repo_info.get("default_branch", "main")
-            print(f"    [OK] 仓库验证成功 (默认分支: {default_branch})")
+            
+            if not Path(local_readme_path).exists():
+                log(f"    [ERROR] README文件不存在: {local_readme_path}")
+                return False
+            
+            with open(local_toml_path, 'r', encoding='utf-8') as f:
+                toml_content = f.read()
+            
+            with open(local_readme_path, 'r', encoding='utf-8') as f:
+                readme_content = f.read()
+            
+            # 用 git blob SHA 比较默认分支根目录与本地内容，一致则不建分支、不上传、不建PR
+            files = self._target_files(course_code, toml_content, readme_content)
+            if snapshot:
+                base_sha, base_tree = snapshot["head_sha"], snapshot["tree"]
+            else:
+                branch_ref = await self._get_branch_ref_owner(repo, default_branch, owner=self.org)
+                base_sha = branch_ref.get("object", {}).get("sha") if branch_ref else None
+                base_tree = await self._get_tree_owner(repo, base_sha) if base_sha else None
+            if base_tree and self._tree_up_to_date(base_tree, files):
+                log(f"    [SKIP] 远程文件与本地一致，跳过上传与PR")
+                return None
+            
+            if self.use_git_data and base_sha:
+                result = await self._push_course_git_data(course_code, default_branch, base_sha, base_tree, files)
+                if result is not None:
+                    return result
+                log(f"    [WARN] 单提交模式失败（可能没有上游写权限），回退到逐文件上传")
             
             # 第1步：在上游尝试创建分支；失败则尝试 Fork -> 在 Fork 创建分支
-            print(f"  [1/5] 创建分支: {branch_name}...")
+            log(f"  [1/5] 创建分支: {branch_name}...")
             upstream_owner = self.org
             upload_owner = upstream_owner
             created_branch = False
 
-            if self._create_branch_owner(repo, branch_name, default_branch, owner=upstream_owner):
-                print(f"    [OK] 分支已在上游创建")
+            # 上次运行留下的同名分支能快进时快进到默认分支的最新提交，否则原样复用
+            if base_sha:
+                branch_ready = await self._set_branch_owner(repo, branch_name, base_sha, owner=upstream_owner,
+                                                            reuse=True)
+            else:
+                branch_ready = await self._create_branch_owner(repo, branch_name, default_branch, owner=upstream_owner)
+            if branch_ready:
+                log(f"    [OK] 分支已在上游创建")
                 created_branch = True
                 upload_owner = upstream_owner
             else:
-                print(f"    [WARN] 在上游创建分支失败，尝试 Fork 并在 Fork 上创建分支...")
-                # 尝试 Fork 仓库到当前用户
-                fork = self._create_fork(repo, owner=upstream_owner)
-                if not fork:
-                    print(f"    [WARN] Fork 操作失败或不可用，将尝试直接在默认分支上提交（若无权限则失败）")
+                log(f"    [WARN] 在上游创建分支失败，尝试 Fork 并在 Fork 上创建分支...")
+                # 复用已有 Fork 或新建 Fork 并等待就绪
+                fork_owner = await self.forks.ensure_fork(repo, default_branch, upstream_owner)
+                if not fork_owner:
+                    log(f"    [WARN] 将尝试直接在默认分支上提交（若无权限则失败）")
                     upload_owner = upstream_owner
                 else:
-                    # 获取当前认证用户
-                    me = self._get_authenticated_user()
-                    fork_owner = me.get("login") if me else None
-                    if not fork_owner:
-                        print(f"    [WARN] 无法获取当前用户信息，放弃 Fork 路径")
-                        upload_owner = upstream_owner
+                    # 在 fork 创建分支（基于上游默认分支的 sha）；复用的 Fork 上已有同名分支时快进或原样复用
+                    created_in_fork = bool(base_sha) and await self._set_branch_owner(
+                        repo, branch_name, base_sha, owner=fork_owner, reuse=True
+                    )
+
+                    if created_in_fork:
+                        log(f"    [OK] Fork 上的分支已创建: {fork_owner}/{branch_name}")
+                        upload_owner = fork_owner
+                        created_branch = True
                     else:
-                        # 等待 fork 出现
-                        for _ in range(10):
-                            fork_info = self._get_repo_info_owner(repo, owner=fork_owner)
-                            if fork_info:
-                                break
-                            time.sleep(1)
-
-                        # 尝试在 fork 创建分支（基于上游默认分支的 sha）
-                        upstream_ref = self._get_branch_ref_owner(repo, default_branch, owner=upstream_owner)
-                        upstream_sha = None
-                        if upstream_ref and "object" in upstream_ref:
-                            upstream_sha = upstream_ref["object"].get("sha")
-
-                        created_in_fork = False
-                        if upstream_sha:
-                            endpoint = f"/repos/{fork_owner}/{repo}/git/refs"
-                            data = {"ref": f"refs/heads/{branch_name}", "sha": upstream_sha}
-                            res = self._api_request("POST", endpoint, data)
-                            if res:
-                                created_in_fork = True
-
-                        if created_in_fork:
-                            print(f"    [OK] Fork 上的分支已创建: {fork_owner}/{branch_name}")
-                            upload_owner = fork_owner
-                            created_branch = True
-                        else:
-                            print(f"    [WARN] 在 Fork 上创建分支失败，之后会尝试在默认分支提交（或在 Fork 上直接修改默认分支）")
-                            upload_owner = fork_owner
+                        log(f"    [WARN] 在 Fork 上创建分支失败，之后会尝试在默认分支提交（或在 Fork 上直接修改默认分支）")
+                        upload_owner = fork_owner
             
-            # 第2步：删除旧文件（在 upload_owner 下操作）
-            old_files = [
-                f"{course_code}.toml",
-                f"{course_code}.yaml",
-                "readme.toml",
-                "readme.yaml"
-            ]
-
-            print(f"  [2/5] 删除旧文件 (owner={upload_owner})...")
+            # 第2步：删除旧文件（在 upload_owner 下操作）；readme.toml 在第4步原地更新，不先删除
+            old_files = [path for path, content in files.items() if content is None]
+
+            log(f"  [2/5] 删除旧文件 (owner={upload_owner})...")
+            delete_branch = branch_name if created_branch else default_branch
             for old_file in old_files:
-                print(f"      尝试删除: {old_file}...", end="")
+                log(f"      尝试删除: {old_file}...", end="")
                 try:
-                    if self._delete_file_owner(repo, old_file, f"Remove {old_file}", owner=upload_owner):
-                        print(" [OK]")
+                    if await self._delete_file_owner(repo, old_file, f"Remove {old_file}",
+                                                     owner=upload_owner, branch=delete_branch):
+                        log(" [OK]")
                     else:
-                        print(" [SKIP]")
+                        log(" [SKIP]")
                 except Exception:
-                    print(" [SKIP]")
-            
-            # 第3步：读取本地文件
-            print(f"  [3/5] 读取本地文件...")
-            
-            if not Path(local_toml_path).exists():
-                print(f"    [ERROR] TOML文件不存在: {local_toml_path}")
-                return False
-            
-            if not Path(local_readme_path).exists():
-                print(f"    [ERROR] README文件不存在: {local_readme_path}")
-                return False
-            
-            with open(local_toml_path, 'r', encoding='utf-8') as f:
-                toml_content = f.read()
-            
-            with open(local_readme_path, 'r', encoding='utf-8') as f:
-                readme_content = f.read()
+                    log(" [SKIP]")
             
-            print(f"    [OK] TOML文件: {len(toml_content)} 字节")
-            print(f"    [OK] README文件: {len(readme_content)} 字节")
+            # 第3步：本地文件已在第0步读取
+            log(f"  [3/5] 读取本地文件...")
+            log(f"    [OK] TOML文件: {len(toml_content)} 字节")
+            log(f"    [OK] README文件: {len(readme_content)} 字节")
             
             # 第4步：上传文件到分支或main分支
-            print(f"  [4/5] 上传文件 (owner={upload_owner})...")
+            log(f"  [4/5] 上传文件 (owner={upload_owner})...")
 
             # 决定上传分支：若成功创建分支则上传到 branch_name，否则上传到默认分支
             if created_branch:
@@ -376,37 +635,34 @@ class GitHubAPIPusher:
             else:
                 upload_branch = default_branch
 
-            if not self._create_or_update_file(repo, "readme.toml", toml_content,
-                                               f"Update readme.toml for {course_code}", upload_branch,
-                                               owner=upload_owner):
+            if not await self._create_or_update_file(repo, "readme.toml", toml_content,
+                                                     f"Update readme.toml for {course_code}", upload_branch,
+                                                     owner=upload_owner):
                 if upload_branch != default_branch:
-                    print(f"    [WARN] 上传到{upload_branch}失败，尝试上传到{default_branch}...")
+                    log(f"    [WARN] 上传到{upload_branch}失败，尝试上传到{default_branch}...")
                     upload_branch = default_branch
-                    if not self._create_or_update_file(repo, "readme.toml", toml_content,
-                                                       f"Update readme.toml for {course_code}", upload_branch,
-                                                       owner=upload_owner):
-                        print(f"    [ERROR] 上传TOML文件失败")
+                    if not await self._create_or_update_file(repo, "readme.toml", toml_content,
+                                                             f"Update readme.toml for {course_code}", upload_branch,
+                                                             owner=upload_owner):
+                        log(f"    [ERROR] 上传TOML文件失败")
                         return False
                 else:
-                    print(f"    [ERROR] 上传TOML文件失败")
+                    log(f"    [ERROR] 上传TOML文件失败")
                     return False
-            print(f"    [OK] readme.toml 已上传 ({upload_owner}:{upload_branch})")
+            log(f"    [OK] readme.toml 已上传 ({upload_owner}:{upload_branch})")
 
-            if not self._create_or_update_file(repo, "README.md", readme_content,
-                                               f"Update README.md for {course_code}", upload_branch,
-                                               owner=upload_owner):
-                print(f"    [ERROR] 上传README文件失败")
+            if not await self._create_or_update_file(repo, "README.md", readme_content,
+                                                     f"Update README.md for {course_code}", upload_branch,
+                                                     owner=upload_owner):
+                log(f"    [ERROR] 上传README文件失败")
                 return False
-            print(f"    [OK] README.md 已上传 ({upload_owner}:{upload_branch})")
-            
-            # 第5步：创建PR（如果是在分支上上传）
-            print(f"  [5/5] 创建Pull Request...")
+            log(f"    [OK] README.md 已上传 ({upload_owner}:{upload_branch})")
             
             # 第5步：创建PR（若在非默认分支/在 Fork 上创建）
-            print(f"  [5/5] 创建Pull Request...")
+            log(f"  [5/5] 创建Pull Request...")
 
             if upload_owner == upstream_owner and upload_branch == default_branch:
-                print(f"    [INFO] 文件已上传到上游默认分支 {default_branch}，跳过PR创建")
+                log(f"    [INFO] 文件已上传到上游默认分支 {default_branch}，跳过PR创建")
                 return True
 
             pr_title = f"docs: Update {course_code} resources"
@@ -420,49 +676,111 @@ class GitHubAPIPusher:
             # 如果是 Fork 提交，则 head 需要写成 owner:branch
             if upload_owner != upstream_owner:
                 head = f"{upload_owner}:{branch_name if created_branch else upload_branch}"
-                pr = self._create_pr(repo, head, default_branch, pr_title, pr_body, owner=upstream_owner)
+                pr = await self._create_pr(repo, head, default_branch, pr_title, pr_body, owner=upstream_owner)
             else:
                 # 上游仓库自身的分支
                 head = branch_name if created_branch else upload_branch
-                pr = self._create_pr(repo, head, default_branch, pr_title, pr_body, owner=upstream_owner)
+                pr = await self._create_pr(repo, head, default_branch, pr_title, pr_body, owner=upstream_owner)
 
             if pr:
                 pr_url = pr.get("html_url", "")
                 pr_number = pr.get("number", "")
-                print(f"    [OK] PR已创建: #{pr_number}")
-                print(f"      Link: {pr_url}")
+                log(f"    [OK] PR已创建: #{pr_number}")
+                log(f"      Link: {pr_url}")
                 return True
             else:
-                print(f"    [WARN] PR创建失败（可能分支已有待审PR或权限问题）")
+                log(f"    [WARN] PR创建失败（可能分支已有待审PR或权限问题）")
                 return True
                 
         except Exception as e:
-            print(f"    [ERROR] 处理失败: {e}")
+            log(f"    [ERROR] 处理失败: {e}")
             return False
 
 
 def determine_repo_type(course_code: str, readme_output_path: Path) -> str:
-    """根据readme.toml内容判断仓库类型"""
+    """根据readme.toml的repo_type字段判断仓库类型（优先读取共享解析缓存）"""
     readme_toml = readme_output_path / course_code / "readme.toml"
     
     if not readme_toml.exists():
         return "unknown"
     
-    try:
-        with open(readme_toml, 'r', encoding='utf-8') as f:
-            content = f.read()
-            if 'repo_type = "normal"' in content:
-                return "normal"
-            elif 'repo_type = "multi-project"' in content:
-                return "multi-project"
-    except:
-        pass
-    
-    return "unknown"
+    return load_repo_type(str(readme_toml))
+
+
+def push_courses(
+    pusher: GitHubAPIPusher,
+    jobs: Iterable[Tuple[str, str, str, str]],
+    concurrency: int = 1
+) -> Iterator[Tuple[str, Optional[bool], str]]:
+    """
+    推送多个课程仓库
+
+    concurrency > 1 时在客户端的事件循环上同时处理多个仓库（每个仓库一个任务），
+    每个仓库内部的步骤仍按顺序执行；每个仓库的输出先缓存，完成后整体返回，避免日志互相穿插
+
+    Args:
+        pusher: GitHub API推送器（连接池大小应不小于 concurrency）
+        jobs: (course_code, repo_type, toml_path, readme_path) 列表
+        concurrency: 同时处理的仓库数
+
+    Yields:
+        (course_code, 是否成功（None 表示远程已是最新）, 日志)，并发模式下按完成顺序产出
+    """
+    jobs = list(jobs)
+
+    async def push(job):
+        with recorder.course(job[0]), recorder.stage("push"):
+            return await pusher.push_course_async(*job)
+
+    if concurrency <= 1:
+        for job in jobs:
+            yield job[0], pusher.client.run(push(job)), ""
+        return
+
+    async def run(job):
+        try:
+            return await push(job)
+        except Exception as e:
+            log(f"    [ERROR] 处理失败: {e}")
+            return False
+
+    for job, ok, output in pusher.client.run_many(run, jobs, concurrency):
+        yield job[0], ok, output
 
 
 def main():
     """主函数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="通过GitHub API上传readme.toml和README.md并创建PR")
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=1,
+        help="同时处理的仓库数（默认 1 为逐个处理）"
+    )
+    parser.add_argument(
+        "--git-data",
+        action="store_true",
+        help="通过 Git Data API 把每个仓库的改动合并为一个提交"
+    )
+    parser.add_argument(
+        "--fork-timeout",
+        type=float,
+        default=FORK_TIMEOUT,
+        help=f"没有上游写权限时等待新建 Fork 就绪的最长秒数（默认 {FORK_TIMEOUT:.0f}）"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=TRACE_PATH,
+        help="记录每个仓库的耗时与每个 GitHub 请求，逐条写入 FILE（JSON lines）并在结束时打印汇总"
+    )
+    args = parser.parse_args()
+    concurrency = max(1, args.concurrency)
+    if args.trace:
+        recorder.configure(args.trace)
+    
     # 获取配置
     github_token = os.getenv("GITHUB_TOKEN")
     if not github_token:
@@ -476,8 +794,13 @@ def main():
         print(f"❌ 错误: readme_output目录不存在: {readme_output}")
         sys.exit(1)
     
-    # 初始化API推送器
-    pusher = GitHubAPIPusher(github_token)
+    # 初始化API推送器（连接池不小于并发数）
+    pusher = GitHubAPIPusher(
+        github_token,
+        pool_size=max(DEFAULT_POOL_SIZE, concurrency),
+        use_git_data=args.git_data,
+        fork_timeout=args.fork_timeout
+    )
     
     # 收集所有课程
     courses = sorted([d.name for d in readme_output.iterdir() if d.is_dir()])
@@ -486,10 +809,13 @@ def main():
     print("GitHub API 上传工具")
     print("=" * 60)
     print(f"找到 {len(courses)} 个课程仓库")
+    if concurrency > 1:
+        print(f"并发数: {concurrency}")
     print()
     
     stats = {
         "success": 0,
+        "unchanged": 0,
         "skipped": 0,
         "failed": 0,
         "normal": 0,
@@ -497,7 +823,9 @@ def main():
         "unknown": 0
     }
     
-    # 处理每个课程
+    # 收集待处理的课程
+    jobs = []
+    repo_types = {}
     for course_code in courses:
         course_dir = readme_output / course_code
         repo_type = determine_repo_type(course_code, readme_output)
@@ -507,14 +835,29 @@ def main():
             stats["skipped"] += 1
             continue
         
-        toml_path = course_dir / "readme.toml"
-        readme_path = course_dir / "README.md"
-        
-        if pusher.push_course(course_code, repo_type, str(toml_path), str(readme_path)):
+        repo_types[course_code] = repo_type
+        jobs.append((course_code, repo_type, str(course_dir / "readme.toml"), str(course_dir / "README.md")))
+    
+    # 批量预取所有仓库的元数据，之后每个仓库无需再逐个查询
+    if jobs:
+        with recorder.stage("prefetch"):
+            prefetched = pusher.prefetch(job[0] for job in jobs)
+        print(f"预取仓库元数据: {prefetched}/{len(jobs)} 个仓库")
+    
+    # 处理每个课程
+    failed = []
+    for course_code, ok, output in push_courses(pusher, jobs, concurrency):
+        if output:
+            print(output, end="")
+        if ok is None:
+            stats["unchanged"] += 1
+            stats[repo_types[course_code]] += 1
+        elif ok:
             stats["success"] += 1
-            stats[repo_type] += 1
+            stats[repo_types[course_code]] += 1
         else:
             stats["failed"] += 1
+            failed.append(course_code)
     
     # 打印统计信息
     print()
@@ -523,12 +866,17 @@ def main():
     print("=" * 60)
     print(f"总课程数:     {len(courses)}")
     print(f"成功上传:     {stats['success']}")
+    print(f"远程未变化:   {stats['unchanged']}")
     print(f"已跳过:       {stats['skipped']}")
     print(f"处理失败:     {stats['failed']}")
     print()
     print(f"  Normal类型:       {stats['normal']}")
     print(f"  Multi-project类型: {stats['multi-project']}")
+    if failed:
+        print()
+        print(f"失败的仓库: {', '.join(sorted(failed))}")
     print()
+    recorder.report()
 
 
 if __name__ == "__main__":
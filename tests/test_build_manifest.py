@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""build_manifest 的测试：未变化的课程跳过，源文件、输出或渲染器版本变化时失效"""
+
+import pytest
+
+from build_manifest import BuildManifest, renderer_version
+
+
+@pytest.fixture
+def course(tmp_path):
+    renderer = tmp_path / "convert.py"
+    renderer.write_text("VERSION = 1\n", encoding="utf-8")
+    source = tmp_path / "course.toml"
+    source.write_text('title = "课程"\n', encoding="utf-8")
+    readme = tmp_path / "README.md"
+    readme.write_text("# 课程\n", encoding="utf-8")
+
+    manifest_path = str(tmp_path / ".build_cache" / "manifest.json")
+    manifest = BuildManifest(renderer_version(str(renderer)), manifest_path)
+    manifest.record(str(source), "success", [str(readme)])
+    manifest.save()
+    return renderer, source, readme, manifest_path
+
+
+def _load(renderer, manifest_path):
+    return BuildManifest(renderer_version(str(renderer)), manifest_path)
+
+
+def test_unchanged_course_is_skipped(course):
+    renderer, source, readme, manifest_path = course
+    entry = _load(renderer, manifest_path).lookup(str(source))
+    assert entry is not None and entry["status"] == "success"
+
+
+def test_renderer_change_invalidates(course):
+    renderer, source, readme, manifest_path = course
+    before = renderer_version(str(renderer))
+    renderer.write_text("VERSION = 2\n", encoding="utf-8")
+    assert renderer_version(str(renderer)) != before
+    assert _load(renderer, manifest_path).lookup(str(source)) is None
+
+
+@pytest.mark.parametrize("changed", ["source", "readme"])
+def test_source_or_output_change_invalidates(course, changed):
+    renderer, source, readme, manifest_path = course
+    {"source": source, "readme": readme}[changed].write_text("改动\n", encoding="utf-8")
+    assert _load(renderer, manifest_path).lookup(str(source)) is None
+
+
+def test_deleted_output_invalidates(course):
+    renderer, source, readme, manifest_path = course
+    readme.unlink()
+    assert _load(renderer, manifest_path).lookup(str(source)) is None
+
+
+def test_keys_are_independent(course):
+    renderer, source, readme, manifest_path = course
+    manifest = _load(renderer, manifest_path)
+    assert manifest.lookup(str(source), key="format:" + str(source)) is None
+    manifest.discard(str(source))
+    manifest.save()
+    assert _load(renderer, manifest_path).lookup(str(source)) is None
+
+
+def test_save_merges_entries_from_other_runs(course, tmp_path):
+    renderer, source, readme, manifest_path = course
+    other = tmp_path / "other.toml"
+    other.write_text('title = "另一门课"\n', encoding="utf-8")
+
+    # 两个清单实例先后读取、各自保存时不互相覆盖
+    first = _load(renderer, manifest_path)
+    second = _load(renderer, manifest_path)
+    first.record(str(other), "success")
+    first.save()
+    second.discard(str(source))
+    second.save()
+
+    merged = _load(renderer, manifest_path)
+    assert merged.lookup(str(other)) is not None
+    assert merged.lookup(str(source)) is None
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""course_schema 的测试：解析结果转换为文档模型时的校验"""
+
+import pytest
+
+from course_schema import Course, MultiProjectCourse, build_document, repo_type_of
+
+
+def test_course_drops_invalid_items_and_converts_scalars():
+    course = Course.from_dict({
+        "course_name": "数据结构",
+        "repo_type": "normal",
+        "course_code": 2024,
+        "description": ["不是字符串"],
+        "lecturers": [{"name": "张三", "reviews": [{"content": "好", "author": "匿名"}, "坏条目"]}, 1],
+        "textbooks": {"title": "不是数组"},
+        "exam": [{"content": "  闭卷  ", "topic": 3}],
+    })
+    assert course.course_code == "2024"
+    assert course.description is None
+    assert len(course.lecturers) == 1
+    review, = course.lecturers[0].reviews
+    # author 不是表时视为没有作者
+    assert (review.content, review.author) == ("好", None)
+    assert course.textbooks == []
+    # 字符串保留原文，去除空白由使用方决定
+    assert (course.exam[0].content, course.exam[0].topic) == ("  闭卷  ", "3")
+
+
+def test_missing_fields_are_none():
+    course = Course.from_dict({"repo_type": "normal"})
+    assert course.course_name is None and course.description is None
+    assert course.lecturers == [] and course.misc == []
+
+    review = Course.from_dict({"course": [{"author": {"name": "李四"}}]}).course[0]
+    assert review.content is None and review.topic is None
+    assert (review.author.name, review.author.link, review.author.date) == ("李四", "", "")
+    assert bool(review.author)
+
+
+def test_multi_project_course():
+    doc = MultiProjectCourse.from_dict({
+        "repo_type": "multi-project",
+        "course_code": "PE",
+        "courses": [{"name": "游泳", "code": 101, "teachers": [{"name": "王五", "reviews": "无"}]}, "x"],
+    })
+    project, = doc.courses
+    assert (project.name, project.code) == ("游泳", "101")
+    assert project.teachers[0].reviews == []
+    assert MultiProjectCourse.of(doc) is doc
+
+
+@pytest.mark.parametrize("data, expected", [
+    ({"repo_type": " normal "}, "normal"),
+    ({"repo_type": "multi-project"}, "multi-project"),
+    ({"repo_type": 1}, "unknown"),
+    ({}, "unknown"),
+    ("不是表", "unknown"),
+])
+def test_repo_type_of(data, expected):
+    assert repo_type_of(data) == expected
+
+
+def test_build_document_dispatches_on_repo_type():
+    assert isinstance(build_document({"repo_type": "normal"}), Course)
+    assert isinstance(build_document({"repo_type": "multi-project"}), MultiProjectCourse)
+    assert build_document({"repo_type": "other"}) is None
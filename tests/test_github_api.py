@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""github_api 传输层的测试（使用本地套接字，不访问 GitHub）"""
+
+import sys
+import json
+import time
+import socket
+import asyncio
+import threading
+from email.utils import formatdate
+
+import pytest
+
+from benchmarks.fake_github import ORG, FakeGitHub
+from github_api import SECONDARY_LIMIT_WAIT, ETagCache, GitHubClient, HttpResponse, RateLimitScheduler, log
+
+
+@pytest.fixture
+def stalled_server():
+    """接受连接但从不响应的服务器"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(5)
+    connections = []
+
+    def accept():
+        try:
+            while True:
+                connections.append(server.accept()[0])
+        except OSError:
+            pass
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}"
+    server.close()
+    for conn in connections:
+        conn.close()
+
+
+def test_request_times_out_on_stalled_server(stalled_server):
+    client = GitHubClient("token", base_url=stalled_server, etag_cache=False, max_retries=0, timeout=0.5)
+    try:
+        result = client.run(client.request("GET", "/repos/org/repo"))
+    finally:
+        client.close()
+    assert result.status == 0
+    assert result.error.startswith("API 请求超时")
+
+
+def test_run_many_keeps_task_logs_separate():
+    client = GitHubClient("token", etag_cache=False)
+
+    async def worker(n):
+        for i in range(3):
+            log(f"{n}-{i}")
+            await asyncio.sleep(0)
+        return sys.stdout
+
+    try:
+        results = {job: (stdout, output) for job, stdout, output in client.run_many(worker, range(4), 4)}
+    finally:
+        client.close()
+    for n, (stdout, output) in results.items():
+        # 任务执行期间 sys.stdout 保持不变，日志只进入各自的缓冲区
+        assert stdout is sys.stdout
+        assert output == "".join(f"{n}-{i}\n" for i in range(3))
+
+
+def _response(body: str, etag: str = '"v1"') -> HttpResponse:
+    return HttpResponse(200, "OK", "https://api.github.invalid/x", {"ETag": etag}, body)
+
+
+def test_etag_cache_keeps_most_recently_used_entries(tmp_path):
+    cache = ETagCache(str(tmp_path / "etags.json"), max_entries=2)
+    cache.store("a", _response("A"))
+    cache.store("b", _response("B"))
+    assert cache.get("a")["body"] == "A"
+    cache.store("c", _response("C"))
+    # b 最久未使用，被丢弃
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_etag_cache_skips_large_bodies(tmp_path):
+    cache = ETagCache(str(tmp_path / "etags.json"), max_body=4)
+    cache.store("a", _response("ok"))
+    cache.store("a", _response("too large"))
+    cache.store("b", _response("too large"))
+    assert cache.entries == {}
+
+
+def test_etag_cache_prunes_old_file_on_load(tmp_path):
+    path = tmp_path / "etags.json"
+    entries = {f"k{i}": {"headers": {"ETag": f'"{i}"'}, "body": "x" * i} for i in range(6)}
+    path.write_text(json.dumps(entries), encoding="utf-8")
+    cache = ETagCache(str(path), max_entries=3, max_body=4)
+    assert list(cache.entries) == ["k2", "k3", "k4"]
+    cache.save()
+    assert list(json.loads(path.read_text(encoding="utf-8"))) == ["k2", "k3", "k4"]
+
+
+def test_not_modified_response_is_replayed_from_cache(tmp_path):
+    server = FakeGitHub(repos={"REPO1": {"README.md": "# REPO1\n"}}).start()
+    client = GitHubClient("token", base_url=server.url, etag_cache=ETagCache(str(tmp_path / "etags.json")))
+    try:
+        first = client.run(client.request("GET", f"/repos/{ORG}/REPO1"))
+        second = client.run(client.request("GET", f"/repos/{ORG}/REPO1"))
+    finally:
+        client.close()
+        server.stop()
+    assert first.ok and second == first
+    assert server.stats()["not_modified"] == 1
+
+
+def _limited(status=403, text="", **headers):
+    headers = {name.replace("_", "-"): str(value) for name, value in headers.items()}
+    return HttpResponse(status, "Forbidden", "https://api.github.com/repos/o/r", headers, text)
+
+
+def _paused_for(scheduler):
+    return scheduler._resume_at - time.time()
+
+
+def test_scheduler_pauses_until_reset_when_exhausted():
+    scheduler = RateLimitScheduler()
+    reset = time.time() + 120
+    assert scheduler.update(_limited(X_RateLimit_Remaining=0, X_RateLimit_Reset=reset)) is True
+    assert 115 < _paused_for(scheduler) <= 120
+    # 后续请求排到重置时间之后
+    assert scheduler._reserve("core") > 115
+
+
+@pytest.mark.parametrize("reset", [None, "明天"])
+def test_scheduler_missing_or_bad_reset_uses_secondary_wait(reset):
+    scheduler = RateLimitScheduler()
+    headers = {"X_RateLimit_Remaining": 0}
+    if reset is not None:
+        headers["X_RateLimit_Reset"] = reset
+    assert scheduler.update(_limited(**headers)) is True
+    assert SECONDARY_LIMIT_WAIT - 5 < _paused_for(scheduler) <= SECONDARY_LIMIT_WAIT
+
+
+@pytest.mark.parametrize("retry_after, expected", [
+    ("30", 30),
+    (formatdate(time.time() + 90, usegmt=True), 90),
+    ("0", 1),
+])
+def test_scheduler_honours_retry_after(retry_after, expected):
+    scheduler = RateLimitScheduler()
+    assert scheduler.update(_limited(429, Retry_After=retry_after)) is True
+    assert expected - 5 < _paused_for(scheduler) <= expected
+
+
+def test_scheduler_secondary_limit_and_plain_forbidden():
+    scheduler = RateLimitScheduler()
+    assert scheduler.update(_limited(text="You have exceeded a secondary rate limit")) is True
+    assert _paused_for(scheduler) > SECONDARY_LIMIT_WAIT - 5
+
+    scheduler = RateLimitScheduler()
+    assert scheduler.update(_limited(text="Resource not accessible by integration")) is False
+    assert _paused_for(scheduler) <= 0
+
+
+def test_scheduler_spreads_requests_when_budget_is_low():
+    scheduler = RateLimitScheduler(low_remaining=100)
+    reset = time.time() + 100
+    ok = HttpResponse(200, "OK", "https://api.github.com/user", {
+        "X-RateLimit-Remaining": "10", "X-RateLimit-Reset": str(reset)}, "")
+    assert scheduler.update(ok) is False
+    delays = [scheduler._reserve("core") for _ in range(3)]
+    # 剩余 10 次、100 秒：第一次立即发送，之后约每 10 秒一次
+    assert delays[0] <= 0
+    assert 9 < delays[1] < 11 and 19 < delays[2] < 23
+    # 其他资源的额度不受影响
+    assert scheduler._reserve("graphql") <= 0
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""markdown_text 的测试：裸 URL 转链接、已有链接语法不再嵌套、空行合并"""
+
+import pytest
+
+from markdown_text import MarkdownBuilder, autolink, normalize_content
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("见 https://a.example/x", "见 [https://a.example/x](https://a.example/x)"),
+    ("(https://a.example/x)", "([https://a.example/x](https://a.example/x))"),
+    ("http://a.example 和 https://b.example",
+     "[http://a.example](http://a.example) 和 [https://b.example](https://b.example)"),
+    ("没有链接的文本", "没有链接的文本"),
+])
+def test_autolink_wraps_bare_urls(text, expected):
+    assert autolink(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "[文档](https://a.example/doc)",
+    "[https://a.example](https://a.example)",
+    "![图](https://a.example/p.png)",
+    "[![徽章](https://a.example/b.svg)](https://a.example/ci)",
+    "[带标题](https://a.example \"标题\")",
+    "[括号](https://a.example/wiki/A_(B))",
+    "<https://a.example/x>",
+    "`curl https://a.example/x`",
+    '<a href="https://a.example/x">链接</a>',
+])
+def test_autolink_keeps_existing_link_syntax(text):
+    # 以前会把链接中的 URL 再包一层，得到 [文字]([URL](URL))
+    assert autolink(text) == text
+
+
+def test_autolink_mixed_line_only_wraps_bare_url():
+    text = "[文档](https://a.example/doc) 或 https://b.example"
+    assert autolink(text) == "[文档](https://a.example/doc) 或 [https://b.example](https://b.example)"
+
+
+def test_autolink_multiline_leaves_other_lines_untouched():
+    text = "第一行 `https://a.example`\n第二行 https://b.example\n第三行"
+    assert autolink(text) == "第一行 `https://a.example`\n第二行 [https://b.example](https://b.example)\n第三行"
+
+
+def test_normalize_content():
+    assert normalize_content("    a\n      b\n\n\n\n    c\n") == "a\nb\n\nc"
+    assert normalize_content("  - a\n    - b\n", dedent=False) == "- a\n    - b"
+
+
+def test_builder_collapses_blank_lines_and_links_blocks():
+    builder = MarkdownBuilder()
+    builder.pair("# 标题")
+    builder.blank()
+    builder.blank()
+    builder.add("正文\n\n\n\n下一段 https://a.example")
+    builder.blank()
+    assert builder.getvalue() == "# 标题\n\n正文\n\n下一段 [https://a.example](https://a.example)\n"
+
+
+def test_builder_take_keeps_pending_newlines():
+    builder = MarkdownBuilder()
+    builder.pair("a")
+    first = builder.take()
+    builder.add("b")
+    assert first + builder.getvalue() == "a\n\nb\n"
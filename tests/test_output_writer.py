@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""output_writer 的测试：内容未变化时不写入，变化时原子替换；readme.toml 的复制、链接与退回"""
+
+import os
+
+import pytest
+
+import output_writer
+from output_writer import materialize, write_if_changed
+
+
+def _temp_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+@pytest.fixture
+def readme(tmp_path):
+    path = tmp_path / "README.md"
+    path.write_bytes("# 标题\n\n正文\n".encode("utf-8"))
+    os.utime(path, (1_000_000, 1_000_000))
+    return path
+
+
+@pytest.mark.parametrize("content", [
+    "# 标题\n\n正文\n",
+    ["# 标题\n", "", "\n正文\n"],
+])
+def test_unchanged_content_is_not_written(readme, content):
+    before = os.stat(readme)
+    assert write_if_changed(str(readme), content) is False
+    after = os.stat(readme)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert _temp_files(readme.parent) == []
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("# 标题\n\n新正文\n", "# 标题\n\n新正文\n"),
+    (["# 标题\n", "\n正文\n", "追加\n"], "# 标题\n\n正文\n追加\n"),   # 旧文件是新内容的前缀
+    (["# 标题\n", "\n正"], "# 标题\n\n正"),                          # 旧文件有多余内容
+    (["# 标题\n", "\n改\n"], "# 标题\n\n改\n"),                       # 相同前缀之后出现差异
+])
+def test_changed_content_replaces_file_atomically(readme, content, expected):
+    before = os.stat(readme)
+    assert write_if_changed(str(readme), content) is True
+    assert readme.read_text(encoding="utf-8") == expected
+    # 写入的是新文件（临时文件经 os.replace 替换），不是原地改写
+    assert os.stat(readme).st_ino != before.st_ino
+    assert _temp_files(readme.parent) == []
+
+
+def test_missing_file_is_created(tmp_path):
+    path = tmp_path / "README.md"
+    assert write_if_changed(str(path), iter(["a", "b"])) is True
+    assert path.read_text(encoding="utf-8") == "ab"
+
+
+def test_failed_render_keeps_old_file(readme):
+    def chunks():
+        yield "# 标题\n"
+        yield "\n不同的内容\n"
+        raise RuntimeError("渲染失败")
+
+    with pytest.raises(RuntimeError):
+        write_if_changed(str(readme), chunks())
+    assert readme.read_text(encoding="utf-8") == "# 标题\n\n正文\n"
+    assert _temp_files(readme.parent) == []
+
+
+@pytest.fixture
+def toml_pair(tmp_path):
+    src = tmp_path / "source.toml"
+    src.write_text('title = "课程"\n', encoding="utf-8")
+    out = tmp_path / "out"
+    out.mkdir()
+    return src, out / "readme.toml"
+
+
+def test_copy_creates_independent_file(toml_pair):
+    src, dst = toml_pair
+    assert materialize(str(src), str(dst), "copy") is True
+    assert dst.read_bytes() == src.read_bytes()
+    assert not os.path.samefile(src, dst)
+    assert materialize(str(src), str(dst), "copy") is False
+
+
+def test_hardlink_shares_inode(toml_pair):
+    src, dst = toml_pair
+    assert materialize(str(src), str(dst), "hardlink") is True
+    assert os.path.samefile(src, dst)
+    assert materialize(str(src), str(dst), "hardlink") is False
+    # 切回 copy 时已链接的文件要替换为独立的文件
+    assert materialize(str(src), str(dst), "copy") is True
+    assert not os.path.samefile(src, dst)
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def test_falls_back_when_method_fails(toml_pair, monkeypatch, capsys):
+    src, dst = toml_pair
+
+    def fail(src, tmp_path):
+        raise OSError("不支持")
+
+    monkeypatch.setattr(output_writer, "_METHODS", {**output_writer._METHODS, "hardlink": fail, "reflink": fail})
+    monkeypatch.setattr(output_writer, "_warned", set())
+    assert materialize(str(src), str(dst), "hardlink") is True
+    assert dst.read_bytes() == src.read_bytes()
+    assert not os.path.samefile(src, dst)
+    assert _temp_files(dst.parent) == []
+    assert "改用 copy" in capsys.readouterr().out
+
+
+def test_reflink_without_platform_support_falls_back_to_copy(toml_pair, monkeypatch):
+    src, dst = toml_pair
+    monkeypatch.setattr(output_writer, "FICLONE", None)
+    monkeypatch.setattr(output_writer, "_warned", set())
+    assert materialize(str(src), str(dst), "reflink") is True
+    assert dst.read_bytes() == src.read_bytes()
+    assert _temp_files(dst.parent) == []
+
+
+def test_all_methods_failing_raises(toml_pair, monkeypatch):
+    src, dst = toml_pair
+
+    def fail(src, tmp_path):
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(output_writer, "_METHODS", {"hardlink": fail, "reflink": fail, "copy": fail})
+    with pytest.raises(OSError):
+        materialize(str(src), str(dst), "hardlink")
+    assert not dst.exists()
+    assert _temp_files(dst.parent) == []
+
+
+def test_unknown_mode_is_rejected(toml_pair):
+    src, dst = toml_pair
+    with pytest.raises(ValueError):
+        materialize(str(src), str(dst), "symlink")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+TOML 读取与容错修复
+三引号字符串中未转义的反斜杠（如 LaTeX 公式）会导致 tomli 解析失败，
+此时在内存中修复后直接用 tomli.loads 解析，默认不改动源文件
+
+解析结果按 (路径, mtime, 大小) 缓存在磁盘上，格式化、转换、上传各阶段共用，
+文件未变化时直接读取缓存，不再调用 tomli
+设置环境变量 TOML_CACHE=0 可关闭缓存
+"""
+
+import os
+import re
+import pickle
+import hashlib
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import tomli
+
+from course_schema import repo_type_of
+from instrumentation import recorder
+from output_writer import write_if_changed
+
+# 解析缓存目录（位于脚本目录下，与工作目录无关）
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".build_cache", "parsed")
+CACHE_ENABLED = os.environ.get("TOML_CACHE", "1") != "0"
+# 缓存格式版本，修改修复逻辑或缓存结构时递增
+CACHE_VERSION = 1
+
+TRIPLE_QUOTED_PATTERN = re.compile(r'"""(.*?)"""', re.DOTALL)
+LONE_BACKSLASH_PATTERN = re.compile(r'(?<!\\)\\(?!\\)')
+
+
+def _escape_backslash_in_triple_quotes(match: re.Match) -> str:
+    # 只转义尚未转义的反斜杠（不是 \\ 的反斜杠）
+    text = LONE_BACKSLASH_PATTERN.sub(r'\\\\', match.group(1))
+    return f'"""{text}"""'
+
+
+def repair_backslashes(content: str) -> str:
+    """在所有 \"\"\"...\"\"\" 块内转义未转义的反斜杠"""
+    return TRIPLE_QUOTED_PATTERN.sub(_escape_backslash_in_triple_quotes, content)
+
+
+def loads_with_repair(content: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    解析内存中的 TOML 文本，失败时修复反斜杠后重试
+    返回 (解析结果, 修复后的文本)，无需修复时修复文本为 None
+    """
+    with recorder.stage("parse"):
+        try:
+            return tomli.loads(content), None
+        except tomli.TOMLDecodeError:
+            pass
+
+    with recorder.stage("repair"):
+        repaired = repair_backslashes(content)
+        return tomli.loads(repaired), repaired
+
+
+def _cache_file(toml_path: str) -> str:
+    name = hashlib.sha1(os.path.abspath(toml_path).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{name}.pickle")
+
+
+def _stat_key(toml_path: str) -> Tuple[int, int]:
+    st = os.stat(toml_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_cache(toml_path: str) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+    try:
+        with open(_cache_file(toml_path), 'rb') as f:
+            entry = pickle.load(f)
+        if entry['version'] == CACHE_VERSION and entry['key'] == _stat_key(toml_path):
+            return entry['data'], entry['repaired']
+    except Exception:
+        pass
+    return None
+
+
+def prime_cache(toml_path: str, data: Dict[str, Any], repaired: Optional[str] = None):
+    """
+    把已知的解析结果写入缓存，供后续阶段直接读取
+    例如转换脚本复制出 readme.toml 后，上传脚本无需再次解析
+    """
+    if not CACHE_ENABLED:
+        return
+    tmp_path = None
+    try:
+        entry = {
+            'version': CACHE_VERSION,
+            'key': _stat_key(toml_path),
+            'data': data,
+            'repaired': repaired,
+        }
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _cache_file(toml_path))
+        tmp_path = None
+    except (OSError, pickle.PicklingError):
+        # 缓存只是加速手段，写入失败不影响正常流程
+        pass
+    finally:
+        # 写入或替换失败时删除残留的临时文件
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def load_toml(toml_path: str, fix_in_place: bool = False) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    读取并解析 TOML 文件，解析失败时在内存中修复反斜杠后重试
+
+    Args:
+        toml_path: TOML 文件路径
+        fix_in_place: 修复成功后是否把修复后的内容写回源文件
+
+    Returns:
+        (解析结果, 修复后的文本)；源文件可直接解析时修复文本为 None
+
+    Raises:
+        tomli.TOMLDecodeError: 修复后仍无法解析
+    """
+    if CACHE_ENABLED:
+        cached = _read_cache(toml_path)
+        if cached is not None and not (fix_in_place and cached[1] is not None):
+            recorder.count("parse_cache_hits")
+            return cached
+
+    with open(toml_path, 'rb') as f:
+        content = f.read().decode('utf-8')
+
+    data, repaired = loads_with_repair(content)
+    if repaired is None:
+        prime_cache(toml_path, data)
+        return data, None
+
+    if fix_in_place:
+        # 替换为新文件而不是原地改写，不会经由硬链接改动 readme_output 中的 readme.toml
+        write_if_changed(toml_path, repaired)
+        # 写回后源文件本身即可直接解析
+        prime_cache(toml_path, data)
+    else:
+        prime_cache(toml_path, data, repaired)
+
+    return data, repaired
+
+
+def load_repo_type(toml_path: str) -> str:
+    """读取 TOML 的 repo_type 字段，文件不存在或无法解析时返回 "unknown" """
+    try:
+        data, _ = load_toml(toml_path)
+    except Exception:
+        return "unknown"
+    return repo_type_of(data)